@@ -8,9 +8,12 @@ import torch
 
 from barriers import make_barrier, make_compensator
 from fosco.certificates import make_certificate, Certificate, TrainableCertificate
-from fosco.common.domains import Set
+from fosco.common.consts import DomainName
+from fosco.common.domains import Set, Rectangle
+from fosco.common.timing import timed
 from fosco.config import CegisConfig, CegisResult
 from fosco.consolidator import make_consolidator, Consolidator
+from fosco.consolidator.dataset_store import DatasetStore
 from fosco.learner import make_learner, LearnerNN
 from fosco.plotting.utils2d import scatter_datasets
 from fosco.plotting.functions import (
@@ -21,6 +24,8 @@ from fosco.plotting.functions import (
 )
 from fosco.translator import make_translator, Translator
 from fosco.verifier import make_verifier, Verifier
+from fosco.verifier.cache import VerificationCache
+from fosco.verifier.z3_verifier import VerifierZ3
 from fosco.logger import make_logger, Logger, LOGGING_LEVELS
 from fosco.systems import UncertainControlAffineDynamics, ControlAffineDynamics
 from fosco.verifier.types import SYMBOL
@@ -62,6 +67,7 @@ class Cegis:
         self.verifier = self._initialise_verifier()
         self.consolidator = self._initialise_consolidator()
         self.translator = self._initialise_translator()
+        self.verification_cache = self._initialise_verification_cache()
 
         # sanity check
         self._result = None
@@ -106,6 +112,7 @@ class Cegis:
             activation=self.config.ACTIVATION,
             optimizer=self.config.OPTIMIZER,
             epochs=self.config.N_EPOCHS,
+            batch_size=self.config.BATCH_SIZE,
             lr=self.config.LEARNING_RATE,
             weight_decay=self.config.WEIGHT_DECAY,
             loss_margins=self.config.LOSS_MARGINS,
@@ -133,12 +140,42 @@ class Cegis:
 
     def _initialise_verifier(self):
         verifier_type = make_verifier(type=self.config.VERIFIER)
+
+        # branch-and-bound splits the state domain, when it is a box
+        split_domain = None
+        if self.config.VERIFIER_SPLIT_DEPTH > 0:
+            split_domain = self.domains[DomainName.XD.value]
+            assert isinstance(
+                split_domain, Rectangle
+            ), f"domain splitting requires a rectangular state domain, got {split_domain}"
+
+        # smt-lib2 options, only supported by z3-based verifiers
+        smtlib_kwargs = {}
+        if self.config.VERIFIER_SMTLIB_DIR is not None:
+            smtlib_kwargs["smtlib_dir"] = self.config.VERIFIER_SMTLIB_DIR
+        if self.config.VERIFIER_SMTLIB_COMMAND is not None:
+            smtlib_kwargs["solver_command"] = self.config.VERIFIER_SMTLIB_COMMAND
+
         verifier_instance = verifier_type(
             solver_vars=self.x,
             constraints_method=self.certificate.get_constraints,
             rounding=self.config.ROUNDING,
             solver_timeout=self.config.VERIFIER_TIMEOUT,
+            n_workers=self.config.VERIFIER_N_WORKERS,
+            incremental=self.config.VERIFIER_INCREMENTAL,
+            domain_constraints=self.certificate.get_domain_constraints(),
+            n_cex=self.config.VERIFIER_N_CEX,
+            cex_radius=self.config.VERIFIER_CEX_RADIUS,
+            split_domain=split_domain,
+            max_split_depth=self.config.VERIFIER_SPLIT_DEPTH,
+            prescreen_method=(
+                self.certificate.prescreen if self.config.VERIFIER_PRESCREEN else None
+            ),
+            validation_method=self.certificate.validate_counterexamples,
+            adaptive_timeout=self.config.VERIFIER_ADAPTIVE_TIMEOUT,
+            total_timeout=self.config.VERIFIER_TOTAL_TIMEOUT,
             verbose=self.verbose,
+            **smtlib_kwargs,
         )
         return verifier_instance
 
@@ -184,7 +221,7 @@ class Cegis:
 
         return xdot, xdotz, xdot_residual
 
-    def _initialise_data(self) -> dict[str, torch.Tensor]:
+    def _initialise_data(self) -> DatasetStore:
         datasets = {}
         for label, generator in self.data_gen.items():
             datasets[label] = generator(self.config.N_DATA)
@@ -196,7 +233,11 @@ class Cegis:
             + "\n"
         )
 
-        return datasets
+        return DatasetStore(
+            datasets=datasets,
+            capacity=self.config.DATA_CAPACITY,
+            eviction=self.config.DATA_EVICTION,
+        )
 
     def _initialise_certificate(self) -> Certificate:
         certificate_type = make_certificate(certificate_type=self.config.CERTIFICATE)
@@ -204,24 +245,84 @@ class Cegis:
             system=self.f,
             variables=self.x_map,
             domains=self.domains,
+            feasibility_encoding=self.config.FEASIBILITY_ENCODING,
             verbose=self.verbose,
         )
 
     def _initialise_consolidator(self) -> Consolidator:
+        # sets of the columns of each dataset, as concatenated by the data generators
+        dn = DomainName
+        sample_domains = {
+            dn.XI.value: [dn.XI.value],
+            dn.XU.value: [dn.XU.value],
+            dn.XD.value: [dn.XD.value, dn.UD.value],
+            dn.ZD.value: [dn.XD.value, dn.UD.value, dn.ZD.value],
+        }
+        sample_domains = {
+            label: [self.domains[name] for name in names]
+            for label, names in sample_domains.items()
+            if label in self.data_gen and all(name in self.domains for name in names)
+        }
+
         return make_consolidator(
             resampling_n=self.config.RESAMPLING_N,
             resampling_stddev=self.config.RESAMPLING_STDDEV,
+            resampling_distribution=self.config.RESAMPLING_DISTRIBUTION,
+            resampling_containment=self.config.RESAMPLING_CONTAINMENT,
+            domains=sample_domains,
             verbose=self.verbose,
         )
 
     def _initialise_translator(self) -> Translator:
+        pruning_box = None
+        if self.config.NETWORK_PRUNING:
+            # stable neurons are pruned over the bounding box of the state domain
+            pruning_box = self.domains[DomainName.XD.value].get_bounding_box()
+
+        # z3-based verifiers round the coefficients, the weights are rounded alike
+        rounding = self.config.ROUNDING if isinstance(self.verifier, VerifierZ3) else -1
+
         return make_translator(
             certificate_type=self.config.CERTIFICATE,
             verifier_type=self.config.VERIFIER,
             time_domain=self.time_domain,
+            network_encoding=self.config.NETWORK_ENCODING,
+            rounding=rounding,
+            pruning_box=pruning_box,
             verbose=self.verbose,
         )
 
+    def _initialise_verification_cache(self) -> VerificationCache | None:
+        if self.config.VERIFIER_CACHE_DIR is None:
+            return None
+        return VerificationCache(
+            cache_dir=self.config.VERIFIER_CACHE_DIR, verbose=self.verbose
+        )
+
+    def _verification_cache_key(self, state: dict) -> str:
+        return self.verification_cache.make_key(
+            nets={"V_net": state["V_net"], "sigma_net": state["sigma_net"]},
+            certificate_type=self.config.CERTIFICATE,
+            domains=self.domains,
+            settings={
+                "system": self.f.id,
+                "time_domain": self.time_domain,
+                "verifier": self.config.VERIFIER,
+                "smtlib_command": self.config.VERIFIER_SMTLIB_COMMAND,
+                "timeout": self.config.VERIFIER_TIMEOUT,
+                "adaptive_timeout": self.config.VERIFIER_ADAPTIVE_TIMEOUT,
+                "total_timeout": self.config.VERIFIER_TOTAL_TIMEOUT,
+                "rounding": self.config.ROUNDING,
+                "network_encoding": self.config.NETWORK_ENCODING,
+                "network_pruning": self.config.NETWORK_PRUNING,
+                "feasibility_encoding": self.config.FEASIBILITY_ENCODING,
+                "prescreen": self.config.VERIFIER_PRESCREEN,
+                "split_depth": self.config.VERIFIER_SPLIT_DEPTH,
+                "n_cex": self.config.VERIFIER_N_CEX,
+                "cex_radius": self.config.VERIFIER_CEX_RADIUS,
+            },
+        )
+
     def solve(self, n_iterations: int = None) -> CegisResult:
         state = self.init_state()
 
@@ -259,21 +360,65 @@ class Cegis:
                 tag="time_learner", value=elapsed_time, step=self.iteration
             )
 
-            # Translator component
-            self.tlogger.debug("Translator")
-            outputs, elapsed_time = self.translator.translate(**state)
-            state.update(outputs)
-            self.logger.log_scalar(
-                tag="time_translator", value=elapsed_time, step=self.iteration
-            )
+            # Verification cache: on a hit, translation and verification are skipped
+            cache_key, cached_outputs = None, None
+            if self.verification_cache is not None:
+                cache_key = self._verification_cache_key(state=state)
+                cached_outputs = self.verification_cache.load(key=cache_key)
+
+            if cached_outputs is not None:
+                self.tlogger.info("Verification result loaded from cache")
+                state.update(cached_outputs)
+            else:
+                # Translator component
+                self.tlogger.debug("Translator")
+                outputs, elapsed_time = self.translator.translate(**state)
+                state.update(outputs)
+                self.logger.log_scalar(
+                    tag="time_translator", value=elapsed_time, step=self.iteration
+                )
 
-            # Verifier component
-            self.tlogger.debug("Verifier")
-            outputs, elapsed_time = self.verifier.verify(**state)
-            state.update(outputs)
-            self.logger.log_scalar(
-                tag="time_verifier", value=elapsed_time, step=self.iteration
-            )
+                # Verifier component
+                self.tlogger.debug("Verifier")
+                outputs, elapsed_time = self.verifier.verify(**state)
+                state.update(outputs)
+                self.logger.log_scalar(
+                    tag="time_verifier", value=elapsed_time, step=self.iteration
+                )
+                for label, stats in self.verifier.stats.items():
+                    for name, value in stats.items():
+                        self.logger.log_scalar(
+                            tag=f"verifier_{name}",
+                            value=float(value),
+                            step=self.iteration,
+                            context={"verifier": label},
+                        )
+                if self.verifier.timed_out_labels:
+                    self.tlogger.info(
+                        f"Timed out conditions: {self.verifier.timed_out_labels}"
+                    )
+
+                # results with timed out conditions are not definitive, they are solved again
+                if cache_key is not None and not self.verifier.unresolved_labels:
+                    self.verification_cache.save(key=cache_key, outputs=outputs)
+
+            # Counterexample refinement, towards the worst-case violations
+            if self.config.CEX_REFINEMENT_STEPS > 0 and not state["found"]:
+                self.tlogger.debug("Counterexample refinement")
+                refine_fn = timed(self.certificate.refine_counterexamples)
+                cex, elapsed_time = refine_fn(
+                    cex=state["cex"],
+                    V_net=state["V_net"],
+                    f_torch=state["xdot_func"],
+                    n_steps=self.config.CEX_REFINEMENT_STEPS,
+                    step_size=self.config.CEX_REFINEMENT_STEP_SIZE,
+                    n_samples=self.config.CEX_REFINEMENT_N,
+                    stddev=self.config.RESAMPLING_STDDEV,
+                )
+                state["cex"] = cex
+                self.logger.log_scalar(
+                    tag="time_refinement", value=elapsed_time, step=self.iteration
+                )
 
             # Consolidator component
             self.tlogger.debug("Consolidator")
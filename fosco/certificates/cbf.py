@@ -1,5 +1,5 @@
 import math
-from typing import Generator, Callable
+from typing import Generator, Callable, Optional
 
 import numpy as np
 import torch
@@ -7,11 +7,19 @@ from torch.optim import Optimizer
 
 from fosco.config import CegisConfig
 from fosco.certificates.certificate import Certificate, TrainableCertificate
+from fosco.common.bounds import Interval, network_bounds, network_gradient_bounds
 from fosco.common.domains import Set, Rectangle
-from fosco.common.consts import DomainName, LossReLUType, TimeDomain
-from fosco.common.utils import _set_assertion
-from fosco.models import TorchSymDiffFn
+from fosco.common.consts import (
+    DomainName,
+    FeasibilityEncoding,
+    LossReLUType,
+    TimeDomain,
+)
+from fosco.common.utils import _set_assertion, stratified_batch_indices
+from fosco.consolidator.dataset_store import DatasetStore
+from fosco.models import TorchMLP, TorchSymDiffFn
 from fosco.verifier.types import SYMBOL
+from fosco.verifier.utils import get_solver_fns
 from fosco.systems import ControlAffineDynamics
 
 XD = DomainName.XD.value
@@ -28,7 +36,8 @@ class ControlBarrierFunction(Certificate):
         system {ControlAffineDynamics}: control affine dynamics
         vars {dict}: dictionary of symbolic variables
         domains {dict}: dictionary of (string,domain) pairs
-        config {CegisConfig}: configuration object
+        feasibility_encoding {FeasibilityEncoding}: encoding of the input set in the feasibility condition,
+            either enumerating its vertices or in closed form over the box (continuous time only)
         verbose {int}: verbosity level
     """
 
@@ -37,8 +46,13 @@ class ControlBarrierFunction(Certificate):
         system: ControlAffineDynamics,
         variables: dict[str, list],
         domains: dict[str, Set],
+        feasibility_encoding: str | FeasibilityEncoding = FeasibilityEncoding.VERTICES,
         verbose: int = 0,
     ) -> None:
+        if isinstance(feasibility_encoding, str):
+            feasibility_encoding = FeasibilityEncoding[feasibility_encoding.upper()]
+        self.feasibility_encoding = feasibility_encoding
+
         # todo rename vars to x, u
         self.x_vars = variables["v"]
         self.u_vars = variables["u"]
@@ -74,6 +88,11 @@ class ControlBarrierFunction(Certificate):
             self.u_set, Rectangle
         ), f"CBF only works with rectangular input domains, got {self.u_set}"
 
+        assert (
+            self.feasibility_encoding == FeasibilityEncoding.VERTICES
+            or self.system.time_domain == TimeDomain.CONTINUOUS
+        ), f"Box encoding of the feasibility condition requires continuous time, got {self.system.time_domain}"
+
     def get_constraints(
         self,
         verifier,
@@ -147,6 +166,310 @@ class ControlBarrierFunction(Certificate):
         ):
             yield cs
 
+    def get_domain_constraints(self) -> dict[str, SYMBOL]:
+        _And = get_solver_fns(x=self.x_vars)["And"]
+        return {
+            XD: self.x_domain,
+            XI: _And(self.initial_domain, self.x_domain),
+            XU: _And(self.unsafe_domain, self.x_domain),
+        }
+
+    def prescreen(
+        self,
+        V_net,
+        box: tuple[tuple[float, ...], tuple[float, ...]] = None,
+        **kwargs,
+    ) -> dict[str, bool]:
+        """
+        Checks the conditions with interval bound propagation over the bounding box of their domains.
+        The bounds are sound but conservative: a condition marked True holds everywhere in its domain,
+        while False means that the bounds are not tight enough to prove it.
+
+        Args:
+            V_net: barrier model, with `layers` and `acts` as TorchMLP
+            box: optional lower and upper bounds of the states, to check the conditions in a sub-box
+
+        Returns:
+            dict: {label: True if the condition is proven} for the conditions which have been checked
+        """
+        if not all(hasattr(V_net, attr) for attr in ["layers", "acts"]):
+            return {}
+
+        results = {}
+        if box is not None:
+            box = tuple([torch.tensor(b, dtype=torch.float64) for b in box])
+        x_box = self._bounding_box(XD, outer_box=box)
+        if x_box is None:
+            return results
+        if self._is_empty(x_box):
+            return {XD: True, XI: True, XU: True}
+
+        # initial condition: B >= 0 in the initial set
+        init_box = self._bounding_box(XI, outer_box=x_box)
+        if init_box is not None:
+            results[XI] = (
+                self._is_empty(init_box)
+                or network_bounds(V_net, *init_box)[0].min() >= 0
+            )
+
+        # unsafe condition: B < 0 in the unsafe set
+        unsafe_box = self._bounding_box(XU, outer_box=x_box)
+        if unsafe_box is not None:
+            results[XU] = (
+                self._is_empty(unsafe_box)
+                or network_bounds(V_net, *unsafe_box)[1].max() < 0
+            )
+
+        # feasibility condition: B < 0 or exists u such that Bdot + alpha(B) >= 0
+        results[XD] = self._prescreen_feasibility(V_net, x_box)
+
+        results = {label: bool(proven) for label, proven in results.items()}
+        self._logger.debug(f"Prescreen results: {results}")
+        return results
+
+    def _prescreen_feasibility(self, V_net, x_box) -> bool:
+        B_lb, B_ub = network_bounds(V_net, *x_box)
+        if B_ub.max() < 0:
+            return True
+
+        if self.system.time_domain != TimeDomain.CONTINUOUS:
+            return False
+
+        # natural interval extension of the symbolic dynamics
+        x = [Interval(lb, ub) for lb, ub in zip(*x_box)]
+        try:
+            fx = [Interval.wrap(f_i) for f_i in self.system.fx_smt(x)]
+            gx = [
+                [Interval.wrap(g_ij) for g_ij in g_i] for g_i in self.system.gx_smt(x)
+            ]
+        except Exception as e:
+            # dynamics not expressible with interval arithmetic (eg., trigonometric functions)
+            self._logger.debug(f"Cannot bound the dynamics: {e}")
+            return False
+
+        grad_lb, grad_ub = network_gradient_bounds(V_net, *x_box)
+        gradB = [Interval(lb, ub) for lb, ub in zip(grad_lb[0], grad_ub[0])]
+        B = Interval(B_lb.item(), B_ub.item())
+        alpha = lambda x: x
+
+        for u_vert in self.u_set.get_vertices():
+            xdot = [
+                fx_i + sum(g_ij * float(u_j) for g_ij, u_j in zip(gx_i, u_vert))
+                for fx_i, gx_i in zip(fx, gx)
+            ]
+            Bdot = sum(dB_i * xdot_i for dB_i, xdot_i in zip(gradB, xdot))
+            if (Bdot + alpha(B)).lb >= 0:
+                return True
+
+        return False
+
+    def _bounding_box(
+        self, label: str, outer_box: tuple[torch.Tensor, torch.Tensor] = None
+    ) -> tuple[torch.Tensor, torch.Tensor] | None:
+        """
+        Returns the bounding box of the domain intersected with outer_box, or None if not available.
+        The returned box is empty if the domain does not intersect outer_box.
+        """
+        domain = self.domains[label]
+        box = None
+        if tuple(domain.vars) == tuple(self.system.vars):
+            try:
+                box = domain.get_bounding_box()
+            except NotImplementedError:
+                box = None
+
+        if box is not None:
+            lb, ub = [torch.tensor(b, dtype=torch.float64) for b in box]
+        elif outer_box is not None:
+            lb, ub = outer_box
+        else:
+            return None
+
+        if outer_box is not None:
+            lb, ub = torch.maximum(lb, outer_box[0]), torch.minimum(ub, outer_box[1])
+        return lb, ub
+
+    @staticmethod
+    def _is_empty(box: tuple[torch.Tensor, torch.Tensor]) -> bool:
+        return bool(torch.any(box[0] > box[1]))
+
+    def refine_counterexamples(
+        self,
+        cex: dict[str, torch.Tensor | None],
+        V_net,
+        f_torch: Callable,
+        n_steps: int = 10,
+        step_size: float = 0.01,
+        n_samples: int = 10,
+        stddev: float = 0.01,
+        **kwargs,
+    ) -> dict[str, torch.Tensor | None]:
+        """
+        Refines the counterexamples with projected gradient ascent on the violation of each condition,
+        starting from the counterexamples and from random neighbours of them.
+        The worst-case point found from each start is added to the counterexamples
+        if it violates the condition numerically and lies in the domain.
+
+        Args:
+            cex: counterexamples, as {label: tensor or None}
+            V_net: barrier model
+            f_torch: numerical dynamics, xdot = f(x, u)
+            n_steps: number of gradient steps
+            step_size: step size, relative to the width of the domain bounding box
+            n_samples: number of random neighbours of each counterexample
+            stddev: standard deviation of the random neighbours
+
+        Returns:
+            dict: counterexamples followed by the refined points, as {label: tensor or None}
+        """
+        refined = {}
+        for label, points in cex.items():
+            box = (
+                self._bounding_box(label) if label in self._refinable_labels() else None
+            )
+            if points is None or box is None or self._is_empty(box):
+                refined[label] = points
+                continue
+
+            lb, ub = [b.to(points.dtype) for b in box]
+            x0 = points[:, : self.n_vars]
+            x = torch.cat(
+                [
+                    x0,
+                    x0.repeat(n_samples, 1)
+                    + stddev * torch.randn(n_samples * len(x0), self.n_vars),
+                ]
+            )
+            x = torch.clamp(x, lb, ub).detach()
+            x_best = x.clone()
+            v_best = torch.full((len(x),), -torch.inf, dtype=x.dtype)
+
+            for step in range(n_steps + 1):
+                x.requires_grad_(True)
+                violation = self._violation(label, V_net, f_torch, x)
+                improved = violation.detach() > v_best
+                x_best[improved] = x.detach()[improved]
+                v_best[improved] = violation.detach()[improved]
+                if step == n_steps:
+                    break
+
+                grad = torch.autograd.grad(violation.sum(), x)[0]
+                x = torch.clamp(
+                    x.detach() + step_size * (ub - lb) * grad.sign(), lb, ub
+                )
+
+            x_best = x_best.detach()
+            valid = (v_best > 0) & self.domains[label].check_containment(x_best)
+            if label != XD:
+                valid = valid & self.domains[XD].check_containment(x_best)
+            new_points = x_best[valid]
+            if label == XD:
+                u_best = self._worst_case_input(V_net, f_torch, new_points)
+                new_points = torch.cat([new_points, u_best], dim=1)
+
+            self._logger.debug(
+                f"{label}: {len(new_points)} refined counterexamples, "
+                f"max violation {v_best.max().item():.4f}"
+            )
+            refined[label] = torch.cat([points, new_points.to(points.dtype)], dim=0)
+
+        return refined
+
+    def validate_counterexamples(
+        self,
+        cex: dict[str, torch.Tensor | None],
+        V_net,
+        xdot_func: Callable,
+        tolerance: float = 1e-6,
+        **kwargs,
+    ) -> dict[str, torch.Tensor]:
+        """
+        Checks which counterexamples violate their condition when evaluated with the models,
+        instead of their rounded symbolic translation.
+
+        Args:
+            cex: counterexamples, as {label: tensor or None}
+            V_net: barrier model
+            xdot_func: numerical dynamics, xdot = f(x, u)
+            tolerance: numerical tolerance on the violation
+
+        Returns:
+            dict: {label: boolean tensor}, True for the counterexamples which violate the condition
+        """
+        if not isinstance(V_net, torch.nn.Module):
+            return {}
+
+        validity = {}
+        for label, points in cex.items():
+            if points is None or label not in self._refinable_labels():
+                continue
+            x = points[:, : self.n_vars].to(torch.get_default_dtype())
+            violation = self._violation(label, V_net, xdot_func, x).detach()
+            validity[label] = violation >= -tolerance
+        return validity
+
+    def _refinable_labels(self) -> list[str]:
+        if self.system.time_domain == TimeDomain.CONTINUOUS:
+            return [XD, XI, XU]
+        return [XI, XU]
+
+    def _violation(
+        self, label: str, V_net, f_torch: Callable, x: torch.Tensor
+    ) -> torch.Tensor:
+        """
+        Violation of the condition in each state, positive when the condition does not hold.
+        """
+        B = V_net(x)[:, 0]
+        if label == XI:
+            return -B
+        elif label == XU:
+            return B
+        elif label == XD:
+            # both B >= 0 and Bdot + alpha(B) < 0 for all inputs
+            Bdot_max, _ = self._max_lie_derivative(V_net, f_torch, x)
+            return torch.minimum(B, -(Bdot_max + B))
+        raise NotImplementedError(f"Violation not implemented for {label}")
+
+    def _max_lie_derivative(
+        self, V_net, f_torch: Callable, x: torch.Tensor
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        Maximum over the input box of the Lie derivative, which is affine in the inputs.
+        Returns the maximum and the maximizing input.
+        """
+        lb = torch.tensor(self.u_set.lower_bounds, dtype=x.dtype)
+        ub = torch.tensor(self.u_set.upper_bounds, dtype=x.dtype)
+        center, radius = (ub + lb) / 2.0, (ub - lb) / 2.0
+
+        # the gradient does not depend on the input, compute it once for all the inputs
+        db_dx = V_net.gradient(x)
+
+        def lie_derivative(u: torch.Tensor) -> torch.Tensor:
+            return TrainableCBF._compute_barrier_difference(
+                X_d=x,
+                U_d=u.repeat(len(x), 1),
+                barrier=V_net,
+                f_torch=f_torch,
+                db_dx=db_dx,
+            )
+
+        Bdot_c = lie_derivative(center)
+        Bdot_max, u_max = Bdot_c, center.repeat(len(x), 1)
+        for i in range(self.n_controls):
+            u = center.clone()
+            u[i] += radius[i]
+            slope = lie_derivative(u) - Bdot_c
+            Bdot_max = Bdot_max + slope.abs()
+            u_max[:, i] = center[i] + torch.sign(slope.detach()) * radius[i]
+        return Bdot_max, u_max
+
+    def _worst_case_input(
+        self, V_net, f_torch: Callable, x: torch.Tensor
+    ) -> torch.Tensor:
+        if len(x) == 0:
+            return torch.zeros((0, self.n_controls), dtype=x.dtype)
+        return self._max_lie_derivative(V_net, f_torch, x)[1].detach()
+
     def _init_constraint_smt(self, verifier, B, B_constr) -> SYMBOL:
         """
         Initial constraint for CBF: the barrier must be non-negative in the initial set.
@@ -199,11 +522,21 @@ class ControlBarrierFunction(Certificate):
         _Substitute = verifier.solver_fncts()["Substitute"]
         _RealVal = verifier.solver_fncts()["RealVal"]
 
-        u_vertices = self.u_set.get_vertices()
         lie_constr = B >= 0
         for c in B_constr:
             lie_constr = _And(lie_constr, c)
         lie_constr = _And(lie_constr, self.x_domain)
+
+        if self.feasibility_encoding == FeasibilityEncoding.BOX:
+            Bdot_max, Bdot_max_constr = self._input_box_max(
+                verifier=verifier, expr=Bdot, expr_constr=Bdot_constr
+            )
+            box_constr = Bdot_max + alpha(B) < 0
+            for c in Bdot_max_constr:
+                box_constr = _And(box_constr, c)
+            return _And(lie_constr, box_constr)
+
+        u_vertices = self.u_set.get_vertices()
         for u_vert in u_vertices:
             vertex_constr = Bdot + alpha(B) < 0
             for c in Bdot_constr:
@@ -214,6 +547,45 @@ class ControlBarrierFunction(Certificate):
 
         return lie_constr
 
+    def _input_box_max(
+        self, verifier, expr: SYMBOL, expr_constr: list[SYMBOL]
+    ) -> tuple[SYMBOL, list[SYMBOL]]:
+        """
+        Maximum over the input box of an expression affine in the inputs, e(x, u) = a(x) + b(x)^T u.
+        In closed form, max_u e(x, u) = e(x, c) + sum_i |e(x, c + r_i e_i) - e(x, c)|,
+        where c is the center of the box and r_i its half-width along the i-th input.
+
+        The expression is substituted in m+1 points, instead of the 2^m vertices of the box.
+
+        Returns:
+            tuple: maximum of the expression and its constraints, substituted in each point
+        """
+        _If = verifier.solver_fncts()["If"]
+        _Substitute = verifier.solver_fncts()["Substitute"]
+        _RealVal = verifier.solver_fncts()["RealVal"]
+
+        lb, ub = np.array(self.u_set.lower_bounds), np.array(self.u_set.upper_bounds)
+        center, radius = (ub + lb) / 2.0, (ub - lb) / 2.0
+
+        def substitute(e, u_vals):
+            for u_var, u_val in zip(self.u_vars, u_vals):
+                e = _Substitute(e, (u_var, _RealVal(float(u_val))))
+            return e
+
+        expr_c = substitute(expr, center)
+        expr_max = expr_c
+        constrs = [substitute(c, center) for c in expr_constr]
+        for i in range(self.n_controls):
+            if radius[i] == 0.0:
+                continue
+            u_vals = center.copy()
+            u_vals[i] += radius[i]
+            delta = substitute(expr, u_vals) - expr_c
+            expr_max = expr_max + _If(delta >= 0, delta, -delta)
+            constrs += [substitute(c, u_vals) for c in expr_constr]
+
+        return expr_max, constrs
+
 
 class TrainableCBF(TrainableCertificate, ControlBarrierFunction):
     @staticmethod
@@ -240,36 +612,80 @@ class TrainableCBF(TrainableCertificate, ControlBarrierFunction):
 
         condition_old = False
 
-        i1 = datasets[XD].shape[0]
-        i2 = datasets[XI].shape[0]
-
         label_order = [XD, XI, XU]
-        state_samples = torch.cat(
-            [datasets[label][:, :n_vars] for label in label_order]
-        )
-
         losses, accuracies, infos = {}, {}, {}
+        priorities = {}  # label -> loss of each sample in the last epoch
         for t in range(learner.epochs):
-            optimizers["barrier"].zero_grad()
-
-            # net gradient
-            B = learner.net(state_samples)
-
-            B_d = B[:i1, 0]
-            B_i = B[i1 : i1 + i2, 0]
-            B_u = B[i1 + i2 :, 0]
-
-            # compute lie derivative
-            Bdot_d = TrainableCBF._compute_barrier_difference(
-                X_d=datasets[XD][:, :n_vars],
-                U_d=datasets[XD][:, n_vars : n_vars + n_controls],
-                barrier=learner.net,
-                f_torch=f_torch,
-            )
-
-            loss, losses, accuracies = TrainableCBF._compute_loss(
-                learner=learner, B_i=B_i, B_u=B_u, B_d=B_d, Bdot_d=Bdot_d, alpha=1.0
+            batches = stratified_batch_indices(
+                sizes={label: datasets[label].shape[0] for label in label_order},
+                batch_size=learner.batch_size,
             )
+            batch_losses, batch_accuracies = [], []
+            priorities = {
+                label: torch.zeros(len(datasets[label])) for label in label_order
+            }
+            for b, indices in enumerate(batches):
+                batch = {
+                    label: datasets[label][indices[label]] for label in label_order
+                }
+
+                i1 = batch[XD].shape[0]
+                i2 = batch[XI].shape[0]
+                state_samples = torch.cat(
+                    [batch[label][:, :n_vars] for label in label_order]
+                )
+
+                optimizers["barrier"].zero_grad()
+
+                # net output and gradient
+                B, gradB = TrainableCBF._value_and_gradient(
+                    net=learner.net, x=state_samples
+                )
+
+                B_d = B[:i1, 0]
+                B_i = B[i1 : i1 + i2, 0]
+                B_u = B[i1 + i2 :, 0]
+
+                # compute lie derivative
+                Bdot_d = TrainableCBF._compute_barrier_difference(
+                    X_d=batch[XD][:, :n_vars],
+                    U_d=batch[XD][:, n_vars : n_vars + n_controls],
+                    barrier=learner.net,
+                    f_torch=f_torch,
+                    db_dx=gradB[:i1],
+                )
+
+                loss, losses, accuracies = TrainableCBF._compute_loss(
+                    learner=learner,
+                    B_i=B_i,
+                    B_u=B_u,
+                    B_d=B_d,
+                    Bdot_d=Bdot_d,
+                    alpha=1.0,
+                )
+                batch_losses.append(losses)
+                batch_accuracies.append(accuracies)
+
+                # per-sample losses, as priorities of the samples on eviction
+                with torch.no_grad():
+                    label_losses = TrainableCBF._label_losses(
+                        learner=learner,
+                        B_i=B_i,
+                        B_u=B_u,
+                        B_d=B_d,
+                        Bdot_d=Bdot_d,
+                        alpha=1.0,
+                    )
+                for label, sample_loss in label_losses.items():
+                    priorities[label][indices[label]] = sample_loss.cpu()
+
+                # the last batch is stepped after the early-stopping check
+                if b < len(batches) - 1:
+                    loss.backward()
+                    optimizers["barrier"].step()
+
+            losses = TrainableCBF._mean_metrics(batch_losses)
+            accuracies = TrainableCBF._mean_metrics(batch_accuracies)
 
             if t % math.ceil(learner.epochs / 10) == 0 or learner.epochs - t < 10:
                 # log_loss_acc(t, loss, accuracy, learner.verbose)
@@ -285,15 +701,73 @@ class TrainableCBF(TrainableCertificate, ControlBarrierFunction):
             optimizers["barrier"].step()
             infos = {}
 
+        TrainableCBF._set_priorities(datasets=datasets, priorities=priorities)
+
         return {
             "loss": losses,
             "accuracy": accuracies,
             "info": infos,
         }
 
+    @staticmethod
+    def _label_losses(learner, **kwargs) -> dict[str, torch.Tensor]:
+        """
+        Computes the loss of each sample of the init, unsafe and lie domains (see _sample_losses).
+
+        Returns:
+            dict: losses, as {domain: tensor of shape (n_samples,)}
+        """
+        sample_losses = TrainableCBF._sample_losses(learner=learner, **kwargs)
+        return {
+            XI: sample_losses["init_loss"],
+            XU: sample_losses["unsafe_loss"],
+            XD: sample_losses["lie_loss"] + sample_losses["conservative_b_loss"],
+        }
+
+    @staticmethod
+    def _set_priorities(datasets, priorities: dict[str, torch.Tensor]) -> None:
+        """
+        Sets the per-sample losses of the last epoch as priorities of the counterexamples,
+        so that the priority eviction keeps the samples with the highest loss (see DatasetStore).
+        """
+        if not isinstance(datasets, DatasetStore):
+            return
+        for label, priority in priorities.items():
+            buffer = datasets.buffers[label]
+            buffer.set_priorities(priority[buffer.n_original :])
+
+    @staticmethod
+    def _mean_metrics(metrics: list[dict[str, float]]) -> dict[str, float]:
+        """
+        Averages the metrics (eg., losses, accuracies) over the mini-batches of an epoch.
+        """
+        if len(metrics) == 1:
+            return metrics[0]
+        return {k: float(np.mean([m[k] for m in metrics])) for k in metrics[0]}
+
+    @staticmethod
+    def _value_and_gradient(
+        net: TorchSymDiffFn, x: torch.Tensor
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        Computes the output of the network and its gradient w.r.t. the input.
+        Mlps compute both in a single forward pass, other models with a forward and a gradient pass.
+
+        Returns:
+            tuple: output of shape (batch_size, 1), gradient of shape (batch_size, n_vars)
+        """
+        if isinstance(net, TorchMLP):
+            y, jacobian = net.forward_with_jacobian(x)
+            return y, jacobian.sum(dim=1)
+        return net(x), net.gradient(x)
+
     @staticmethod
     def _compute_barrier_difference(
-        X_d: torch.Tensor, U_d: torch.Tensor, barrier: TorchSymDiffFn, f_torch: Callable
+        X_d: torch.Tensor,
+        U_d: torch.Tensor,
+        barrier: TorchSymDiffFn,
+        f_torch: Callable,
+        db_dx: Optional[torch.Tensor] = None,
     ) -> torch.Tensor:
         """
         Computes the change over time of the barrier function subject to the system dynamics.
@@ -304,13 +778,15 @@ class TrainableCBF(TrainableCertificate, ControlBarrierFunction):
             U_d (torch.Tensor): batch of inputs of shape (batch_size, n_controls)
             barrier (TorchSymDiffFn): barrier function
             f_torch (Callable): system dynamics, xdot=f(x,u) for ct, x_{k+1}=f(x_k,u_k) for dt
+            db_dx (torch.Tensor): gradient of the barrier in X_d, if already computed (optional)
         """
         assert (
             X_d.shape[0] == U_d.shape[0]
         ), f"expected pairs of state,input data. Got {X_d.shape[0], U_d.shape[0]}"
 
         # Lie derivative of B: dB/dt = dB/dx * dx/dt
-        db_dx = barrier.gradient(X_d)
+        if db_dx is None:
+            db_dx = barrier.gradient(X_d)
         dx_dt = f_torch(X_d, U_d)
         db_dt = torch.sum(torch.mul(db_dx, dx_dt), dim=1)
 
@@ -351,11 +827,6 @@ class TrainableCBF(TrainableCertificate, ControlBarrierFunction):
         margin_unsafe = learner.loss_margins["unsafe"]
         margin_lie = learner.loss_margins["lie"]
 
-        weight_init = learner.loss_weights["init"]
-        weight_unsafe = learner.loss_weights["unsafe"]
-        weight_lie = learner.loss_weights["lie"]
-        weight_conservative_b = learner.loss_weights["conservative_b"]
-
         accuracy_i = (B_i >= margin_init).count_nonzero().item()
         accuracy_u = (B_u < -margin_unsafe).count_nonzero().item()
         accuracy_d = (Bdot_d + alpha * B_d >= margin_lie).count_nonzero().item()
@@ -364,18 +835,13 @@ class TrainableCBF(TrainableCertificate, ControlBarrierFunction):
         percent_accuracy_unsafe = 100 * accuracy_u / B_u.shape[0]
         percent_accuracy_lie = 100 * accuracy_d / Bdot_d.shape[0]
 
-        # penalize B_i < 0
-        init_loss = weight_init * (learner.loss_relu(margin_init - B_i)).mean()
-        # penalize B_u > 0
-        unsafe_loss = weight_unsafe * (learner.loss_relu(B_u + margin_unsafe)).mean()
-        # penalize when B_d > 0 and dB_d + alpha * B_d < 0
-        loss_cond = torch.min(B_d - margin_lie, margin_lie - (Bdot_d + alpha * B_d))
-        lie_loss = weight_lie * (learner.loss_relu(loss_cond)).mean()
-
-        # regularization losses
-        # penalize negative B (conservative)
-        loss_B_neg = learner.loss_relu(-B_d).mean()  # penalize B_d < 0
-        loss_B_conservative = weight_conservative_b * loss_B_neg
+        sample_losses = TrainableCBF._sample_losses(
+            learner=learner, B_i=B_i, B_u=B_u, B_d=B_d, Bdot_d=Bdot_d, alpha=alpha
+        )
+        init_loss = sample_losses["init_loss"].mean()
+        unsafe_loss = sample_losses["unsafe_loss"].mean()
+        lie_loss = sample_losses["lie_loss"].mean()
+        loss_B_conservative = sample_losses["conservative_b_loss"].mean()
 
         loss = init_loss + unsafe_loss + lie_loss + loss_B_conservative
 
@@ -399,3 +865,40 @@ class TrainableCBF(TrainableCertificate, ControlBarrierFunction):
         )
 
         return loss, losses, accuracy
+
+    @staticmethod
+    def _sample_losses(
+        learner,
+        B_i: torch.Tensor,
+        B_u: torch.Tensor,
+        B_d: torch.Tensor,
+        Bdot_d: torch.Tensor,
+        alpha: torch.Tensor | float,
+    ) -> dict[str, torch.Tensor]:
+        """
+        Computes the loss terms of each sample, before averaging (see _compute_loss).
+
+        Returns:
+            dict: loss terms, as {name: tensor of shape (n_samples,)}
+        """
+        margin_init = learner.loss_margins["init"]
+        margin_unsafe = learner.loss_margins["unsafe"]
+        margin_lie = learner.loss_margins["lie"]
+
+        weight_init = learner.loss_weights["init"]
+        weight_unsafe = learner.loss_weights["unsafe"]
+        weight_lie = learner.loss_weights["lie"]
+        weight_conservative_b = learner.loss_weights["conservative_b"]
+
+        # penalize when B_d > 0 and dB_d + alpha * B_d < 0
+        loss_cond = torch.min(B_d - margin_lie, margin_lie - (Bdot_d + alpha * B_d))
+
+        return {
+            # penalize B_i < 0
+            "init_loss": weight_init * learner.loss_relu(margin_init - B_i),
+            # penalize B_u > 0
+            "unsafe_loss": weight_unsafe * learner.loss_relu(B_u + margin_unsafe),
+            "lie_loss": weight_lie * learner.loss_relu(loss_cond),
+            # regularization: penalize negative B (conservative)
+            "conservative_b_loss": weight_conservative_b * learner.loss_relu(-B_d),
+        }
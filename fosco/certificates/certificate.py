@@ -2,6 +2,7 @@ import logging
 from abc import abstractmethod, ABC
 
 import numpy as np
+import torch
 
 from fosco.config import CegisConfig
 from fosco.common.domains import Set
@@ -41,6 +42,41 @@ class Certificate(ABC):
         # update this to return a dictionary of tuples (spec, domain)
         raise NotImplementedError
 
+    def get_domain_constraints(self) -> dict[str, SYMBOL]:
+        """
+        Returns the domain constraints of each condition, as {label: constraint}.
+        These constraints do not depend on the learned functions and do not change across cegis iterations.
+        """
+        return {}
+
+    def prescreen(self, **kwargs) -> dict[str, bool]:
+        """
+        Checks the conditions numerically before verification, eg. with interval bound propagation.
+        Returns {label: True} for the conditions proven to hold, which do not need to be verified.
+        By default, no condition is checked.
+        """
+        return {}
+
+    def refine_counterexamples(
+        self, cex: dict[str, torch.Tensor | None], **kwargs
+    ) -> dict[str, torch.Tensor | None]:
+        """
+        Refines the counterexamples numerically, eg. moving them towards the worst-case violation.
+        Returns the counterexamples in the same format, as {label: tensor or None}.
+        By default, the counterexamples are returned unchanged.
+        """
+        return cex
+
+    def validate_counterexamples(
+        self, cex: dict[str, torch.Tensor | None], **kwargs
+    ) -> dict[str, torch.Tensor]:
+        """
+        Checks numerically which counterexamples violate their condition.
+        Returns {label: boolean tensor} for the conditions which have been checked.
+        By default, no condition is checked.
+        """
+        return {}
+
 
 class TrainableCertificate(Certificate):
     """
@@ -10,8 +10,9 @@ from torch.optim import Optimizer
 from fosco.certificates.cbf import ControlBarrierFunction, TrainableCBF
 from fosco.config import CegisConfig
 from fosco.common.domains import Set, Rectangle
-from fosco.common.consts import DomainName
-from fosco.common.utils import _set_assertion
+from fosco.common.consts import DomainName, FeasibilityEncoding
+from fosco.common.utils import _set_assertion, stratified_batch_indices
+from fosco.verifier.utils import get_solver_fns
 from fosco.verifier.verifier import SYMBOL
 from fosco.systems import ControlAffineDynamics
 
@@ -48,10 +49,15 @@ class RobustControlBarrierFunction(ControlBarrierFunction):
         system: ControlAffineDynamics,
         variables: dict[str, list[SYMBOL]],
         domains: dict[str, Set],
+        feasibility_encoding: str | FeasibilityEncoding = FeasibilityEncoding.VERTICES,
         verbose: int = 0,
     ) -> None:
         super().__init__(
-            system=system, variables=variables, domains=domains, verbose=verbose
+            system=system,
+            variables=variables,
+            domains=domains,
+            feasibility_encoding=feasibility_encoding,
+            verbose=verbose,
         )
 
         self.z_vars = variables["z"]
@@ -192,6 +198,25 @@ class RobustControlBarrierFunction(ControlBarrierFunction):
         ):
             yield cs
 
+    def get_domain_constraints(self) -> dict[str, SYMBOL]:
+        _And = get_solver_fns(x=self.x_vars)["And"]
+        domain_constraints = super().get_domain_constraints()
+        domain_constraints[ZD] = _And(self.x_domain, self.z_domain, self.u_domain)
+        return domain_constraints
+
+    def prescreen(self, V_net, box=None, **kwargs) -> dict[str, bool]:
+        """
+        Checks the initial and unsafe conditions with interval bound propagation.
+        The feasibility and robustness conditions depend on the compensator and are always verified.
+        """
+        results = super().prescreen(V_net=V_net, box=box, **kwargs)
+        results.pop(XD, None)
+        return results
+
+    def _refinable_labels(self) -> list[str]:
+        # feasibility and robustness depend on the compensator, only refine initial and unsafe conditions
+        return [XI, XU]
+
     def _feasibility_constraint_smt(
         self, verifier, B, B_constr, sigma, sigma_constr, Bdot, Bdot_constr, alpha
     ) -> SYMBOL:
@@ -208,12 +233,22 @@ class RobustControlBarrierFunction(ControlBarrierFunction):
         _Substitute = verifier.solver_fncts()["Substitute"]
         _RealVal = verifier.solver_fncts()["RealVal"]
 
-        u_vertices = self.u_set.get_vertices()
         lie_constr = B >= 0
         for c in B_constr:
             lie_constr = _And(lie_constr, c)
         lie_constr = _And(lie_constr, self.x_domain)
 
+        if self.feasibility_encoding == FeasibilityEncoding.BOX:
+            # the compensator does not depend on the input, so Bdot - sigma is affine in u
+            Bdot_max, Bdot_max_constr = self._input_box_max(
+                verifier=verifier, expr=Bdot - sigma, expr_constr=Bdot_constr
+            )
+            box_constr = Bdot_max + alpha(B) < 0
+            for c in Bdot_max_constr + sigma_constr + B_constr:
+                box_constr = _And(box_constr, c)
+            return _And(lie_constr, box_constr)
+
+        u_vertices = self.u_set.get_vertices()
         for u_vert in u_vertices:
             # this is different from vanilla cbf because of the compensator sigma
             vertex_constr = Bdot - sigma + alpha(B) < 0
@@ -304,97 +339,150 @@ class TrainableRCBF(TrainableCBF, RobustControlBarrierFunction):
         assert "xsigma" in optimizers, f"Missing optimizer 'xsigma', got {optimizers}"
 
         condition_old = False
-        i1 = datasets[XD].shape[0]
-        i2 = datasets[XI].shape[0]
-        i3 = datasets[XU].shape[0]
-
-        states_d = torch.cat([datasets[label][:, :n_vars] for label in [XD, XI, XU]])
-        input_d = datasets[XD][:, n_vars : n_vars + n_controls]
-
-        states_dz = datasets[ZD][:, :n_vars]
-        input_dz = datasets[ZD][:, n_vars : n_vars + n_controls]
-        uncert_dz = datasets[ZD][
-            :, n_vars + n_controls : n_vars + n_controls + n_uncertain,
-        ]
+        label_order = [XD, XI, XU, ZD]
 
         losses, accuracies, infos = {}, {}, {}
+        priorities = {}  # label -> loss of each sample in the last epoch
         for t in range(learner.epochs):
-            optimizers["barrier"].zero_grad()
-
-            # compute output for barrier loss
-            B = learner.net(states_d)
-            gradB = learner.net.gradient(states_d)
-            sigma = learner.xsigma(states_d)
-
-            B_d = B[:i1, 0]
-            B_i = B[i1 : i1 + i2, 0]
-            B_u = B[i1 + i2 : i1 + i2 + i3, 0]
-
-            assert (
-                B_d.shape[0] == input_d.shape[0]
-            ), f"expected pairs of state,input data. Got {B_d.shape[0]} and {input_d.shape[0]}"
-            sigma_d = sigma[:i1, 0]
-            Bdot_d = TrainableRCBF._compute_barrier_difference(
-                X_d=datasets[XD][:, :n_vars],
-                U_d=datasets[XD][:, n_vars : n_vars + n_controls],
-                barrier=learner.net,
-                f_torch=partial(f_torch, z=None, only_nominal=True),
-            )
-
-            (
-                barrier_loss,
-                barrier_losses,
-                barrier_accuracies,
-            ) = TrainableRCBF._compute_loss(
-                learner=learner,
-                B_i=B_i,
-                B_u=B_u,
-                B_d=B_d,
-                Bdot_d=Bdot_d - sigma_d,
-                alpha=1.0,
+            batches = stratified_batch_indices(
+                sizes={label: datasets[label].shape[0] for label in label_order},
+                batch_size=learner.batch_size,
             )
-
-            barrier_loss.backward()
-            optimizers["barrier"].step()
-
-            # compute output for robust loss
-            optimizers["xsigma"].zero_grad()
-
-            B_dz = learner.net(states_dz)[:, 0]
-            sigma_dz = learner.xsigma(states_dz)[:, 0]
-            Bdot_dz = TrainableRCBF._compute_barrier_difference(
-                X_d=states_dz,
-                U_d=input_dz,
-                barrier=learner.net,
-                f_torch=partial(f_torch, z=uncert_dz, only_nominal=True),
-            )
-            Bdotz_dz = TrainableRCBF._compute_barrier_difference(
-                X_d=states_dz,
-                U_d=input_dz,
-                barrier=learner.net,
-                f_torch=partial(f_torch, z=uncert_dz, only_nominal=False),
-            )
-
-            (
-                sigma_loss,
-                sigma_losses,
-                sigma_accuracies,
-            ) = TrainableRCBF.compute_robust_loss(
-                learner=learner,
-                B_dz=B_dz,
-                Bdotz_dz=Bdotz_dz,
-                Bdot_dz=Bdot_dz,
-                sigma_dz=sigma_dz,
-            )
-
-            losses = {**barrier_losses, **sigma_losses}
-            accuracies = {**barrier_accuracies, **sigma_accuracies}
-
-            # net gradient info
-            netgrad_sos = torch.sum(torch.square(gradB))
-            infos = {
-                "netgrad_sos": netgrad_sos.item(),
+            batch_losses, batch_accuracies, batch_infos = [], [], []
+            priorities = {
+                label: torch.zeros(len(datasets[label])) for label in label_order
             }
+            for b, indices in enumerate(batches):
+                batch = {
+                    label: datasets[label][indices[label]] for label in label_order
+                }
+
+                i1 = batch[XD].shape[0]
+                i2 = batch[XI].shape[0]
+                i3 = batch[XU].shape[0]
+
+                states_d = torch.cat(
+                    [batch[label][:, :n_vars] for label in [XD, XI, XU]]
+                )
+                input_d = batch[XD][:, n_vars : n_vars + n_controls]
+
+                states_dz = batch[ZD][:, :n_vars]
+                input_dz = batch[ZD][:, n_vars : n_vars + n_controls]
+                uncert_dz = batch[ZD][
+                    :, n_vars + n_controls : n_vars + n_controls + n_uncertain,
+                ]
+
+                optimizers["barrier"].zero_grad()
+
+                # compute output for barrier loss
+                B, gradB = TrainableRCBF._value_and_gradient(
+                    net=learner.net, x=states_d
+                )
+                sigma = learner.xsigma(states_d)
+
+                B_d = B[:i1, 0]
+                B_i = B[i1 : i1 + i2, 0]
+                B_u = B[i1 + i2 : i1 + i2 + i3, 0]
+
+                assert (
+                    B_d.shape[0] == input_d.shape[0]
+                ), f"expected pairs of state,input data. Got {B_d.shape[0]} and {input_d.shape[0]}"
+                sigma_d = sigma[:i1, 0]
+                Bdot_d = TrainableRCBF._compute_barrier_difference(
+                    X_d=batch[XD][:, :n_vars],
+                    U_d=input_d,
+                    barrier=learner.net,
+                    f_torch=partial(f_torch, z=None, only_nominal=True),
+                    db_dx=gradB[:i1],
+                )
+
+                (
+                    barrier_loss,
+                    barrier_losses,
+                    barrier_accuracies,
+                ) = TrainableRCBF._compute_loss(
+                    learner=learner,
+                    B_i=B_i,
+                    B_u=B_u,
+                    B_d=B_d,
+                    Bdot_d=Bdot_d - sigma_d,
+                    alpha=1.0,
+                )
+
+                barrier_loss.backward()
+                optimizers["barrier"].step()
+
+                # compute output for robust loss
+                optimizers["xsigma"].zero_grad()
+
+                B_dz, gradB_dz = TrainableRCBF._value_and_gradient(
+                    net=learner.net, x=states_dz
+                )
+                B_dz = B_dz[:, 0]
+                sigma_dz = learner.xsigma(states_dz)[:, 0]
+                Bdot_dz = TrainableRCBF._compute_barrier_difference(
+                    X_d=states_dz,
+                    U_d=input_dz,
+                    barrier=learner.net,
+                    f_torch=partial(f_torch, z=uncert_dz, only_nominal=True),
+                    db_dx=gradB_dz,
+                )
+                Bdotz_dz = TrainableRCBF._compute_barrier_difference(
+                    X_d=states_dz,
+                    U_d=input_dz,
+                    barrier=learner.net,
+                    f_torch=partial(f_torch, z=uncert_dz, only_nominal=False),
+                    db_dx=gradB_dz,
+                )
+
+                (
+                    sigma_loss,
+                    sigma_losses,
+                    sigma_accuracies,
+                ) = TrainableRCBF.compute_robust_loss(
+                    learner=learner,
+                    B_dz=B_dz,
+                    Bdotz_dz=Bdotz_dz,
+                    Bdot_dz=Bdot_dz,
+                    sigma_dz=sigma_dz,
+                )
+
+                batch_losses.append({**barrier_losses, **sigma_losses})
+                batch_accuracies.append({**barrier_accuracies, **sigma_accuracies})
+
+                # per-sample losses, as priorities of the samples on eviction
+                with torch.no_grad():
+                    label_losses = TrainableRCBF._label_losses(
+                        learner=learner,
+                        B_i=B_i,
+                        B_u=B_u,
+                        B_d=B_d,
+                        Bdot_d=Bdot_d - sigma_d,
+                        alpha=1.0,
+                    )
+                    robust_losses = TrainableRCBF._robust_sample_losses(
+                        learner=learner,
+                        B_dz=B_dz,
+                        Bdotz_dz=Bdotz_dz,
+                        Bdot_dz=Bdot_dz,
+                        sigma_dz=sigma_dz,
+                    )
+                label_losses[ZD] = sum(robust_losses.values())
+                for label, sample_loss in label_losses.items():
+                    priorities[label][indices[label]] = sample_loss.cpu()
+
+                # net gradient info
+                netgrad_sos = torch.sum(torch.square(gradB))
+                batch_infos.append({"netgrad_sos": netgrad_sos.item()})
+
+                # the last batch is stepped after the early-stopping check
+                if b < len(batches) - 1:
+                    sigma_loss.backward()
+                    optimizers["xsigma"].step()
+
+            losses = TrainableRCBF._mean_metrics(batch_losses)
+            accuracies = TrainableRCBF._mean_metrics(batch_accuracies)
+            infos = TrainableRCBF._mean_metrics(batch_infos)
 
             if t % math.ceil(learner.epochs / 10) == 0 or learner.epochs - t < 10:
                 # log_loss_acc(t, loss, accuracy, learner.verbose)
@@ -413,6 +501,8 @@ class TrainableRCBF(TrainableCBF, RobustControlBarrierFunction):
             sigma_loss.backward()
             optimizers["xsigma"].step()
 
+        TrainableRCBF._set_priorities(datasets=datasets, priorities=priorities)
+
         return {
             "loss": losses,
             "accuracy": accuracies,
@@ -435,9 +525,6 @@ class TrainableRCBF(TrainableCBF, RobustControlBarrierFunction):
         ), f"B_d and Bdotz_dz must have the same shape, got {B_dz.shape} and {Bdotz_dz.shape}"
 
         belt_margin = 0.5
-        margin_robust = learner.loss_margins["robust"]
-        weight_robust = learner.loss_weights["robust"]
-        weight_conservative_s = learner.loss_weights["conservative_sigma"]
 
         accuracy_z = (
             torch.logical_and(B_dz < belt_margin, sigma_dz + Bdotz_dz - Bdot_dz >= 0,)
@@ -447,16 +534,15 @@ class TrainableRCBF(TrainableCBF, RobustControlBarrierFunction):
 
         percent_accuracy_robust = 100 * accuracy_z / Bdot_dz.shape[0]
 
-        # robust loss to make sigma robust to uncertainty
-        belt_mask = (B_dz < belt_margin).float()
-        compensator_term = belt_mask * (margin_robust - (sigma_dz + Bdotz_dz - Bdot_dz))
-
-        robust_loss = weight_robust * learner.loss_relu(compensator_term).mean()
-
-        # regularization losses
-        # penalize high sigma (conservative)
-        loss_sigma_pos = learner.loss_relu(sigma_dz).mean()  # penalize sigma_dz > 0
-        loss_sigma_conservative = weight_conservative_s * loss_sigma_pos
+        sample_losses = TrainableRCBF._robust_sample_losses(
+            learner=learner,
+            B_dz=B_dz,
+            Bdotz_dz=Bdotz_dz,
+            Bdot_dz=Bdot_dz,
+            sigma_dz=sigma_dz,
+        )
+        robust_loss = sample_losses["robust_loss"].mean()
+        loss_sigma_conservative = sample_losses["conservative_sigma_loss"].mean()
 
         sigma_loss = robust_loss + loss_sigma_conservative
 
@@ -475,3 +561,33 @@ class TrainableRCBF(TrainableCBF, RobustControlBarrierFunction):
         learner._logger.debug("\n".join([f"{k}:{v}" for k, v in accuracy.items()]))
 
         return sigma_loss, losses, accuracy
+
+    @staticmethod
+    def _robust_sample_losses(
+        learner,
+        B_dz: torch.Tensor,
+        Bdotz_dz: torch.Tensor,
+        Bdot_dz: torch.Tensor,
+        sigma_dz: torch.Tensor,
+    ) -> dict[str, torch.Tensor]:
+        """
+        Computes the robust loss terms of each sample, before averaging (see compute_robust_loss).
+
+        Returns:
+            dict: loss terms, as {name: tensor of shape (n_samples,)}
+        """
+        belt_margin = 0.5
+        margin_robust = learner.loss_margins["robust"]
+        weight_robust = learner.loss_weights["robust"]
+        weight_conservative_s = learner.loss_weights["conservative_sigma"]
+
+        # robust loss to make sigma robust to uncertainty
+        belt_mask = (B_dz < belt_margin).float()
+        compensator_term = belt_mask * (margin_robust - (sigma_dz + Bdotz_dz - Bdot_dz))
+
+        return {
+            "robust_loss": weight_robust * learner.loss_relu(compensator_term),
+            # regularization: penalize high sigma (conservative)
+            "conservative_sigma_loss": weight_conservative_s
+            * learner.loss_relu(sigma_dz),
+        }
@@ -49,7 +49,7 @@ def activation_der(select: consts.ActivationType, p):
     elif select == consts.ActivationType.RELU:
         return step(p)
     elif select == consts.ActivationType.LINEAR:
-        return torch.ones(p.shape)
+        return torch.ones_like(p)
     elif select == consts.ActivationType.SQUARE:
         return 2 * p
     elif select == consts.ActivationType.REQU:
@@ -129,7 +129,7 @@ def rational(x):
 
 
 def identity_der(x):
-    return torch.ones(x.shape)
+    return torch.ones_like(x)
 
 
 def step(x):
@@ -140,7 +140,7 @@ def step(x):
 def poly2_der(x):
     h = int(x.shape[1] / 2)
     x1, x2 = x[:, :h], x[:, h:]
-    return torch.cat([torch.ones(x1.shape), 2 * x2], dim=1)
+    return torch.cat([torch.ones_like(x1), 2 * x2], dim=1)
 
 
 def relu_square_der(x):
@@ -150,24 +150,24 @@ def relu_square_der(x):
 
 
 def hyper_tan_der(x):
-    return torch.ones(x.shape) - torch.pow(torch.tanh(x), 2)
+    return torch.ones_like(x) - torch.pow(torch.tanh(x), 2)
 
 
 def hard_hyper_tan_der(x):
     y_mask = (x < -1.0) | (x > 1.0)
-    dydx = torch.ones(x.shape)
+    dydx = torch.ones_like(x)
     dydx[y_mask] = 0
     return dydx
 
 
 def sigm_der(x):
     y = sigm(x)
-    return y * (torch.ones(x.shape) - y)
+    return y * (torch.ones_like(x) - y)
 
 
 def hard_sigm_der(x):
     y_mask = (x < -3.0) | (x > 3.0)
-    dydx = 1 / 6 * torch.ones(x.shape)
+    dydx = 1 / 6 * torch.ones_like(x)
     dydx[y_mask] = 0
     return dydx
 
@@ -181,4 +181,4 @@ def sinh(x):
 
 
 def rational_der(x):
-    return 1 / (1 + torch.pow(x, 2))
+    return 1 / torch.pow(1 + torch.abs(x), 2)
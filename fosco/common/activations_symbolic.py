@@ -310,4 +310,4 @@ def hard_sigm_der(x):
 
 
 def rational_der_sym(x):
-    return 1 / (1 + x ** 2)
+    return 1 / (1 + (x ** 2) ** 0.5) ** 2
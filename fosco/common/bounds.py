@@ -0,0 +1,233 @@
+import torch
+
+from fosco.common import consts
+from fosco.common.activations import activation, activation_der
+
+# activations which are non-decreasing functions
+MONOTONE_ACTIVATIONS = [
+    consts.ActivationType.IDENTITY,
+    consts.ActivationType.LINEAR,
+    consts.ActivationType.RELU,
+    consts.ActivationType.REQU,
+    consts.ActivationType.RATIONAL,
+    consts.ActivationType.HSIGMOID,
+    consts.ActivationType.HTANH,
+    consts.ActivationType.TANH,
+    consts.ActivationType.SIGMOID,
+    consts.ActivationType.SOFTPLUS,
+]
+
+# activations whose derivative is even and decreasing in |x|, with maximum in 0
+PEAKED_DERIVATIVES = [
+    consts.ActivationType.RATIONAL,
+    consts.ActivationType.TANH,
+    consts.ActivationType.SIGMOID,
+]
+
+# activations whose derivative is piecewise constant: (breakpoint, value inside, value outside)
+PIECEWISE_DERIVATIVES = {
+    consts.ActivationType.HTANH: (1.0, 1.0, 0.0),
+    consts.ActivationType.HSIGMOID: (3.0, 1.0 / 6.0, 0.0),
+}
+
+
+class Interval:
+    """
+    Closed interval [lb, ub] of real numbers with natural interval arithmetic.
+
+    It can be used in place of symbolic variables to bound expressions made of sums and products,
+    such as the symbolic dynamics of polynomial systems.
+    """
+
+    def __init__(self, lb: float, ub: float):
+        assert lb <= ub, f"Expected lb <= ub, got {lb} > {ub}"
+        self.lb = float(lb)
+        self.ub = float(ub)
+
+    def __repr__(self) -> str:
+        return f"Interval({self.lb}, {self.ub})"
+
+    @staticmethod
+    def wrap(value) -> "Interval":
+        if isinstance(value, Interval):
+            return value
+        return Interval(float(value), float(value))
+
+    def __add__(self, other) -> "Interval":
+        other = Interval.wrap(other)
+        return Interval(self.lb + other.lb, self.ub + other.ub)
+
+    def __radd__(self, other) -> "Interval":
+        return self + other
+
+    def __neg__(self) -> "Interval":
+        return Interval(-self.ub, -self.lb)
+
+    def __sub__(self, other) -> "Interval":
+        return self + (-Interval.wrap(other))
+
+    def __rsub__(self, other) -> "Interval":
+        return Interval.wrap(other) - self
+
+    def __mul__(self, other) -> "Interval":
+        other = Interval.wrap(other)
+        products = [
+            self.lb * other.lb,
+            self.lb * other.ub,
+            self.ub * other.lb,
+            self.ub * other.ub,
+        ]
+        return Interval(min(products), max(products))
+
+    def __rmul__(self, other) -> "Interval":
+        return self * other
+
+    def __pow__(self, exponent: int) -> "Interval":
+        assert (
+            isinstance(exponent, int) and exponent >= 0
+        ), f"Only non-negative integer powers are supported, got {exponent}"
+        if exponent % 2 == 1 or self.lb >= 0:
+            return Interval(
+                min(self.lb**exponent, self.ub**exponent),
+                max(self.lb**exponent, self.ub**exponent),
+            )
+        elif self.ub <= 0:
+            return Interval(self.ub**exponent, self.lb**exponent)
+        return Interval(0.0, max(self.lb**exponent, self.ub**exponent))
+
+
+def interval_mul(
+    a_lb: torch.Tensor, a_ub: torch.Tensor, b_lb: torch.Tensor, b_ub: torch.Tensor
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Elementwise product of interval tensors.
+    """
+    products = torch.stack([a_lb * b_lb, a_lb * b_ub, a_ub * b_lb, a_ub * b_ub])
+    return products.min(dim=0).values, products.max(dim=0).values
+
+
+def affine_bounds(
+    weight: torch.Tensor,
+    bias: torch.Tensor | None,
+    lb: torch.Tensor,
+    ub: torch.Tensor,
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Bounds of W x + b for x in the box [lb, ub], where lb, ub have the input size as first dimension.
+    """
+    center, radius = (ub + lb) / 2.0, (ub - lb) / 2.0
+    z_center = weight @ center
+    z_radius = weight.abs() @ radius
+    if bias is not None:
+        z_center = z_center + (bias if center.dim() == 1 else bias[:, None])
+    return z_center - z_radius, z_center + z_radius
+
+
+def activation_bounds(
+    select: consts.ActivationType, lb: torch.Tensor, ub: torch.Tensor
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Bounds of the activation output over the interval [lb, ub].
+    """
+    if select in MONOTONE_ACTIVATIONS:
+        return activation(select, lb), activation(select, ub)
+    elif select in [consts.ActivationType.SQUARE, consts.ActivationType.COSH]:
+        # convex functions with minimum in 0
+        y_lb, y_ub = activation(select, lb), activation(select, ub)
+        closest_to_zero = torch.clamp(torch.zeros_like(lb), lb, ub)
+        return activation(select, closest_to_zero), torch.maximum(y_lb, y_ub)
+    else:
+        raise NotImplementedError(f"Interval bounds not implemented for {select}")
+
+
+def activation_der_bounds(
+    select: consts.ActivationType, lb: torch.Tensor, ub: torch.Tensor
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Bounds of the activation derivative over the interval [lb, ub].
+    """
+    if select in [consts.ActivationType.IDENTITY, consts.ActivationType.LINEAR]:
+        return torch.ones_like(lb), torch.ones_like(ub)
+    elif select == consts.ActivationType.RELU:
+        return (lb > 0).to(lb.dtype), (ub > 0).to(ub.dtype)
+    elif select in [
+        consts.ActivationType.SQUARE,
+        consts.ActivationType.REQU,
+        consts.ActivationType.SOFTPLUS,
+        consts.ActivationType.COSH,
+    ]:
+        # non-decreasing derivatives
+        return activation_der(select, lb), activation_der(select, ub)
+    elif select in PEAKED_DERIVATIVES:
+        closest_to_zero = torch.clamp(torch.zeros_like(lb), lb, ub)
+        d_lb = torch.minimum(activation_der(select, lb), activation_der(select, ub))
+        return d_lb, activation_der(select, closest_to_zero)
+    elif select in PIECEWISE_DERIVATIVES:
+        breakpoint, inside, outside = PIECEWISE_DERIVATIVES[select]
+        all_inside = (lb >= -breakpoint) & (ub <= breakpoint)
+        all_outside = (ub < -breakpoint) | (lb > breakpoint)
+        d_lb = torch.where(all_inside, inside, outside).to(lb.dtype)
+        d_ub = torch.where(all_outside, outside, inside).to(ub.dtype)
+        return d_lb, d_ub
+    else:
+        raise NotImplementedError(
+            f"Interval derivative bounds not implemented for {select}"
+        )
+
+
+def network_bounds(
+    net, lb: torch.Tensor, ub: torch.Tensor
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Interval bound propagation through the layers and activations of a multi-layer perceptron.
+
+    Args:
+        net: model with `layers` (torch.nn.Linear) and `acts` (ActivationType), eg. TorchMLP
+        lb: lower bounds of the input box, shape (input_size,)
+        ub: upper bounds of the input box, shape (input_size,)
+
+    Returns:
+        tuple: lower and upper bounds of the output, shape (output_size,)
+    """
+    y_lb, y_ub = lb.double(), ub.double()
+    for layer, act in zip(net.layers, net.acts):
+        z_lb, z_ub = _layer_bounds(layer, y_lb, y_ub)
+        y_lb, y_ub = activation_bounds(act, z_lb, z_ub)
+    return y_lb, y_ub
+
+
+def network_gradient_bounds(
+    net, lb: torch.Tensor, ub: torch.Tensor
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """
+    Interval bound propagation of the jacobian of a multi-layer perceptron,
+    computed with the chain rule J_k = diag(act'(z_k)) W_k J_{k-1}.
+
+    Args:
+        net: model with `layers` (torch.nn.Linear) and `acts` (ActivationType), eg. TorchMLP
+        lb: lower bounds of the input box, shape (input_size,)
+        ub: upper bounds of the input box, shape (input_size,)
+
+    Returns:
+        tuple: lower and upper bounds of the jacobian, shape (output_size, input_size)
+    """
+    y_lb, y_ub = lb.double(), ub.double()
+    jac_lb = torch.eye(len(lb), dtype=torch.float64)
+    jac_ub = torch.eye(len(lb), dtype=torch.float64)
+    for layer, act in zip(net.layers, net.acts):
+        z_lb, z_ub = _layer_bounds(layer, y_lb, y_ub)
+        y_lb, y_ub = activation_bounds(act, z_lb, z_ub)
+
+        weight = layer.weight.detach().double()
+        wjac_lb, wjac_ub = affine_bounds(weight, None, jac_lb, jac_ub)
+        d_lb, d_ub = activation_der_bounds(act, z_lb, z_ub)
+        jac_lb, jac_ub = interval_mul(d_lb[:, None], d_ub[:, None], wjac_lb, wjac_ub)
+    return jac_lb, jac_ub
+
+
+def _layer_bounds(
+    layer: torch.nn.Linear, lb: torch.Tensor, ub: torch.Tensor
+) -> tuple[torch.Tensor, torch.Tensor]:
+    weight = layer.weight.detach().double()
+    bias = layer.bias.detach().double() if layer.bias is not None else None
+    return affine_bounds(weight, bias, lb, ub)
@@ -57,6 +57,37 @@ class ActivationType(Enum):
 class VerifierType(Enum):
     Z3 = "z3"
     DREAL = "dreal"
+    PORTFOLIO = "portfolio"
+    MILP = "milp"
+    SMTLIB = "smtlib"
+
+
+class FeasibilityEncoding(Enum):
+    VERTICES = "vertices"
+    BOX = "box"
+
+
+class NetworkEncoding(Enum):
+    INLINE = "inline"
+    AUX = "aux"
+
+
+class EvictionPolicy(Enum):
+    AGE = "age"
+    PRIORITY = "priority"
+
+
+class ResamplingDistribution(Enum):
+    GAUSSIAN = "gaussian"
+    UNIFORM = "uniform"
+    SOBOL = "sobol"
+    ANISOTROPIC = "anisotropic"
+
+
+class ResamplingContainment(Enum):
+    NONE = "none"
+    PROJECT = "project"
+    REJECT = "reject"
 
 
 class LossReLUType(Enum):
@@ -39,6 +39,12 @@ class Set:
     def check_containment(self, x: np.ndarray | torch.Tensor) -> torch.Tensor:
         raise NotImplementedError
 
+    def get_bounding_box(self) -> tuple[tuple[float, ...], tuple[float, ...]]:
+        """
+        Returns lower and upper bounds of a box containing the set.
+        """
+        raise NotImplementedError
+
 
 class SumToOneSet(Set):
     """
@@ -149,6 +155,11 @@ class Rectangle(Set):
         vertices = np.array([v.flatten() for v in vertices]).T
         return vertices
 
+    def get_bounding_box(self) -> tuple[tuple[float, ...], tuple[float, ...]]:
+        if self.dim_select:
+            raise NotImplementedError("Bounding box with dim_select not implemented")
+        return self.lower_bounds, self.upper_bounds
+
     def check_containment(self, x: np.ndarray | torch.Tensor) -> torch.Tensor:
         assert len(x.shape) == 2, f"Expected x to be 2D, got {x.shape}"
         if self.dim_select:
@@ -210,6 +221,13 @@ class Sphere(Set):
         """
         return round_init_data(self.center, self.radius ** 2, batch_size)
 
+    def get_bounding_box(self) -> tuple[tuple[float, ...], tuple[float, ...]]:
+        if self.dim_select:
+            raise NotImplementedError("Bounding box with dim_select not implemented")
+        lb = tuple([c_i - self.radius for c_i in self.center])
+        ub = tuple([c_i + self.radius for c_i in self.center])
+        return lb, ub
+
     def check_containment(
         self, x: np.ndarray | torch.Tensor, epsilon: float = 1e-6
     ) -> torch.Tensor:
@@ -276,6 +294,12 @@ class Union(Set):
             s = torch.cat([s, set_i.generate_data(n_set_i)])
         return s[:batch_size]
 
+    def get_bounding_box(self) -> tuple[tuple[float, ...], tuple[float, ...]]:
+        boxes = [s.get_bounding_box() for s in self.sets]
+        lb = tuple(np.min([box[0] for box in boxes], axis=0).tolist())
+        ub = tuple(np.max([box[1] for box in boxes], axis=0).tolist())
+        return lb, ub
+
 
 class Intersection(Set):
     """
@@ -317,6 +341,19 @@ class Intersection(Set):
             max_iter -= 1
         return samples[:batch_size]
 
+    def get_bounding_box(self) -> tuple[tuple[float, ...], tuple[float, ...]]:
+        boxes = []
+        for s in self.sets:
+            try:
+                boxes.append(s.get_bounding_box())
+            except NotImplementedError:
+                continue
+        if not boxes:
+            raise NotImplementedError("No set in the intersection has a bounding box")
+        lb = tuple(np.max([box[0] for box in boxes], axis=0).tolist())
+        ub = tuple(np.min([box[1] for box in boxes], axis=0).tolist())
+        return lb, ub
+
 
 class Complement(Set):
     """Complement of a set."""
@@ -368,3 +405,8 @@ class Complement(Set):
             is_in_outer_set = self.outer_set.check_containment(x)
             is_contained &= is_in_outer_set
         return is_contained
+
+    def get_bounding_box(self) -> tuple[tuple[float, ...], tuple[float, ...]]:
+        if self.outer_set is None:
+            raise NotImplementedError("Complement without outer set is unbounded")
+        return self.outer_set.get_bounding_box()
@@ -0,0 +1,79 @@
+import numpy as np
+
+from fosco.verifier.types import SYMBOL
+from fosco.verifier.utils import get_solver_fns
+
+
+def round_weights(w: np.ndarray, rounding: int = -1) -> np.ndarray:
+    """
+    Rounds the weights to the given number of decimals, so that they are translated
+    to short rational coefficients (eg., 0.123 -> 123/1000).
+
+    Args:
+        w: numerical array
+        rounding: number of decimals, -1 for no rounding
+
+    Returns:
+        np.ndarray: weights as float64, rounded if rounding >= 0
+    """
+    w = np.asarray(w, dtype=np.float64)
+    if rounding < 0:
+        return w
+    return np.round(w, rounding)
+
+
+def symbolic_matmul(w: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """
+    Product of a numerical matrix and an array of symbolic expressions.
+    Each entry is built as a single sum over the non-zero products, skipping zero weights and
+    numerical zeros in x, instead of the dense numpy product of object arrays.
+
+    Args:
+        w: numerical matrix, shape (n, m)
+        x: array of symbolic expressions or numbers, shape (m, k)
+
+    Returns:
+        np.ndarray: array of shape (n, k), with symbolic entries (possibly zero) if x contains any
+    """
+    x = np.asarray(x)
+    symbols = [v for v in x.flatten() if isinstance(v, SYMBOL)]
+    if not symbols:
+        return w @ x.astype(np.float64)
+
+    _Sum = get_solver_fns(x=symbols)["Sum"]
+
+    n, k = w.shape[0], x.shape[1]
+    out = np.empty((n, k), dtype=object)
+    for j in range(k):
+        column = x[:, j]
+        nonzero_x = [l for l, v in enumerate(column) if not _is_zero(v)]
+        for i in range(n):
+            terms = [float(w[i, l]) * column[l] for l in nonzero_x if w[i, l] != 0]
+            out[i, j] = _Sum(*terms)
+    return out
+
+
+def symbolic_row_scale(d: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """
+    Scales the i-th row of x by d[i], as np.diagflat(d) @ x without the products
+    of the off-diagonal zeros.
+
+    Args:
+        d: array of symbolic expressions or numbers, with n entries
+        x: array of symbolic expressions or numbers, shape (n, k)
+
+    Returns:
+        np.ndarray: object array of shape (n, k)
+    """
+    d = np.asarray(d, dtype=object).reshape(-1, 1)
+    x = np.asarray(x, dtype=object)
+
+    out = np.empty(x.shape, dtype=object)
+    for index in np.ndindex(x.shape):
+        a, b = d[index[0], 0], x[index]
+        out[index] = 0.0 if _is_zero(a) or _is_zero(b) else a * b
+    return out
+
+
+def _is_zero(v) -> bool:
+    return not isinstance(v, SYMBOL) and v == 0
@@ -0,0 +1,131 @@
+import logging
+import multiprocessing
+import pickle
+import timeit
+import traceback
+from multiprocessing.connection import wait
+from typing import Any, Callable, Hashable, Optional
+
+_logger = logging.getLogger(__name__)
+
+
+def run_forked(
+    tasks: dict[Hashable, Callable[[], Any]],
+    n_workers: int,
+    timeout: Optional[float] = None,
+    stop_when: Optional[Callable[[Any], bool]] = None,
+) -> dict[Hashable, Any]:
+    """
+    Runs each task in a separate forked process, with at most `n_workers` processes alive at the same time.
+
+    Tasks are forked from the current process, so they can refer to objects which cannot be pickled
+    (eg., solver formulas). Only their return values must be picklable.
+
+    Args:
+        tasks: dictionary of (key, callable without arguments)
+        n_workers: maximum number of concurrent processes
+        timeout: time limit in seconds for each task, after which its process is terminated
+        stop_when: predicate on task results, when true all the remaining tasks are cancelled
+
+    Returns:
+        dict: results of the tasks completed successfully, as {key: result}.
+              Tasks which timed out, were cancelled or terminated without result are not included.
+
+    Raises:
+        the exception of the first task which failed, as when running the task in the current process.
+        The remaining tasks are terminated.
+    """
+    assert n_workers > 0, f"Expected positive number of workers, got {n_workers}"
+    assert (
+        "fork" in multiprocessing.get_all_start_methods()
+    ), "Forked execution is not supported on this platform"
+    ctx = multiprocessing.get_context("fork")
+
+    pending = list(tasks.keys())
+    running = {}  # connection -> (key, process, start time)
+    results = {}
+    stop = False
+
+    try:
+        while (pending or running) and not stop:
+            # fill up the pool
+            while pending and len(running) < n_workers:
+                key = pending.pop(0)
+                recv_conn, send_conn = ctx.Pipe(duplex=False)
+                process = ctx.Process(
+                    target=_run_task, args=(send_conn, tasks[key]), daemon=True
+                )
+                process.start()
+                send_conn.close()
+                running[recv_conn] = (key, process, timeit.default_timer())
+
+            # wait for the first task to complete or for the first deadline
+            wait_time = None
+            if timeout is not None:
+                now = timeit.default_timer()
+                wait_time = max(
+                    0.0, min(t0 + timeout - now for _, _, t0 in running.values())
+                )
+            ready = wait(list(running.keys()), timeout=wait_time)
+
+            for conn in ready:
+                key, process, _ = running.pop(conn)
+                try:
+                    ok, payload = pickle.loads(conn.recv_bytes())
+                except EOFError:
+                    # eg., killed by the os, handled as a timed out task
+                    ok, payload = None, None
+                conn.close()
+                process.join()
+
+                if ok is None:
+                    _logger.warning(f"Task {key} terminated without result")
+                    continue
+                elif not ok:
+                    error, worker_traceback = payload
+                    raise error from RuntimeError(
+                        f"Task {key} failed in the worker process:\n{worker_traceback}"
+                    )
+
+                results[key] = payload
+                if stop_when is not None and stop_when(payload):
+                    stop = True
+
+            # terminate tasks over the time limit
+            if timeout is not None:
+                now = timeit.default_timer()
+                for conn, (key, process, t0) in list(running.items()):
+                    if now - t0 >= timeout:
+                        _logger.info(f"Task {key} timed out after {now - t0:.2f} sec")
+                        _terminate(process)
+                        conn.close()
+                        running.pop(conn)
+    finally:
+        for conn, (key, process, _) in running.items():
+            _terminate(process)
+            conn.close()
+
+    return results
+
+
+def _run_task(conn, fn: Callable[[], Any]) -> None:
+    try:
+        data = pickle.dumps((True, fn()))
+    except Exception as e:
+        # the exception is sent to the parent with the worker traceback, which cannot be pickled
+        try:
+            data = pickle.dumps((False, (e, traceback.format_exc())))
+        except Exception:
+            data = pickle.dumps(
+                (False, (RuntimeError(repr(e)), traceback.format_exc()))
+            )
+    conn.send_bytes(data)
+    conn.close()
+
+
+def _terminate(process) -> None:
+    process.terminate()
+    process.join(timeout=1.0)
+    if process.is_alive():
+        process.kill()
+        process.join()
@@ -1,4 +1,5 @@
-from typing import Iterable
+import math
+from typing import Iterable, Optional
 
 import numpy as np
 import torch
@@ -122,6 +123,34 @@ def square_init_data(domain, batch_size, on_border=False):
     return square_uniform
 
 
+def stratified_batch_indices(
+    sizes: dict[str, int], batch_size: Optional[int] = None
+) -> list[dict[str, torch.Tensor | slice]]:
+    """
+    Splits the datasets in mini-batches of about batch_size samples, for one epoch of training.
+    The samples of each dataset are shuffled and spread over all the batches in proportion
+    to the dataset size, without replacement, so that each sample is seen once per epoch.
+    The number of batches is at most the size of the smallest dataset, so that each batch
+    contains samples of every dataset: batches are larger than batch_size for tiny datasets.
+
+    :param sizes: number of samples of each dataset
+    :param batch_size: number of samples per batch, None for a single batch with all the samples
+    :return: list of batches, each as dict of index tensors (or slices) in the datasets
+    """
+    if batch_size is None:
+        return [{label: slice(None) for label in sizes}]
+    assert batch_size > 0, f"Expected positive batch size, got {batch_size}"
+
+    n_batches = math.ceil(sum(sizes.values()) / batch_size)
+    n_batches = max(1, min([n_batches] + list(sizes.values())))
+    indices = {
+        label: torch.tensor_split(torch.randperm(n), n_batches)
+        for label, n in sizes.items()
+    }
+
+    return [{label: idx[b] for label, idx in indices.items()} for b in range(n_batches)]
+
+
 def _set_assertion(required: object, actual: object, name: object) -> object:
     assert required == actual, (
         f"Required {name} {required} do not match actual domains {actual}. "
@@ -12,14 +12,36 @@ class CegisConfig:
     CERTIFICATE: str = "CBF"
     VERIFIER: str = "Z3"
     VERIFIER_TIMEOUT: int = 30
+    VERIFIER_ADAPTIVE_TIMEOUT: bool = False
+    VERIFIER_TOTAL_TIMEOUT: Optional[int] = None
+    VERIFIER_N_WORKERS: int = 1
+    VERIFIER_INCREMENTAL: bool = False
+    VERIFIER_N_CEX: int = 1
+    VERIFIER_CEX_RADIUS: float = 0.1
+    VERIFIER_SPLIT_DEPTH: int = 0
+    VERIFIER_PRESCREEN: bool = False
+    VERIFIER_CACHE_DIR: Optional[str | pathlib.Path] = None
+    VERIFIER_SMTLIB_DIR: Optional[str | pathlib.Path] = None
+    VERIFIER_SMTLIB_COMMAND: Optional[str] = None
+    FEASIBILITY_ENCODING: str = "vertices"
+    NETWORK_ENCODING: str = "inline"
+    NETWORK_PRUNING: bool = False
     RESAMPLING_N: int = 20
     RESAMPLING_STDDEV: float = 5e-3
+    RESAMPLING_DISTRIBUTION: str = "gaussian"
+    RESAMPLING_CONTAINMENT: str = "none"
+    CEX_REFINEMENT_STEPS: int = 0
+    CEX_REFINEMENT_STEP_SIZE: float = 1e-2
+    CEX_REFINEMENT_N: int = 10
     CEGIS_MAX_ITERS: int = 10
     ROUNDING: int = 3
     BARRIER_TO_LOAD: Optional[str | pathlib.Path] = None
     SIGMA_TO_LOAD: Optional[str | pathlib.Path] = None
     # training
     N_DATA: int = 500
+    DATA_CAPACITY: Optional[int] = None
+    DATA_EVICTION: str = "age"
+    BATCH_SIZE: Optional[int] = None
     LEARNING_RATE: float = 1e-3
     WEIGHT_DECAY: float = 1e-4
     # net architecture
@@ -1,15 +1,57 @@
 import logging
+from typing import Optional
 
 import torch
 
+from fosco.common.consts import ResamplingContainment, ResamplingDistribution
+from fosco.common.domains import Set
 from fosco.common.timing import timed
+from fosco.consolidator.dataset_store import DatasetStore
+from fosco.consolidator.resampling import sample_perturbations
 from fosco.logger import LOGGING_LEVELS
 
 
 class Consolidator:
-    def __init__(self, resampling_n: int, resampling_stddev: float, verbose: int = 0):
+    """
+    Adds the counterexamples and random samples around them to the training datasets.
+
+    Args:
+        resampling_n: number of random samples around each counterexample
+        resampling_stddev: scale of the random samples (stddev, half-width or radius, see sample_perturbations)
+        resampling_distribution: distribution of the random samples
+        resampling_containment: handling of the random samples outside the domain of their label:
+            - none: samples are kept,
+            - project: samples are clipped to the domain bounding box, those still outside are rejected,
+            - reject: samples outside are rejected.
+        domains: sets of the sample columns for each label, in order (eg., state and input domain for lie),
+            used for the containment and by the anisotropic distribution
+        verbose: verbosity level
+    """
+
+    def __init__(
+        self,
+        resampling_n: int,
+        resampling_stddev: float,
+        resampling_distribution: str
+        | ResamplingDistribution = ResamplingDistribution.GAUSSIAN,
+        resampling_containment: str
+        | ResamplingContainment = ResamplingContainment.NONE,
+        domains: Optional[dict[str, list[Set]]] = None,
+        verbose: int = 0,
+    ):
+        if isinstance(resampling_distribution, str):
+            resampling_distribution = ResamplingDistribution[
+                resampling_distribution.upper()
+            ]
+        if isinstance(resampling_containment, str):
+            resampling_containment = ResamplingContainment[
+                resampling_containment.upper()
+            ]
         self.cex_n = resampling_n
         self.cex_stddev = resampling_stddev
+        self.distribution = resampling_distribution
+        self.containment = resampling_containment
+        self.domains = domains or {}
 
         self._assert_state()
 
@@ -24,6 +66,16 @@ class Consolidator:
         assert (
             self.cex_stddev > 0
         ), f"Standard deviation must be greater than 0, got {self.cex_stddev}"
+        assert isinstance(
+            self.distribution, ResamplingDistribution
+        ), f"Expected ResamplingDistribution, got {type(self.distribution)}"
+        assert isinstance(
+            self.containment, ResamplingContainment
+        ), f"Expected ResamplingContainment, got {type(self.containment)}"
+        assert all(
+            isinstance(sets, list) and all(isinstance(s, Set) for s in sets)
+            for sets in self.domains.values()
+        ), f"Expected dictionary of list of Set, got {self.domains}"
 
     @timed
     def get(self, cex, datasets, **kwargs):
@@ -36,25 +88,97 @@ class Consolidator:
         return {"datasets": datasets}
 
     def _add_ces_to_data(self, cex, datasets):
+        if not isinstance(datasets, DatasetStore):
+            datasets = DatasetStore(datasets=datasets)
+
         for lab, cex in cex.items():
             if cex is not None:
-                x = self._randomise_counterex(point=cex)
-                datasets[lab] = torch.cat([datasets[lab], x], dim=0).detach()
+                # the verifier may return multiple counterexamples per label, one per row
+                samples = self._resample(label=lab, cex=cex)
+                x = torch.cat([samples, cex.to(samples.dtype)], dim=0)
+
+                # counterexamples are kept over their random neighbours, on priority eviction
+                priorities = torch.cat(
+                    [torch.zeros(len(samples)), torch.ones(len(cex))]
+                )
+                datasets.add(label=lab, samples=x, priorities=priorities)
+
+                buffer = datasets.buffers[lab]
+                if buffer.n_evicted > 0:
+                    self._logger.debug(
+                        f"Evicted {buffer.n_evicted} samples from {lab} so far"
+                    )
         return datasets
 
-    def _randomise_counterex(self, point):
+    def _resample(self, label: str, cex: torch.Tensor) -> torch.Tensor:
         """
-        Given one ctx, useful to sample around it to increase data set
-        these points might *not* be real ctx, but probably close to invalidity condition
+        Given the counterexamples of a label, samples around them to increase the data set, in one batch.
+        These points might *not* be real counterexamples, but probably close to invalidity condition.
+
+        Args:
+            label: label of the counterexamples
+            cex: counterexamples, shape (n_cex, n_dims)
 
-        :param point: tensor
-        :return: list of ctx
+        Returns:
+            torch.Tensor: random samples, shape (n_samples, n_dims), with n_samples <= n_cex * resampling_n
         """
-        C = []
-        shape = (1, max(point.shape[0], point.shape[1]))
-        point = point.reshape(shape)
-        for i in range(self.cex_n):
-            random_point = point + self.cex_stddev * torch.randn(shape)
-            C.append(random_point)
-        C.append(point)
-        return torch.stack(C, dim=1)[0, :, :]
+        n_cex, n_dims = cex.shape
+        box = self._bounding_box(label=label, n_dims=n_dims)
+        extent = box[1] - box[0] if box is not None else None
+
+        noise = sample_perturbations(
+            distribution=self.distribution,
+            n_samples=n_cex * self.cex_n,
+            n_dims=n_dims,
+            scale=self.cex_stddev,
+            extent=extent,
+        )
+        samples = cex.repeat_interleave(self.cex_n, dim=0) + noise.to(cex.dtype)
+
+        if self.containment == ResamplingContainment.NONE:
+            return samples
+        if self.containment == ResamplingContainment.PROJECT and box is not None:
+            lb, ub = [b.to(samples.dtype) for b in box]
+            samples = torch.clamp(samples, lb, ub)
+
+        contained = self._check_containment(label=label, x=samples)
+        if contained is not None:
+            self._logger.debug(
+                f"{label}: rejected {int((~contained).sum())} out of {len(samples)} samples"
+            )
+            samples = samples[contained]
+        return samples
+
+    def _sample_domains(self, label: str, n_dims: int) -> list[Set] | None:
+        sets = self.domains.get(label, None)
+        if sets is None or sum(s.dimension for s in sets) != n_dims:
+            return None
+        return sets
+
+    def _bounding_box(
+        self, label: str, n_dims: int
+    ) -> tuple[torch.Tensor, torch.Tensor] | None:
+        sets = self._sample_domains(label=label, n_dims=n_dims)
+        if sets is None:
+            return None
+
+        try:
+            boxes = [s.get_bounding_box() for s in sets]
+        except NotImplementedError:
+            return None
+        lb = torch.tensor([b for box in boxes for b in box[0]])
+        ub = torch.tensor([b for box in boxes for b in box[1]])
+        return lb, ub
+
+    def _check_containment(self, label: str, x: torch.Tensor) -> torch.Tensor | None:
+        sets = self._sample_domains(label=label, n_dims=x.shape[1])
+        if sets is None:
+            return None
+
+        contained = torch.ones(len(x), dtype=torch.bool)
+        for s, x_s in zip(sets, torch.split(x, [s.dimension for s in sets], dim=1)):
+            try:
+                contained &= s.check_containment(x_s).cpu()
+            except NotImplementedError:
+                continue
+        return contained
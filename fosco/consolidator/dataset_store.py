@@ -0,0 +1,184 @@
+from collections.abc import Mapping
+from typing import Iterator, Optional
+
+import torch
+
+from fosco.common.consts import EvictionPolicy
+
+
+class SampleBuffer:
+    """
+    Samples of a domain in a pre-allocated tensor: the original samples first, followed by the counterexamples.
+    The storage grows geometrically, so adding samples does not copy the whole dataset at each iteration.
+
+    If capacity is given, the number of counterexamples is bounded and, when exceeded, the counterexamples
+    are evicted according to the policy:
+        - age: the oldest counterexamples are evicted first,
+        - priority: the counterexamples with the lowest priority are evicted first, the oldest among equals.
+    The original samples are never evicted.
+
+    Args:
+        samples: original samples, shape (n_samples, n_dims)
+        capacity: maximum number of counterexamples, None for unbounded
+        eviction: eviction policy when the capacity is exceeded
+    """
+
+    def __init__(
+        self,
+        samples: torch.Tensor,
+        capacity: Optional[int] = None,
+        eviction: str | EvictionPolicy = EvictionPolicy.AGE,
+    ):
+        if isinstance(eviction, str):
+            eviction = EvictionPolicy[eviction.upper()]
+        self.capacity = capacity
+        self.eviction = eviction
+
+        self.n_original = samples.shape[0]
+        self.n_evicted = 0
+        self._storage = samples.detach().clone()
+        self._size = self.n_original
+
+        # priority and insertion order of the counterexamples
+        self._priorities = torch.zeros(0)
+        self._ages = torch.zeros(0, dtype=torch.long)
+        self._n_added = 0
+
+        self._assert_state()
+
+    def _assert_state(self) -> None:
+        assert (
+            len(self._storage.shape) == 2
+        ), f"Expected samples of shape (n_samples, n_dims), got {self._storage.shape}"
+        assert self.capacity is None or (
+            isinstance(self.capacity, int) and self.capacity >= 0
+        ), f"Expected non-negative int or None for capacity, got {self.capacity}"
+        assert isinstance(
+            self.eviction, EvictionPolicy
+        ), f"Expected EvictionPolicy, got {type(self.eviction)}"
+
+    @property
+    def data(self) -> torch.Tensor:
+        """
+        All the samples, as view of the storage.
+        """
+        return self._storage[: self._size]
+
+    @property
+    def original(self) -> torch.Tensor:
+        return self._storage[: self.n_original]
+
+    @property
+    def counterexamples(self) -> torch.Tensor:
+        return self._storage[self.n_original : self._size]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(
+        self, samples: torch.Tensor, priorities: Optional[torch.Tensor] = None
+    ) -> None:
+        """
+        Appends the samples to the counterexamples, evicting the exceeding ones if the capacity is set.
+
+        Args:
+            samples: new samples, shape (n_samples, n_dims)
+            priorities: priority of each new sample, used by the priority eviction (default 0)
+        """
+        n_new = samples.shape[0]
+        if priorities is None:
+            priorities = torch.zeros(n_new)
+        assert priorities.shape == (
+            n_new,
+        ), f"Expected one priority per sample, got {priorities.shape} for {n_new} samples"
+
+        self._reserve(self._size + n_new)
+        self._storage[self._size : self._size + n_new] = samples.detach()
+        self._size += n_new
+
+        ages = torch.arange(self._n_added, self._n_added + n_new)
+        self._priorities = torch.cat([self._priorities, priorities.float()])
+        self._ages = torch.cat([self._ages, ages])
+        self._n_added += n_new
+
+        n_exceeding = (
+            len(self._ages) - self.capacity if self.capacity is not None else 0
+        )
+        if n_exceeding > 0:
+            self._evict(n_exceeding)
+
+    def set_priorities(self, priorities: torch.Tensor) -> None:
+        """
+        Updates the priorities of the counterexamples (eg., with their current loss).
+        """
+        assert priorities.shape == self._priorities.shape, (
+            f"Expected one priority per counterexample, "
+            f"got {priorities.shape} for {self._priorities.shape[0]} counterexamples"
+        )
+        self._priorities = priorities.detach().float().clone()
+
+    def _reserve(self, n_rows: int) -> None:
+        if n_rows <= self._storage.shape[0]:
+            return
+        n_alloc = max(n_rows, 2 * self._storage.shape[0])
+        storage = self._storage.new_empty((n_alloc, self._storage.shape[1]))
+        storage[: self._size] = self._storage[: self._size]
+        self._storage = storage
+
+    def _evict(self, n_evict: int) -> None:
+        # eviction order: oldest first, then stable sort by priority for priority eviction
+        order = torch.argsort(self._ages)
+        if self.eviction == EvictionPolicy.PRIORITY:
+            by_priority = torch.sort(self._priorities[order], stable=True).indices
+            order = order[by_priority]
+
+        # keep the remaining counterexamples in insertion order, compacted after the originals
+        keep = torch.sort(order[n_evict:]).values
+        n_keep = len(keep)
+        start = self.n_original
+        self._storage[start : start + n_keep] = self.counterexamples[keep]
+        self._priorities = self._priorities[keep]
+        self._ages = self._ages[keep]
+
+        self._size = start + n_keep
+        self.n_evicted += n_evict
+
+
+class DatasetStore(Mapping):
+    """
+    Training datasets of each domain, as SampleBuffer with shared capacity and eviction policy.
+    It reads as a dictionary {domain: tensor of samples}, so learners consume it as the datasets dictionary.
+
+    Args:
+        datasets: original samples of each domain
+        capacity: maximum number of counterexamples per domain, None for unbounded
+        eviction: eviction policy when the capacity is exceeded
+    """
+
+    def __init__(
+        self,
+        datasets: dict[str, torch.Tensor],
+        capacity: Optional[int] = None,
+        eviction: str | EvictionPolicy = EvictionPolicy.AGE,
+    ):
+        self.buffers = {
+            label: SampleBuffer(samples=data, capacity=capacity, eviction=eviction)
+            for label, data in datasets.items()
+        }
+
+    def __getitem__(self, label: str) -> torch.Tensor:
+        return self.buffers[label].data
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.buffers)
+
+    def __len__(self) -> int:
+        return len(self.buffers)
+
+    def add(
+        self,
+        label: str,
+        samples: torch.Tensor,
+        priorities: Optional[torch.Tensor] = None,
+    ) -> None:
+        self.buffers[label].add(samples=samples, priorities=priorities)
@@ -0,0 +1,63 @@
+import math
+from typing import Optional
+
+import torch
+
+from fosco.common.consts import ResamplingDistribution
+
+
+def sample_perturbations(
+    distribution: ResamplingDistribution,
+    n_samples: int,
+    n_dims: int,
+    scale: float,
+    extent: Optional[torch.Tensor] = None,
+) -> torch.Tensor:
+    """
+    Samples the perturbations added to the counterexamples, all in one batch:
+        - gaussian: isotropic normal noise, with standard deviation scale,
+        - uniform: uniform noise in the box [-scale, scale]^n_dims,
+        - sobol: quasi-random points in the ball of radius scale, from a scrambled Sobol sequence,
+        - anisotropic: normal noise, with standard deviation scale * extent along each dimension.
+
+    Args:
+        distribution: distribution of the perturbations
+        n_samples: number of perturbations
+        n_dims: dimension of the perturbations
+        scale: standard deviation, half-width or radius of the distribution
+        extent: width of the domain along each dimension, shape (n_dims,), only for anisotropic noise
+
+    Returns:
+        torch.Tensor: perturbations, shape (n_samples, n_dims)
+    """
+    if distribution == ResamplingDistribution.GAUSSIAN:
+        return scale * torch.randn(n_samples, n_dims)
+    elif distribution == ResamplingDistribution.UNIFORM:
+        return scale * (2 * torch.rand(n_samples, n_dims) - 1)
+    elif distribution == ResamplingDistribution.SOBOL:
+        return scale * _sobol_ball(n_samples=n_samples, n_dims=n_dims)
+    elif distribution == ResamplingDistribution.ANISOTROPIC:
+        extent = extent if extent is not None else torch.ones(n_dims)
+        assert extent.shape == (
+            n_dims,
+        ), f"Expected extent of shape ({n_dims},), got {extent.shape}"
+        return scale * extent.float() * torch.randn(n_samples, n_dims)
+    else:
+        raise NotImplementedError(
+            f"Resampling distribution {distribution} not supported"
+        )
+
+
+def _sobol_ball(n_samples: int, n_dims: int) -> torch.Tensor:
+    # the scrambling seed is drawn from torch, so that the sequence follows the global seed
+    seed = int(torch.randint(0, 2**31 - 1, (1,)))
+    engine = torch.quasirandom.SobolEngine(
+        dimension=n_dims + 1, scramble=True, seed=seed
+    )
+    u = engine.draw(n_samples).clamp(1e-6, 1 - 1e-6)
+
+    # direction from the inverse normal cdf, radius with density proportional to r^(n_dims-1)
+    direction = math.sqrt(2) * torch.erfinv(2 * u[:, :n_dims] - 1)
+    direction = direction / direction.norm(dim=1, keepdim=True).clamp_min(1e-12)
+    radius = u[:, n_dims:] ** (1.0 / n_dims)
+    return radius * direction
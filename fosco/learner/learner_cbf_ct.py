@@ -31,6 +31,7 @@ class LearnerCBF(LearnerNN):
         loss_relu: str,
         optimizer: Optional[str] = None,
         initial_models: Optional[dict[str, nn.Module]] = None,
+        batch_size: Optional[int] = None,
         verbose: int = 0,
     ):
         super(LearnerCBF, self).__init__(verbose=verbose)
@@ -72,6 +73,7 @@ class LearnerCBF(LearnerNN):
         ]
         self.loss_relu = LossReLUType[loss_relu.upper()]
         self.epochs = epochs
+        self.batch_size = batch_size
 
         # process loss margins
         if isinstance(loss_margins, float):
@@ -107,6 +109,9 @@ class LearnerCBF(LearnerNN):
         assert (
             isinstance(self.epochs, int) and self.epochs >= 0
         ), f"Expected non-neg int for epochs, got {self.epochs}"
+        assert self.batch_size is None or (
+            isinstance(self.batch_size, int) and self.batch_size > 0
+        ), f"Expected positive int or None for batch size, got {self.batch_size}"
 
         assert all(
             [k in self.loss_margins for k in self.loss_keys]
@@ -146,6 +151,7 @@ class LearnerCBF(LearnerNN):
                 "activation": [a.value for a in self.net.acts[:-1]],
                 "optimizer": self.optimizer_type,
                 "epochs": self.epochs,
+                "batch_size": self.batch_size,
                 "loss_margins": self.loss_margins,
                 "loss_weights": self.loss_weights,
                 "loss_relu": self.loss_relu.value,
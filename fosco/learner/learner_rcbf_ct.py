@@ -30,6 +30,7 @@ class LearnerRobustCBF(LearnerCBF):
         loss_relu: str,
         optimizer: Optional[str] = None,
         initial_models: Optional[dict[str, nn.Module]] = None,
+        batch_size: Optional[int] = None,
         verbose: int = 0,
     ):
         super(LearnerRobustCBF, self).__init__(
@@ -44,6 +45,7 @@ class LearnerRobustCBF(LearnerCBF):
             loss_weights=loss_weights,
             loss_relu=loss_relu,
             initial_models=initial_models,
+            batch_size=batch_size,
             verbose=verbose,
         )
 
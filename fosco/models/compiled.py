@@ -0,0 +1,339 @@
+from typing import List, Optional, Tuple
+
+import torch
+from torch import nn
+
+from fosco.common import activations
+from fosco.common.consts import ActivationType
+from fosco.models.network import RobustGate, SequentialTorchMLP, TorchMLP
+from fosco.models.pruning import PrunedTorchMLP
+
+
+class _Identity(nn.Module):
+    def forward(self, z: torch.Tensor) -> torch.Tensor:
+        return z
+
+    @torch.jit.export
+    def derivative(self, z: torch.Tensor) -> torch.Tensor:
+        return torch.ones_like(z)
+
+
+class _ReLU(nn.Module):
+    def forward(self, z: torch.Tensor) -> torch.Tensor:
+        return activations.relu(z)
+
+    @torch.jit.export
+    def derivative(self, z: torch.Tensor) -> torch.Tensor:
+        return activations.step(z)
+
+
+class _Square(nn.Module):
+    def forward(self, z: torch.Tensor) -> torch.Tensor:
+        return activations.square(z)
+
+    @torch.jit.export
+    def derivative(self, z: torch.Tensor) -> torch.Tensor:
+        return 2 * z
+
+
+class _ReQU(nn.Module):
+    def forward(self, z: torch.Tensor) -> torch.Tensor:
+        return activations.requ(z)
+
+    @torch.jit.export
+    def derivative(self, z: torch.Tensor) -> torch.Tensor:
+        return 2 * activations.relu(z)
+
+
+class _Rational(nn.Module):
+    def forward(self, z: torch.Tensor) -> torch.Tensor:
+        return activations.rational(z)
+
+    @torch.jit.export
+    def derivative(self, z: torch.Tensor) -> torch.Tensor:
+        return activations.rational_der(z)
+
+
+class _HardTanh(nn.Module):
+    def forward(self, z: torch.Tensor) -> torch.Tensor:
+        return activations.hard_hyper_tan(z)
+
+    @torch.jit.export
+    def derivative(self, z: torch.Tensor) -> torch.Tensor:
+        return ((z >= -1.0) & (z <= 1.0)).to(z.dtype)
+
+
+class _HardSigmoid(nn.Module):
+    def forward(self, z: torch.Tensor) -> torch.Tensor:
+        return activations.hard_sigm(z)
+
+    @torch.jit.export
+    def derivative(self, z: torch.Tensor) -> torch.Tensor:
+        return ((z >= -3.0) & (z <= 3.0)).to(z.dtype) / 6.0
+
+
+class _Tanh(nn.Module):
+    def forward(self, z: torch.Tensor) -> torch.Tensor:
+        return activations.hyper_tan(z)
+
+    @torch.jit.export
+    def derivative(self, z: torch.Tensor) -> torch.Tensor:
+        return 1.0 - torch.tanh(z) ** 2
+
+
+class _Sigmoid(nn.Module):
+    def forward(self, z: torch.Tensor) -> torch.Tensor:
+        return activations.sigm(z)
+
+    @torch.jit.export
+    def derivative(self, z: torch.Tensor) -> torch.Tensor:
+        y = torch.sigmoid(z)
+        return y * (1.0 - y)
+
+
+class _Softplus(nn.Module):
+    def forward(self, z: torch.Tensor) -> torch.Tensor:
+        return activations.softplus(z)
+
+    @torch.jit.export
+    def derivative(self, z: torch.Tensor) -> torch.Tensor:
+        return activations.softplus_der(z)
+
+
+class _Cosh(nn.Module):
+    def forward(self, z: torch.Tensor) -> torch.Tensor:
+        return activations.cosh(z)
+
+    @torch.jit.export
+    def derivative(self, z: torch.Tensor) -> torch.Tensor:
+        return activations.sinh(z)
+
+
+# activation modules, as the functions in fosco.common.activations with their derivatives
+ACTIVATION_MODULES = {
+    ActivationType.IDENTITY: _Identity,
+    ActivationType.LINEAR: _Identity,
+    ActivationType.RELU: _ReLU,
+    ActivationType.SQUARE: _Square,
+    ActivationType.REQU: _ReQU,
+    ActivationType.RATIONAL: _Rational,
+    ActivationType.HTANH: _HardTanh,
+    ActivationType.HSIGMOID: _HardSigmoid,
+    ActivationType.TANH: _Tanh,
+    ActivationType.SIGMOID: _Sigmoid,
+    ActivationType.SOFTPLUS: _Softplus,
+    ActivationType.COSH: _Cosh,
+}
+
+
+class _CompiledLayer(nn.Module):
+    """
+    Linear layer followed by a fixed activation.
+    """
+
+    def __init__(self, layer: nn.Linear, act: ActivationType):
+        super(_CompiledLayer, self).__init__()
+        self.layer = layer
+        self.act = ACTIVATION_MODULES[act]()
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.act(self.layer(x))
+
+    @torch.jit.export
+    def forward_with_derivative(
+        self, x: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        z = self.layer(x)
+        return self.act(z), self.act.derivative(z)
+
+    @torch.jit.export
+    def vjp(self, der: torch.Tensor, v: torch.Tensor) -> torch.Tensor:
+        # v^T diag(der) W
+        return (v * der) @ self.layer.weight
+
+
+class CompiledMLP(nn.Module):
+    """
+    Multi-layer perceptron with the activations fixed in the module graph, for TorchScript.
+    The layers are shared with the original TorchMLP, so are their parameters.
+
+    The gradient is computed in the same forward pass, by accumulating the activation derivatives
+    from the last layer, as in TorchMLP.forward_with_jacobian.
+    """
+
+    def __init__(self, net: TorchMLP):
+        super(CompiledMLP, self).__init__()
+        self.input_size: int = net.input_size
+        self.output_size: int = net.output_size
+
+        layers = [_CompiledLayer(l, a) for l, a in zip(net.layers, net.acts)]
+        self.layers = nn.ModuleList(layers)
+        # torchscript only iterates module lists forward
+        self.reversed_layers = nn.ModuleList(layers[::-1])
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        for layer in self.layers:
+            x = layer(x)
+        return x
+
+    @torch.jit.export
+    def value_and_vjp(
+        self, x: torch.Tensor, v: Optional[torch.Tensor] = None
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Returns the output and the vector-jacobian product v^T dy/dx, for v of shape (batch_size, output_size).
+        If v is None, it is a vector of ones, as in TorchMLP.gradient.
+        """
+        ders: List[torch.Tensor] = []
+        for layer in self.layers:
+            x, der = layer.forward_with_derivative(x)
+            ders.append(der)
+
+        dydx = v if v is not None else torch.ones_like(x)
+        idx = len(ders)
+        for layer in self.reversed_layers:
+            idx -= 1
+            dydx = layer.vjp(ders[idx], dydx)
+        return x, dydx
+
+    @torch.jit.export
+    def value_and_gradient(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        return self.value_and_vjp(x, None)
+
+    @torch.jit.export
+    def gradient(self, x: torch.Tensor) -> torch.Tensor:
+        return self.value_and_vjp(x, None)[1]
+
+
+class CompiledRobustGate(nn.Module):
+    """
+    Robust gate with the sigmoid fixed in the module graph, for TorchScript.
+    The parameters are shared with the original RobustGate.
+    """
+
+    def __init__(self, gate: RobustGate):
+        super(CompiledRobustGate, self).__init__()
+        self.input_size: int = gate.input_size
+        self.output_size: int = gate.output_size
+
+        activation_type = gate._activation_type
+        if isinstance(activation_type, str):
+            activation_type = ActivationType[activation_type.upper()]
+        self.sigmoid = ACTIVATION_MODULES[activation_type]()
+
+        self.w = gate.w
+        self.log_b = gate.log_b
+        self.log_m = gate.log_m
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        m, b = torch.exp(self.log_m), torch.exp(self.log_b)
+        return m * (self.sigmoid(self.w * x + b) - self.sigmoid(self.w * x - b))
+
+    @torch.jit.export
+    def value_and_vjp(
+        self, x: torch.Tensor, v: Optional[torch.Tensor] = None
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        m, b = torch.exp(self.log_m), torch.exp(self.log_b)
+        z_pos, z_neg = self.w * x + b, self.w * x - b
+
+        y = m * (self.sigmoid(z_pos) - self.sigmoid(z_neg))
+        dydx = (
+            m
+            * self.w
+            * (self.sigmoid.derivative(z_pos) - self.sigmoid.derivative(z_neg))
+        )
+        if v is not None:
+            dydx = v * dydx
+        return y, dydx
+
+    @torch.jit.export
+    def value_and_gradient(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        return self.value_and_vjp(x, None)
+
+    @torch.jit.export
+    def gradient(self, x: torch.Tensor) -> torch.Tensor:
+        return self.value_and_vjp(x, None)[1]
+
+
+class CompiledSequentialMLP(nn.Module):
+    """
+    Composition of compiled models, for TorchScript. The gradient follows the chain rule,
+    with the vector-jacobian products of the models from the last one.
+    """
+
+    def __init__(self, net: SequentialTorchMLP):
+        super(CompiledSequentialMLP, self).__init__()
+        self.input_size: int = net.input_size
+        self.output_size: int = net.output_size
+
+        mlps = [build_compiled_model(mlp) for mlp in net.mlps]
+        self.mlps = nn.ModuleList(mlps)
+        # torchscript only iterates module lists forward
+        self.reversed_mlps = nn.ModuleList(mlps[::-1])
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        for mlp in self.mlps:
+            x = mlp(x)
+        return x
+
+    @torch.jit.export
+    def value_and_vjp(
+        self, x: torch.Tensor, v: Optional[torch.Tensor] = None
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        inputs: List[torch.Tensor] = []
+        for mlp in self.mlps:
+            inputs.append(x)
+            x = mlp(x)
+
+        dydx = v if v is not None else torch.ones_like(x)
+        idx = len(inputs)
+        for mlp in self.reversed_mlps:
+            idx -= 1
+            dydx = mlp.value_and_vjp(inputs[idx], dydx)[1]
+        return x, dydx
+
+    @torch.jit.export
+    def value_and_gradient(self, x: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        return self.value_and_vjp(x, None)
+
+    @torch.jit.export
+    def gradient(self, x: torch.Tensor) -> torch.Tensor:
+        return self.value_and_vjp(x, None)[1]
+
+
+def build_compiled_model(model: nn.Module) -> nn.Module:
+    """
+    Returns the module with fixed activations for the given model, before scripting.
+    """
+    if isinstance(model, PrunedTorchMLP):
+        raise NotImplementedError("Compiling pruned networks is not supported")
+    elif isinstance(model, TorchMLP):
+        return CompiledMLP(model)
+    elif isinstance(model, SequentialTorchMLP):
+        return CompiledSequentialMLP(model)
+    elif isinstance(model, RobustGate):
+        return CompiledRobustGate(model)
+    else:
+        raise NotImplementedError(f"Compiling model {type(model)} is not supported")
+
+
+def compile_model(model: nn.Module, script: bool = True) -> nn.Module:
+    """
+    Compiles a model (TorchMLP, SequentialTorchMLP, RobustGate) for fast inference, eg. in rl rollouts.
+    The activations are fixed in the module graph, instead of dispatched at each call,
+    and the gradient is computed in the same pass as the output.
+
+    The compiled model shares the parameters with the original model, and exposes
+    forward, gradient and value_and_gradient. It can be saved with torch.jit.save.
+
+    Args:
+        model: model to compile
+        script: if True, returns the TorchScript module, otherwise the eager module (eg., for torch.compile)
+
+    Returns:
+        nn.Module: compiled model
+    """
+    compiled = build_compiled_model(model)
+    if script:
+        compiled = torch.jit.script(compiled)
+    return compiled
@@ -1,17 +1,23 @@
 import pathlib
 from functools import partial
-from typing import Iterable, Optional
+from typing import Callable, Iterable, Optional
 
 import numpy as np
 import torch
 from torch import nn
 
-from fosco.common.activations import activation
+from fosco.common.activations import activation, activation_der
 from fosco.common.activations_symbolic import activation_sym, activation_der_sym
+from fosco.common.linalg_symbolic import (
+    round_weights,
+    symbolic_matmul,
+    symbolic_row_scale,
+)
 from fosco.common.consts import ActivationType
 from fosco.models.utils import load_model
 from fosco.verifier.verifier import SYMBOL
 from fosco.models.torchsym import TorchSymDiffModel
+from fosco.verifier.utils import get_solver_fns
 
 
 def make_mlp(
@@ -112,16 +118,19 @@ class TorchMLP(TorchSymDiffModel):
         return y
 
     def forward_smt(
-        self, x: Iterable[SYMBOL]
+        self, x: Iterable[SYMBOL], cache: Optional["SymbolicCache"] = None
     ) -> tuple[SYMBOL, Iterable[SYMBOL], list[SYMBOL]]:
         input_vars = np.array(x).copy().reshape(-1, 1)
 
-        z, _ = network_until_last_layer(net=self, input_vars=input_vars)
+        if cache is not None:
+            z, _, z_constraints = cache.hidden(net=self, input_vars=input_vars)
+        else:
+            z, _, z_constraints = network_until_last_layer(
+                net=self, input_vars=input_vars
+            )
 
-        last_layer = self.layers[-1].weight.data.numpy()
-        z = last_layer @ z
-        if self.layers[-1].bias is not None:
-            z += self.layers[-1].bias.data.numpy()[:, None]
+        rounding = cache.rounding if cache is not None else -1
+        z = _affine_smt(layer=self.layers[-1], z=z, rounding=rounding)
 
         assert z.shape == (
             self.output_size,
@@ -140,7 +149,7 @@ class TorchMLP(TorchSymDiffModel):
         var_list = list(
             input_vars.flatten()
         )  # list(set([iv for iv in input_vars.flatten()]))
-        return z, [], var_list
+        return z, z_constraints, var_list
 
     def gradient(self, x: torch.Tensor) -> torch.Tensor:
         x_clone = torch.clone(x).requires_grad_()
@@ -154,24 +163,50 @@ class TorchMLP(TorchSymDiffModel):
         )[0]
         return dydx
 
+    def forward_with_jacobian(
+        self, x: torch.Tensor
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        Forward pass which also returns the jacobian of the network, in a single call.
+        The activation derivatives are computed alongside the activations, and the jacobian is
+        accumulated from the last layer, without autograd graph for the input gradient.
+
+        Args:
+            x: batch of inputs of shape (batch_size, input_size)
+
+        Returns:
+            tuple: output of shape (batch_size, output_size), and its jacobian
+                of shape (batch_size, output_size, input_size)
+        """
+        y, ders = x, []
+        for idx, layer in enumerate(self.layers):
+            z = layer(y)
+            y = activation(self.acts[idx], z)
+            ders.append(activation_der(self.acts[idx], z))
+
+        return y, _accumulate_jacobian(layers=self.layers, ders=ders)
+
     def gradient_smt(
-        self, x: Iterable[SYMBOL]
+        self, x: Iterable[SYMBOL], cache: Optional["SymbolicCache"] = None
     ) -> tuple[Iterable[SYMBOL], Iterable[SYMBOL], list[SYMBOL]]:
         input_vars = np.array(x).copy().reshape(-1, 1)
 
-        z, jacobian = network_until_last_layer(net=self, input_vars=input_vars)
-
-        last_layer = self.layers[-1].weight.data.numpy()
+        if cache is not None:
+            z, jacobian, z_constraints = cache.hidden(net=self, input_vars=input_vars)
+        else:
+            z, jacobian, z_constraints = network_until_last_layer(
+                net=self, input_vars=input_vars
+            )
 
-        zhat = last_layer @ z
-        if self.layers[-1].bias is not None:
-            zhat += self.layers[-1].bias.data.numpy()[:, None]
+        rounding = cache.rounding if cache is not None else -1
+        zhat = _affine_smt(layer=self.layers[-1], z=z, rounding=rounding)
 
         # last activation
         z = activation_sym(self.acts[-1], zhat)
 
-        jacobian = last_layer @ jacobian
-        jacobian = np.diagflat(activation_der_sym(self.acts[-1], zhat)) @ jacobian
+        last_layer = round_weights(self.layers[-1].weight.data.numpy(), rounding)
+        jacobian = symbolic_matmul(last_layer, jacobian)
+        jacobian = symbolic_row_scale(activation_der_sym(self.acts[-1], zhat), jacobian)
 
         gradV = jacobian
 
@@ -182,7 +217,7 @@ class TorchMLP(TorchSymDiffModel):
         ), f"Wrong shape of gradV, expected (1, {self.input_size}), got {gradV.shape}"
 
         var_list = list(set([iv for iv in input_vars.flatten()]))
-        return gradV, [], var_list
+        return gradV, z_constraints, var_list
 
     def save(self, outdir: str, model_name: str = "model") -> str:
         import pathlib
@@ -474,7 +509,7 @@ class SequentialTorchMLP(TorchSymDiffModel):
         return y
 
     def forward_smt(
-        self, x: Iterable[SYMBOL]
+        self, x: Iterable[SYMBOL], cache: Optional["SymbolicCache"] = None
     ) -> tuple[SYMBOL, Iterable[SYMBOL], list[SYMBOL]]:
         input_vars = np.array(x).copy().reshape(-1, 1)
 
@@ -483,7 +518,11 @@ class SequentialTorchMLP(TorchSymDiffModel):
         # note: we assume the input vars are the one given to the first mlp
         # other mlps do not introduce auxiliary variables
         for mlp in self.mlps:
-            z, new_constr, _ = mlp.forward_smt(z)
+            if cache is not None:
+                # inner mlps are not pruned, the box only bounds the inputs of the whole model
+                z, new_constr, _ = cache.forward_smt(net=mlp, x=z, prune=False)
+            else:
+                z, new_constr, _ = mlp.forward_smt(z)
             z_constraints.extend(new_constr)
 
         # if z is 1d, squeeze it and return symbolic expression
@@ -508,7 +547,7 @@ class SequentialTorchMLP(TorchSymDiffModel):
         return dydx
 
     def gradient_smt(
-        self, x: Iterable[SYMBOL]
+        self, x: Iterable[SYMBOL], cache: Optional["SymbolicCache"] = None
     ) -> tuple[Iterable[SYMBOL], Iterable[SYMBOL], list[SYMBOL]]:
         input_vars = np.array(x).copy().reshape(-1, 1)
 
@@ -516,8 +555,11 @@ class SequentialTorchMLP(TorchSymDiffModel):
         jacobian = np.eye(self.input_size, self.input_size)
         z_constraints = []
         for mlp in self.mlps:
-            z, new_jacobian = network_until_last_layer(mlp, z)
-            z_constraints.extend(new_jacobian)
+            if cache is not None:
+                z, new_jacobian, new_constr = cache.hidden(net=mlp, input_vars=z)
+            else:
+                z, new_jacobian, new_constr = network_until_last_layer(mlp, z)
+            z_constraints.extend(new_constr)
             jacobian = new_jacobian @ jacobian
 
         var_list = list(set([iv for iv in input_vars.flatten()]))
@@ -586,29 +628,238 @@ class SequentialTorchMLP(TorchSymDiffModel):
 
 
 def network_until_last_layer(
-    net: TorchMLP, input_vars: Iterable[SYMBOL]
-) -> tuple[np.ndarray, np.ndarray]:
+    net: TorchMLP,
+    input_vars: Iterable[SYMBOL],
+    new_var: Optional[Callable[[str], SYMBOL]] = None,
+    rounding: int = -1,
+) -> tuple[np.ndarray, np.ndarray, list[SYMBOL]]:
     """
     Utility for symbolic forward pass excluding the last layer.
 
+    Products with the weights only build the terms of non-zero weights. If rounding >= 0, the weights
+    are rounded to the given number of decimals before building the terms, and rounded to zero are skipped.
+
+    If new_var is given, the output and jacobian of each hidden neuron are replaced by fresh variables,
+    and their definitions are returned as equality constraints. The formula size grows linearly
+    with the number of neurons, instead of nesting the expressions of all the previous layers.
+
+    Hidden neurons marked in `net.linear_masks` (eg., stable neurons of a pruned network)
+    are translated as identity, without activation terms.
+
     :param net: network model
     :param input_vars: list of symbolic variables
-    :return: tuple (net output, its jacobian)
+    :param new_var: optional factory of fresh variables, called with a name unique in the network
+    :param rounding: number of decimals of the weights, -1 for no rounding
+    :return: tuple (net output, its jacobian, constraints defining the auxiliary variables)
     """
     z = input_vars
     jacobian = np.eye(net.input_size, net.input_size)
+    constraints = []
+    linear_masks = getattr(net, "linear_masks", None)
 
     for idx, layer in enumerate(net.layers[:-1]):
-        w = layer.weight.data.numpy()
-        if layer.bias is not None:
-            b = layer.bias.data.numpy()[:, None]
+        zhat = _affine_smt(layer=layer, z=z, rounding=rounding)
+        linear = linear_masks[idx].numpy() if linear_masks is not None else None
+        z, der = _activation_smt(net.acts[idx], zhat, linear=linear)
+
+        w = round_weights(layer.weight.data.numpy(), rounding)
+        jacobian = symbolic_matmul(w, jacobian)
+        jacobian = symbolic_row_scale(der, jacobian)
+
+        if new_var is not None:
+            z, z_constr = _aux_encoding(z, name=f"h{idx}", new_var=new_var)
+            jacobian, jac_constr = _aux_encoding(
+                jacobian, name=f"dh{idx}", new_var=new_var
+            )
+            constraints.extend(z_constr + jac_constr)
+
+    return z, jacobian, constraints
+
+
+def _affine_smt(layer: nn.Linear, z: np.ndarray, rounding: int = -1) -> np.ndarray:
+    """
+    Symbolic affine transformation of a linear layer, w @ z + b, with sparse products.
+    """
+    w = round_weights(layer.weight.data.numpy(), rounding)
+    zhat = symbolic_matmul(w, z)
+    if layer.bias is not None:
+        zhat = zhat + round_weights(layer.bias.data.numpy(), rounding)[:, None]
+    return zhat
+
+
+def _accumulate_jacobian(
+    layers: list[nn.Linear], ders: list[torch.Tensor]
+) -> torch.Tensor:
+    """
+    Jacobian of the network from the activation derivatives of each layer, each of shape (batch_size, n_out),
+    as diag(der_L) W_L ... diag(der_1) W_1, accumulated from the last layer.
+    """
+    jacobian = None
+    for layer, der in zip(reversed(layers), reversed(ders)):
+        if jacobian is None:
+            jacobian = torch.diag_embed(der)
         else:
-            b = np.zeros((layer.out_features, 1))
+            jacobian = jacobian * der.unsqueeze(1)
+        jacobian = jacobian @ layer.weight
+    return jacobian
+
+
+def _activation_smt(
+    act: ActivationType, zhat: np.ndarray, linear: Optional[np.ndarray] = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Symbolic activation and its derivative, where the neurons in the linear mask are the identity.
+    """
+    if linear is None or not linear.any():
+        return activation_sym(act, zhat), activation_der_sym(act, zhat)
 
-        zhat = w @ z + b
-        z = activation_sym(net.acts[idx], zhat)
+    z = np.array(zhat, dtype=object)
+    der = np.ones(zhat.shape, dtype=object)
+    nonlinear = ~linear
+    if nonlinear.any():
+        z[nonlinear] = activation_sym(act, zhat[nonlinear])
+        der[nonlinear] = np.reshape(activation_der_sym(act, zhat[nonlinear]), (-1, 1))
+    return z, der
 
-        jacobian = w @ jacobian
-        jacobian = np.diagflat(activation_der_sym(net.acts[idx], zhat)) @ jacobian
 
-    return z, jacobian
+def _aux_encoding(
+    values: np.ndarray, name: str, new_var: Callable[[str], SYMBOL]
+) -> tuple[np.ndarray, list[SYMBOL]]:
+    """
+    Replaces the symbolic entries of the array with fresh variables, numerical entries are kept.
+    Returns the new array and the equalities defining the variables.
+    """
+    values = np.array(values, dtype=object)
+    constraints = []
+    for index in np.ndindex(values.shape):
+        if isinstance(values[index], SYMBOL):
+            var = new_var("_".join([name] + [str(i) for i in index]))
+            constraints.append(var == values[index])
+            values[index] = var
+    return values, constraints
+
+
+class SymbolicCache:
+    """
+    Cache of the symbolic passes of the networks, to translate each network once per cegis iteration.
+
+    The hidden layers (output and jacobian) of an mlp are shared by its forward and gradient passes,
+    and repeated passes on the same inputs are returned from the cache (eg., the gradient of V
+    for both the Lie derivative and its residual).
+
+    Entries are keyed by the identity of network and inputs, they are not invalidated when the
+    weights change: a new cache must be used after each training step.
+
+    If prune_box is given, the mlps are pruned over the box before the translation (see prune_network),
+    so the symbolic passes are only equivalent to the networks for inputs within the box.
+    The inner mlps of sequential models do not take the box inputs and are translated with prune=False.
+
+    Args:
+        aux_vars: if True, hidden neurons are encoded with auxiliary variables (see network_until_last_layer)
+        rounding: number of decimals of the weights, -1 for no rounding
+        prune_box: optional bounds (lb, ub) of the network inputs, to prune the stable neurons
+    """
+
+    def __init__(
+        self,
+        aux_vars: bool = False,
+        rounding: int = -1,
+        prune_box: Optional[tuple[torch.Tensor, torch.Tensor]] = None,
+    ):
+        self.aux_vars = aux_vars
+        self.rounding = rounding
+        self.prune_box = prune_box
+
+        self._hidden = {}
+        self._pruned = {}
+        self._passes = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(net: torch.nn.Module, input_vars: np.ndarray) -> tuple:
+        return id(net), tuple(id(v) for v in input_vars.flatten())
+
+    def hidden(
+        self, net: TorchMLP, input_vars: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, list[SYMBOL]]:
+        """
+        Returns the symbolic output of the network until the last layer, its jacobian and
+        the constraints defining the auxiliary variables.
+        """
+        key = self._key(net=net, input_vars=input_vars)
+        if key in self._hidden:
+            self.hits += 1
+            return self._hidden[key][1]
+
+        new_var = None
+        if self.aux_vars:
+            # variable names are unique across the networks and inputs translated with this cache
+            new_var = partial(
+                self._new_var, input_vars=input_vars, prefix=f"_n{self.misses}_"
+            )
+        self.misses += 1
+        # inputs are stored with the result, so their ids are not reused while cached
+        self._hidden[key] = (
+            input_vars,
+            network_until_last_layer(
+                net=net, input_vars=input_vars, new_var=new_var, rounding=self.rounding
+            ),
+        )
+        return self._hidden[key][1]
+
+    @staticmethod
+    def _new_var(name: str, input_vars: np.ndarray, prefix: str) -> SYMBOL:
+        symbols = [v for v in input_vars.flatten() if isinstance(v, SYMBOL)]
+        return get_solver_fns(x=symbols)["RealVar"](prefix + name)
+
+    def forward_smt(
+        self, net: torch.nn.Module, x: Iterable[SYMBOL], prune: bool = True
+    ) -> tuple[SYMBOL, Iterable[SYMBOL], list[SYMBOL]]:
+        return self._symbolic_pass(net=net, x=x, method="forward_smt", prune=prune)
+
+    def gradient_smt(
+        self, net: torch.nn.Module, x: Iterable[SYMBOL], prune: bool = True
+    ) -> tuple[Iterable[SYMBOL], Iterable[SYMBOL], list[SYMBOL]]:
+        return self._symbolic_pass(net=net, x=x, method="gradient_smt", prune=prune)
+
+    def _symbolic_pass(
+        self, net: torch.nn.Module, x: Iterable[SYMBOL], method: str, prune: bool
+    ):
+        input_vars = np.array(x).copy().reshape(-1, 1)
+        key = (method, prune) + self._key(net=net, input_vars=input_vars)
+        if key in self._passes:
+            self.hits += 1
+            return self._passes[key][1]
+
+        if prune and self.prune_box is not None and isinstance(net, TorchMLP):
+            net = self.pruned(net)
+
+        # only mlps reuse the hidden layers, other models (eg., analytical barriers) are called as they are
+        if isinstance(net, (TorchMLP, SequentialTorchMLP)):
+            result = getattr(net, method)(x=x, cache=self)
+        else:
+            result = getattr(net, method)(x=x)
+        self._passes[key] = (input_vars, result)
+        return result
+
+    def pruned(self, net: TorchMLP) -> TorchMLP:
+        """
+        Returns the network pruned over the box, or the network itself if it cannot be pruned
+        (eg., inputs not matching the box, activations without interval bounds).
+        """
+        from fosco.models.pruning import prune_network
+
+        if id(net) in self._pruned:
+            return self._pruned[id(net)][1]
+
+        lb, ub = self.prune_box
+        pruned = net
+        if net.input_size == len(lb):
+            try:
+                pruned, _ = prune_network(net=net, lb=lb, ub=ub)
+            except NotImplementedError:
+                pass
+        # the original network is stored with the result, so its id is not reused while cached
+        self._pruned[id(net)] = (net, pruned)
+        return pruned
@@ -0,0 +1,156 @@
+import logging
+import math
+
+import torch
+
+from fosco.common.activations import activation, activation_der
+from fosco.common.bounds import activation_bounds, affine_bounds
+from fosco.common.consts import ActivationType
+from fosco.models.network import TorchMLP, _accumulate_jacobian
+
+_logger = logging.getLogger(__name__)
+
+# piecewise-linear activations, as list of pieces (lower, upper, slope, offset) over the pre-activation
+LINEAR_PIECES = {
+    ActivationType.RELU: [(-math.inf, 0.0, 0.0, 0.0), (0.0, math.inf, 1.0, 0.0)],
+    ActivationType.HTANH: [
+        (-math.inf, -1.0, 0.0, -1.0),
+        (-1.0, 1.0, 1.0, 0.0),
+        (1.0, math.inf, 0.0, 1.0),
+    ],
+    ActivationType.HSIGMOID: [
+        (-math.inf, -3.0, 0.0, 0.0),
+        (-3.0, 3.0, 1.0 / 6.0, 0.5),
+        (3.0, math.inf, 0.0, 1.0),
+    ],
+}
+
+
+class PrunedTorchMLP(TorchMLP):
+    """
+    Multi-layer perceptron where some hidden neurons are linear (identity), as result of pruning
+    a network over an input box: it is equivalent to the original network only within the box.
+
+    Args:
+        linear_masks: boolean mask of the linear neurons, for each hidden layer
+        *args, **kwargs: arguments of TorchMLP
+    """
+
+    def __init__(self, *args, linear_masks: list[torch.Tensor], **kwargs):
+        super(PrunedTorchMLP, self).__init__(*args, **kwargs)
+        self.linear_masks = linear_masks
+
+        assert len(self.linear_masks) == len(self.layers) - 1, (
+            f"Expected one mask for each hidden layer, got {len(self.linear_masks)} "
+            f"for {len(self.layers) - 1} layers"
+        )
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        y = x
+        for idx, layer in enumerate(self.layers):
+            z = layer(y)
+            y = activation(self.acts[idx], z)
+            if idx < len(self.linear_masks):
+                y = torch.where(self.linear_masks[idx], z, y)
+
+        return y
+
+    def forward_with_jacobian(
+        self, x: torch.Tensor
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        y, ders = x, []
+        for idx, layer in enumerate(self.layers):
+            z = layer(y)
+            y = activation(self.acts[idx], z)
+            der = activation_der(self.acts[idx], z)
+            if idx < len(self.linear_masks):
+                y = torch.where(self.linear_masks[idx], z, y)
+                der = torch.where(self.linear_masks[idx], torch.ones_like(der), der)
+            ders.append(der)
+
+        return y, _accumulate_jacobian(layers=self.layers, ders=ders)
+
+
+def prune_network(
+    net: TorchMLP, lb: torch.Tensor, ub: torch.Tensor
+) -> tuple[PrunedTorchMLP, dict[str, int]]:
+    """
+    Removes the hidden neurons of piecewise-linear activations (relu, htanh, hsigmoid) which are stable
+    over the input box, using interval bound propagation:
+        - neurons which are constant (eg., inactive relu) are folded into the bias of the next layer,
+        - neurons which are linear (eg., active relu) are marked as linear, so their activation
+          is not translated as an if-then-else term.
+
+    Args:
+        net: multi-layer perceptron
+        lb: lower bounds of the input box, shape (input_size,)
+        ub: upper bounds of the input box, shape (input_size,)
+
+    Returns:
+        tuple: network equivalent to net within the box, and number of removed and linear neurons
+    """
+    weights = [layer.weight.detach().double().clone() for layer in net.layers]
+    biases = [
+        (
+            layer.bias.detach().double().clone()
+            if layer.bias is not None
+            else torch.zeros(layer.out_features, dtype=torch.float64)
+        )
+        for layer in net.layers
+    ]
+
+    y_lb, y_ub = torch.as_tensor(lb).double(), torch.as_tensor(ub).double()
+    linear_masks = []
+    stats = {"n_neurons": 0, "n_removed": 0, "n_linear": 0}
+    for idx, act in enumerate(net.acts[:-1]):
+        z_lb, z_ub = affine_bounds(weights[idx], biases[idx], y_lb, y_ub)
+        y_lb, y_ub = activation_bounds(act, z_lb, z_ub)
+
+        n_neurons = len(z_lb)
+        keep = torch.ones(n_neurons, dtype=torch.bool)
+        linear = torch.zeros(n_neurons, dtype=torch.bool)
+        for lower, upper, slope, offset in LINEAR_PIECES.get(act, []):
+            stable = (z_lb >= lower) & (z_ub <= upper)
+            if slope == 0.0:
+                # constant output, moved to the bias of the next layer
+                biases[idx + 1] += weights[idx + 1][:, stable].sum(dim=1) * offset
+                keep &= ~stable
+            else:
+                # linear output, the affine piece is moved into the layer
+                weights[idx][stable] *= slope
+                biases[idx][stable] = slope * biases[idx][stable] + offset
+                linear |= stable
+
+        if not keep.any():
+            # all neurons are constant: keep a zero neuron, to preserve the layer
+            keep[0], linear[0] = True, True
+            weights[idx][0], biases[idx][0] = 0.0, 0.0
+            weights[idx + 1][:, 0] = 0.0
+            y_lb[0], y_ub[0] = 0.0, 0.0
+
+        weights[idx], biases[idx] = weights[idx][keep], biases[idx][keep]
+        weights[idx + 1] = weights[idx + 1][:, keep]
+        y_lb, y_ub = y_lb[keep], y_ub[keep]
+        linear_masks.append(linear[keep])
+
+        stats["n_neurons"] += n_neurons
+        stats["n_removed"] += n_neurons - int(keep.sum())
+        stats["n_linear"] += int(linear[keep].sum())
+
+    pruned = PrunedTorchMLP(
+        input_size=net.input_size,
+        hidden_sizes=tuple(len(b) for b in biases[:-1]),
+        activation=tuple(net.acts[:-1]),
+        output_size=net.output_size,
+        output_activation=net.acts[-1],
+        linear_masks=linear_masks,
+    )
+    for layer, weight, bias in zip(pruned.layers, weights, biases):
+        layer.weight.data = weight.to(layer.weight.dtype)
+        layer.bias.data = bias.to(layer.bias.dtype)
+
+    _logger.debug(
+        f"Pruned network: {stats['n_removed']} constant and {stats['n_linear']} linear "
+        f"out of {stats['n_neurons']} hidden neurons"
+    )
+    return pruned, stats
@@ -25,6 +25,9 @@ def make_translator(
     if time_domain == TimeDomain.CONTINUOUS and verifier_type in [
         VerifierType.Z3,
         VerifierType.DREAL,
+        VerifierType.PORTFOLIO,
+        VerifierType.MILP,
+        VerifierType.SMTLIB,
     ]:
         if certificate_type == CertificateType.RCBF:
             return RobustMLPTranslator(**kwargs)
@@ -37,6 +40,9 @@ def make_translator(
     elif time_domain == TimeDomain.DISCRETE and verifier_type in [
         VerifierType.Z3,
         VerifierType.DREAL,
+        VerifierType.PORTFOLIO,
+        VerifierType.MILP,
+        VerifierType.SMTLIB,
     ]:
         if certificate_type == CertificateType.RCBF:
             return RobustMLPTranslatorDT(**kwargs)
@@ -1,15 +1,49 @@
 import logging
 from abc import ABC, abstractmethod
+from typing import Iterable, Optional
 
+import torch
+
+from fosco.common.consts import NetworkEncoding
 from fosco.logger import LOGGING_LEVELS
+from fosco.models.network import SymbolicCache
 
 
 class Translator(ABC):
     """
     Abstract class for symbolic translators.
+
+    Args:
+        network_encoding: inline the networks in a single expression, or encode each hidden neuron
+            with an auxiliary variable defined by equality constraints
+        rounding: number of decimals the weights are rounded to, -1 for no rounding
+        pruning_box: optional bounds (lb, ub) of the state domain, to prune the neurons which are
+            stable over the domain before translating the networks
+        verbose: verbosity level
     """
 
-    def __init__(self, verbose: int = 0):
+    def __init__(
+        self,
+        network_encoding: str | NetworkEncoding = NetworkEncoding.INLINE,
+        rounding: int = -1,
+        pruning_box: Optional[tuple[Iterable[float], Iterable[float]]] = None,
+        verbose: int = 0,
+    ):
+        if isinstance(network_encoding, str):
+            network_encoding = NetworkEncoding[network_encoding.upper()]
+        self.network_encoding = network_encoding
+        self.rounding = rounding
+        assert (
+            isinstance(self.rounding, int) and self.rounding >= -1
+        ), "rounding must be an integer >= -1"
+        self.pruning_box = None
+        if pruning_box is not None:
+            lb, ub = pruning_box
+            self.pruning_box = (
+                torch.tensor(lb, dtype=torch.float64),
+                torch.tensor(ub, dtype=torch.float64),
+            )
+
         self._assert_state()
 
         self._logger = logging.getLogger(__name__)
@@ -20,6 +54,16 @@ class Translator(ABC):
     def _assert_state(self) -> None:
         raise NotImplementedError("")
 
+    def _new_cache(self) -> SymbolicCache:
+        """
+        Returns an empty cache of symbolic passes, for the translation of the current networks.
+        """
+        return SymbolicCache(
+            aux_vars=self.network_encoding == NetworkEncoding.AUX,
+            rounding=self.rounding,
+            prune_box=self.pruning_box,
+        )
+
     @abstractmethod
     def translate(self, **kwargs) -> dict:
         """
@@ -1,9 +1,10 @@
-from typing import Iterable
+from typing import Iterable, Optional
 
 import numpy as np
 
 from fosco.common.timing import timed
 from fosco.models import TorchMLP
+from fosco.models.network import SymbolicCache
 from fosco.translator import Translator
 from fosco.verifier.types import SYMBOL
 
@@ -27,6 +28,7 @@ class MLPTranslator(Translator):
         x_v_map: dict[str, Iterable[SYMBOL]],
         V_net: TorchMLP,
         xdot: Iterable[SYMBOL],
+        cache: Optional[SymbolicCache] = None,
         **kwargs,
     ) -> dict:
         """
@@ -37,6 +39,7 @@ class MLPTranslator(Translator):
             x_v_map: dict of symbolic variables
             V_net: network model
             xdot: symbolic expression of the nominal system dynamics
+            cache: symbolic passes shared with other translations of the same networks (optional)
             **kwargs:
 
         Returns:
@@ -46,10 +49,14 @@ class MLPTranslator(Translator):
 
         x_vars = x_v_map["v"]
         xdot = np.array(xdot).reshape(-1, 1)
+        cache = cache if cache is not None else self._new_cache()
 
-        V_symbolic, V_symbolic_constr, V_symbolic_vars = V_net.forward_smt(x=x_vars)
-        Vgrad_symbolic, Vdot_symbolic_constr, Vgrad_symbolic_vars = V_net.gradient_smt(
-            x=x_vars
+        # forward and gradient share the symbolic hidden layers
+        V_symbolic, V_symbolic_constr, V_symbolic_vars = cache.forward_smt(
+            net=V_net, x=x_vars
+        )
+        Vgrad_symbolic, Vdot_symbolic_constr, Vgrad_symbolic_vars = cache.gradient_smt(
+            net=V_net, x=x_vars
         )
         Vdot_symbolic = (Vgrad_symbolic @ xdot)[0, 0]
         Vdot_symbolic_vars = Vgrad_symbolic_vars
@@ -1,7 +1,9 @@
-from typing import Iterable
+from typing import Iterable, Optional
 
+from fosco.common.consts import NetworkEncoding
 from fosco.common.timing import timed
 from fosco.models import TorchMLP
+from fosco.models.network import SymbolicCache
 from fosco.translator import Translator
 from fosco.verifier.types import SYMBOL
 from fosco.verifier.utils import get_solver_simplify
@@ -18,7 +20,15 @@ class MLPTranslatorDT(Translator):
         self._logger.debug("MLPTranslatorDT initialized")
 
     def _assert_state(self) -> None:
-        pass
+        # the next states are not bounded by the domain, so the networks cannot be pruned over it
+        assert (
+            self.pruning_box is None
+        ), "Network pruning not supported for discrete-time translators"
+        # the auxiliary variables of the next-state network depend on the input, so they would be
+        # shared across the input vertices substituted in the feasibility condition
+        assert (
+            self.network_encoding == NetworkEncoding.INLINE
+        ), "Auxiliary network encoding not supported for discrete-time translators"
 
     @timed
     def translate(
@@ -26,6 +36,7 @@ class MLPTranslatorDT(Translator):
         x_v_map: dict[str, Iterable[SYMBOL]],
         V_net: TorchMLP,
         xdot: Iterable[SYMBOL],
+        cache: Optional[SymbolicCache] = None,
         **kwargs,
     ) -> dict:
         """
@@ -35,6 +46,7 @@ class MLPTranslatorDT(Translator):
             x_v_map: dict of symbolic variables
             V_net: network model
             xdot: symbolic expression of the discrete-time system dynamics
+            cache: symbolic passes shared with other translations of the same networks (optional)
             **kwargs:
 
         Returns:
@@ -44,23 +56,23 @@ class MLPTranslatorDT(Translator):
 
         x_vars = x_v_map["v"]
         symplify_fn = get_solver_simplify(x_vars)
+        cache = cache if cache is not None else self._new_cache()
 
-        V_symbolic, V_symbolic_constr, V_symbolic_vars = V_net.forward_smt(x=x_vars)
-        V_symbolic = symplify_fn(V_symbolic)
-        Vnext_symbolic, Vnext_symbolic_constr, Vnext_symbolic_vars = V_net.forward_smt(
-            x=xdot
+        V_symbolic, V_symbolic_constr, V_symbolic_vars = cache.forward_smt(
+            net=V_net, x=x_vars
         )
+        V_symbolic = symplify_fn(V_symbolic)
+        (
+            Vnext_symbolic,
+            Vnext_symbolic_constr,
+            Vnext_symbolic_vars,
+        ) = cache.forward_smt(net=V_net, x=xdot)
         Vnext_symbolic = symplify_fn(Vnext_symbolic)
         Vdot_symbolic = Vnext_symbolic - V_symbolic
         Vdot_symbolic = symplify_fn(Vdot_symbolic)
-        Vdot_symbolic_constr = V_symbolic_constr
+        Vdot_symbolic_constr = V_symbolic_constr + Vnext_symbolic_constr
         Vdot_symbolic_vars = V_symbolic_vars
 
-        assert len(V_symbolic_constr) == 0, "Expected no constraints for V_symbolic"
-        assert (
-            len(Vnext_symbolic_constr) == 0
-        ), "Expected no constraints for Vnext_symbolic"
-
         assert isinstance(
             V_symbolic, SYMBOL
         ), f"Expected V_symbolic to be {SYMBOL}, got {type(V_symbolic)}"
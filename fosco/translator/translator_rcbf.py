@@ -46,7 +46,10 @@ class RobustMLPTranslator(MLPTranslator):
         assert xdot_residual is not None, "xdot_residual not supported"
 
         # note: ignore elapsed_time here, it is because of the decorator timed
-        symbolic_dict, elapsed_time = super().translate(x_v_map, V_net, xdot)
+        cache = self._new_cache()
+        symbolic_dict, elapsed_time = super().translate(
+            x_v_map, V_net, xdot, cache=cache
+        )
 
         x_vars = x_v_map["v"]
         xdot_residual = np.array(xdot_residual).reshape(-1, 1)
@@ -56,11 +59,11 @@ class RobustMLPTranslator(MLPTranslator):
             sigma_symbolic,
             sigma_symbolic_constr,
             sigma_symbolic_vars,
-        ) = sigma_net.forward_smt(x=x_vars)
+        ) = cache.forward_smt(net=sigma_net, x=x_vars)
 
-        # lie derivative under uncertain dynamics
-        Vgrad_symbolic, Vgrad_symbolic_constr, Vgrad_symbolic_vars = V_net.gradient_smt(
-            x=x_vars
+        # lie derivative under uncertain dynamics, reusing the gradient of the nominal one
+        Vgrad_symbolic, Vgrad_symbolic_constr, Vgrad_symbolic_vars = cache.gradient_smt(
+            net=V_net, x=x_vars
         )
         Vdot_residual_symbolic = (Vgrad_symbolic @ xdot_residual)[0, 0]
         Vdot_residual_symbolic_constr = Vgrad_symbolic_constr
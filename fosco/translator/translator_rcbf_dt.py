@@ -57,7 +57,10 @@ class RobustMLPTranslatorDT(MLPTranslatorDT):
         symplify_fn = get_solver_simplify(x_vars)
 
         # note: ignore elapsed_time here, it is because of the decorator timed
-        symbolic_dict, elapsed_time = super().translate(x_v_map, V_net, xdot)
+        cache = self._new_cache()
+        symbolic_dict, elapsed_time = super().translate(
+            x_v_map, V_net, xdot, cache=cache
+        )
 
         # symbolic expressions for the nominal system dynamics
         V_symbolic = symbolic_dict["V_symbolic"]
@@ -68,7 +71,7 @@ class RobustMLPTranslatorDT(MLPTranslatorDT):
             sigma_symbolic,
             sigma_symbolic_constr,
             sigma_symbolic_vars,
-        ) = sigma_net.forward_smt(x=x_vars)
+        ) = cache.forward_smt(net=sigma_net, x=x_vars)
         sigma_symbolic = symplify_fn(sigma_symbolic)
 
         # time-diff of barrier at the next step under uncertain dynamics
@@ -77,13 +80,13 @@ class RobustMLPTranslatorDT(MLPTranslatorDT):
             Vnextz_symbolic,
             Vnextz_symbolic_constr,
             Vnextz_symbolic_vars,
-        ) = V_net.forward_smt(x=next_xz)
+        ) = cache.forward_smt(net=V_net, x=next_xz)
         Vdotz_symbolic = Vnextz_symbolic - V_symbolic
 
         # residual in the time-difference of V
         Vdot_residual_symbolic = Vdotz_symbolic - Vdot_symbolic
         Vdot_residual_symbolic = symplify_fn(Vdot_residual_symbolic)
-        Vdot_residual_symbolic_constr = []
+        Vdot_residual_symbolic_constr = Vnextz_symbolic_constr
         Vdot_residual_symbolic_vars = []
 
         assert isinstance(
@@ -16,5 +16,17 @@ def make_verifier(type: str | VerifierType) -> Type[Verifier]:
         from fosco.verifier.dreal_verifier import VerifierDR
 
         return VerifierDR
+    elif type == VerifierType.PORTFOLIO:
+        from fosco.verifier.portfolio_verifier import VerifierPortfolio
+
+        return VerifierPortfolio
+    elif type == VerifierType.MILP:
+        from fosco.verifier.milp_verifier import VerifierMILP
+
+        return VerifierMILP
+    elif type == VerifierType.SMTLIB:
+        from fosco.verifier.smtlib_verifier import VerifierSMTLIB
+
+        return VerifierSMTLIB
     else:
         raise ValueError(f"Unknown verifier type {type}")
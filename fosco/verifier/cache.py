@@ -0,0 +1,112 @@
+import hashlib
+import logging
+import os
+import pathlib
+from typing import Any, Optional
+
+import torch
+
+from fosco.logger import LOGGING_LEVELS
+
+
+class VerificationCache:
+    """
+    On-disk cache of verification results.
+
+    Results are indexed by a hash of the models' weights, the certificate type, the domains
+    and the verifier settings. On a hit, the stored outcome and counterexamples are returned
+    and both translation and verification can be skipped.
+    """
+
+    def __init__(self, cache_dir: str | pathlib.Path, verbose: int = 0):
+        self._cache_dir = pathlib.Path(cache_dir)
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+
+        self._logger = logging.getLogger(__name__)
+        self._logger.setLevel(LOGGING_LEVELS[verbose])
+        self._logger.debug(f"Verification cache initialized in {self._cache_dir}")
+
+    def make_key(
+        self,
+        nets: dict[str, Optional[torch.nn.Module]],
+        certificate_type: str,
+        domains: dict[str, Any],
+        settings: dict[str, Any],
+    ) -> str:
+        """
+        Computes the cache key of a verification query.
+
+        Args:
+            nets: dictionary of (name, model), eg. barrier and compensator, None if not used
+            certificate_type: type of certificate being verified
+            domains: dictionary of (name, domain), hashed by their string representation
+            settings: other parameters affecting the result (eg., timeout, rounding)
+
+        Returns:
+            str: hexadecimal digest identifying the query
+        """
+        h = hashlib.sha256()
+        h.update(f"certificate={str(certificate_type).lower()}".encode())
+
+        for name in sorted(nets):
+            net = nets[name]
+            h.update(f"net={name}:{type(net).__qualname__}".encode())
+            if net is None:
+                continue
+            if not hasattr(net, "state_dict"):
+                h.update(repr(net).encode())
+                continue
+            for param_name, param in net.state_dict().items():
+                param = param.detach().cpu().contiguous()
+                h.update(f"{param_name}:{param.dtype}:{tuple(param.shape)}".encode())
+                h.update(param.numpy().tobytes())
+
+        for name in sorted(domains):
+            h.update(f"domain={name}:{domains[name]}".encode())
+
+        for name in sorted(settings):
+            h.update(f"setting={name}:{settings[name]}".encode())
+
+        return h.hexdigest()
+
+    def load(self, key: str) -> Optional[dict]:
+        """
+        Returns the stored verification outputs, or None if the key is not in the cache.
+        """
+        path = self._path(key)
+        if not path.exists():
+            self._logger.debug(f"Cache miss: {key}")
+            return None
+
+        try:
+            entry = torch.load(path)
+        except Exception as e:
+            self._logger.warning(f"Cannot read cache entry {path}: {e}")
+            return None
+
+        self._logger.info(f"Cache hit: {key}")
+        return {"found": entry["found"], "cex": entry["cex"]}
+
+    def save(self, key: str, outputs: dict) -> None:
+        """
+        Stores the verification outputs, ie. the overall result and the counterexamples per condition.
+        """
+        cex = {
+            label: None if points is None else points.detach().cpu()
+            for label, points in outputs["cex"].items()
+        }
+        entry = {
+            "found": bool(outputs["found"]),
+            "cex": cex,
+            "sat": {label: points is not None for label, points in cex.items()},
+        }
+
+        # write to a temporary file first, so concurrent runs never read partial entries
+        path = self._path(key)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        torch.save(entry, tmp_path)
+        os.replace(tmp_path, path)
+        self._logger.debug(f"Cache entry saved: {path}")
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self._cache_dir / f"{key}.pt"
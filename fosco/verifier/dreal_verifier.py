@@ -1,10 +1,12 @@
-import multiprocessing.context
+import multiprocessing
+import operator
 import timeit
-from multiprocessing.pool import ThreadPool
+from functools import partial, reduce
 from typing import Callable, Optional
 
 import dreal
 
+from fosco.common.parallel import run_forked
 from fosco.common.utils import contains_object
 from fosco.verifier import Verifier
 from fosco.verifier.types import DRSYMBOL
@@ -13,6 +15,7 @@ from fosco.verifier.types import DRSYMBOL
 class VerifierDR(Verifier):
     INFINITY: float = 1e300
     SECOND_CHANCE_BOUND: float = 1e3
+    DELTA: float = 0.0001
 
     def _assert_state(self) -> None:
         super()._assert_state()
@@ -22,6 +25,7 @@ class VerifierDR(Verifier):
         assert isinstance(
             self.constraints_method, Callable
         ), f"Expected callable, got {self.constraints_method}"
+        assert not self._incremental, "dReal does not support incremental solving"
 
     @staticmethod
     def new_vars(
@@ -58,6 +62,7 @@ class VerifierDR(Verifier):
                 replacement[0], replacement[1]
             ),
             "RealVal": lambda real: real,
+            "Sum": lambda *args: reduce(operator.add, args, dreal.Expression(0.0)),
         }
 
     @staticmethod
@@ -79,30 +84,66 @@ class VerifierDR(Verifier):
         )
 
     def _solver_solve(self, solver, fml):
-        timedout = False
-
-        pool = ThreadPool(processes=1)
-        async_result = pool.apply_async(dreal.CheckSatisfiability, args=(fml, 0.0001))
+        if multiprocessing.current_process().daemon:
+            # already running in a worker process, which the parent kills on timeout
+            return self._check_satisfiability(fml), False
+
+        # dreal formulas cannot be serialized, so each query runs in a forked process,
+        # which is terminated for real when the time limit is reached
+        t0 = timeit.default_timer()
+        results = run_forked(
+            tasks={"fml": partial(self._check_satisfiability_serialized, fml)},
+            n_workers=1,
+            timeout=self._solver_timeout,
+        )
 
-        try:
-            t0 = timeit.default_timer()
-            res = async_result.get(timeout=self._solver_timeout)
-        except multiprocessing.context.TimeoutError:
-            res = None
-            timedout = True
+        if "fml" not in results:
             self._logger.info(
-                f"Timed out while solving, kill after {timeit.default_timer() - t0} sec"
+                f"Timed out while solving, killed after {timeit.default_timer() - t0} sec"
             )
-            return res, timedout
+            return None, True
+
+        res = self._deserialize_box(results["fml"], fml)
+        return res, False
+
+    def _check_satisfiability(self, fml):
+        res = dreal.CheckSatisfiability(fml, self.DELTA)
 
         if self.is_sat(res) and not self.within_bounds(res):
             And_ = self.solver_fncts()["And"]
             self._logger.info("Second chance bound used")
             new_bound = self.SECOND_CHANCE_BOUND
             fml = And_(fml, *(And_(x < new_bound, x > -new_bound) for x in self.xs))
-            res = dreal.CheckSatisfiability(fml, 0.0001)
+            res = dreal.CheckSatisfiability(fml, self.DELTA)
+
+        return res
 
-        return res, timedout
+    def _check_satisfiability_serialized(self, fml) -> Optional[dict]:
+        """
+        Solves the formula and returns the model as {variable name: (lower bound, upper bound)},
+        which can be sent back from a worker process.
+        """
+        res = self._check_satisfiability(fml)
+        if not self.is_sat(res):
+            return None
+        return {str(x): (interval.lb(), interval.ub()) for x, interval in res.items()}
+
+    def _deserialize_box(self, intervals: Optional[dict], fml) -> Optional[dreal.Box]:
+        if intervals is None:
+            return None
+
+        variables = {str(x): x for x in fml.GetFreeVariables()}
+        variables.update({str(x): x for x in self.xs})
+        box_vars = [variables[name] for name in intervals]
+
+        box = dreal.Box(box_vars)
+        for x in box_vars:
+            box[x] = dreal.Interval(*intervals[str(x)])
+        return box
+
+    def _formula_vars(self, fml, vars: list[DRSYMBOL]) -> list[DRSYMBOL]:
+        fml_var_names = {str(v) for v in fml.GetFreeVariables()}
+        return [v for v in vars if str(v) in fml_var_names]
 
     def _solver_model(self, solver, res):
         assert self.is_sat(res)
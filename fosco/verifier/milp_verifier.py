@@ -0,0 +1,437 @@
+import timeit
+
+import numpy as np
+import torch
+import z3
+
+from fosco.verifier.types import Z3SYMBOL
+from fosco.verifier.verifier import ConditionResult
+from fosco.verifier.z3_verifier import VerifierZ3, _flatten_and
+
+
+class VerifierMILP(VerifierZ3):
+    """
+    Solves conditions of piecewise-linear networks (eg., relu, htanh, hsigmoid activations) as
+    mixed-integer linear programs, with big-M encodings of if-then-else terms and disjunctions.
+
+    Conditions are built with z3 variables, as for VerifierZ3. Conditions which cannot be encoded
+    (eg., nonlinear terms, unbounded variables) are solved with z3.
+
+    Note: the MILP encoding is not exact. The MILP solver works in floating point with feasibility
+    tolerances, and strict inequalities and indicators are encoded with a margin of MILP_EPSILON,
+    so that violations within the margin are missed. Counterexamples come from the MILP solver,
+    while unsat conditions are confirmed with z3.
+    """
+
+    MILP_EPSILON: float = 1e-6
+
+    def _solve_condition(
+        self, label: str, condition: Z3SYMBOL, vars: list, aux_vars: list
+    ) -> ConditionResult:
+        fml = self._preprocess(condition)
+        try:
+            encoder = MILPEncoder(epsilon=self.MILP_EPSILON)
+            encoder.encode(fml)
+        except NotImplementedError as e:
+            self._logger.debug(f"{label}: cannot encode as milp ({e}), using z3")
+            return super()._solve_condition(
+                label=label, condition=condition, vars=vars, aux_vars=aux_vars
+            )
+
+        self._logger.debug(
+            f"{label}: milp with {encoder.n_vars} variables ({encoder.n_binaries} binaries), "
+            f"{len(encoder.rows)} constraints"
+        )
+        timer = timeit.default_timer()
+        status, solution = encoder.solve(time_limit=self._solver_timeout)
+        timer = timeit.default_timer() - timer
+        self._last_solver_stats = {
+            "milp_vars": float(encoder.n_vars),
+            "milp_binaries": float(encoder.n_binaries),
+            "milp_constraints": float(len(encoder.rows)),
+        }
+
+        if status == "unsat":
+            self._logger.debug(
+                f"{label}: unsat up to milp tolerances, confirming with z3"
+            )
+            return super()._solve_condition(
+                label=label, condition=condition, vars=vars, aux_vars=aux_vars
+            )
+        elif status == "timeout":
+            self._logger.info(f"Timed out while solving, kill after {timer:.2f} sec")
+            return ConditionResult(
+                sat=False, unsat=False, timed_out=True, cex=None, aux_cex=None
+            )
+
+        cex = encoder.get_values(vars, solution)
+        aux_cex = encoder.get_values(aux_vars, solution)
+        if not self._check_point(fml, vars + aux_vars, cex + aux_cex):
+            self._logger.info(
+                f"{label}: counterexample satisfies the condition only up to milp tolerances"
+            )
+
+        return ConditionResult(
+            sat=True,
+            unsat=False,
+            timed_out=False,
+            cex=torch.tensor([cex]),
+            aux_cex=torch.tensor([aux_cex]),
+        )
+
+    @staticmethod
+    def _check_point(fml: z3.BoolRef, vars: list, values: list[float]) -> bool:
+        replacements = [(v, z3.RealVal(value)) for v, value in zip(vars, values)]
+        return z3.is_true(z3.simplify(z3.substitute(fml, replacements)))
+
+
+class MILPEncoder:
+    """
+    Encodes a quantifier-free z3 formula over real variables as mixed-integer linear constraints.
+
+    Every variable must be bounded by the top-level conjuncts of the formula (eg., domain constraints).
+    Big-M constants are derived from interval bounds of the linear terms.
+    Raises NotImplementedError for formulas which cannot be encoded, eg. products of variables.
+    """
+
+    def __init__(self, epsilon: float = 1e-6):
+        self.epsilon = epsilon
+
+        # milp variables
+        self.lb, self.ub, self.integrality = [], [], []
+        # constraints lo <= sum_i coeffs[i] * x_i <= hi, as (coeffs, lo, hi)
+        self.rows = []
+
+        # terms are keyed by expression, z3 reuses the ids of freed temporaries (eg., distributed products)
+        self._columns = {}  # z3 variable id -> column
+        self._terms = {}  # z3 term -> linear expression (coeffs, const)
+        self._indicators = {}  # z3 formula -> binary column
+
+    @property
+    def n_vars(self) -> int:
+        return len(self.lb)
+
+    @property
+    def n_binaries(self) -> int:
+        return int(sum(self.integrality))
+
+    def encode(self, fml: z3.BoolRef) -> None:
+        for v, (lb, ub) in self._variable_bounds(fml).items():
+            self._columns[v.get_id()] = self._new_var(lb, ub)
+        self._assert(fml, literal=None, negate=False)
+
+    def solve(self, time_limit: float) -> tuple[str, np.ndarray | None]:
+        """
+        Returns the status (sat, unsat, timeout) and the values of the milp variables.
+        """
+        from scipy.optimize import milp, Bounds, LinearConstraint
+        from scipy.sparse import lil_matrix
+
+        A = lil_matrix((max(1, len(self.rows)), self.n_vars))
+        lo, hi = np.zeros(A.shape[0]), np.zeros(A.shape[0])
+        for i, (coeffs, row_lo, row_hi) in enumerate(self.rows):
+            for col, coeff in coeffs.items():
+                A[i, col] = coeff
+            lo[i], hi[i] = row_lo, row_hi
+
+        res = milp(
+            c=np.zeros(self.n_vars),
+            constraints=LinearConstraint(A.tocsr(), lo, hi),
+            integrality=np.array(self.integrality),
+            bounds=Bounds(np.array(self.lb), np.array(self.ub)),
+            options={"time_limit": time_limit},
+        )
+
+        if res.x is not None:
+            return "sat", res.x
+        elif res.status == 2:
+            return "unsat", None
+        return "timeout", None
+
+    def get_values(self, vars: list, solution: np.ndarray) -> list[float]:
+        """
+        Returns the values of the z3 variables, 0.0 for the variables which do not occur in the formula.
+        """
+        return [
+            float(solution[self._columns[v.get_id()]])
+            if v.get_id() in self._columns
+            else 0.0
+            for v in vars
+        ]
+
+    def _new_var(self, lb: float, ub: float, binary: bool = False) -> int:
+        self.lb.append(lb)
+        self.ub.append(ub)
+        self.integrality.append(1 if binary else 0)
+        return len(self.lb) - 1
+
+    @staticmethod
+    def _variable_bounds(fml: z3.BoolRef) -> dict:
+        """
+        Returns the bounds of each variable in the formula, from the top-level conjuncts.
+        """
+        bounds = {v: [-np.inf, np.inf] for v in z3.z3util.get_vars(fml)}
+        for conjunct in _flatten_and(fml):
+            negate = z3.is_not(conjunct)
+            atom = conjunct.arg(0) if negate else conjunct
+            if not (
+                z3.is_le(atom) or z3.is_lt(atom) or z3.is_ge(atom) or z3.is_gt(atom)
+            ):
+                continue
+
+            lhs, rhs = atom.arg(0), atom.arg(1)
+            is_upper = z3.is_le(atom) or z3.is_lt(atom)
+            if _is_numeral(lhs) and _is_variable(rhs):
+                lhs, rhs, is_upper = rhs, lhs, not is_upper
+            if not (_is_variable(lhs) and _is_numeral(rhs)):
+                continue
+
+            # bounds are relaxed to non-strict inequalities
+            is_upper = not is_upper if negate else is_upper
+            value = _numeral_value(rhs)
+            if is_upper:
+                bounds[lhs][1] = min(bounds[lhs][1], value)
+            else:
+                bounds[lhs][0] = max(bounds[lhs][0], value)
+
+        for v, (lb, ub) in bounds.items():
+            if not z3.is_real(v):
+                raise NotImplementedError(f"non-real variable {v}")
+            if not (np.isfinite(lb) and np.isfinite(ub)):
+                raise NotImplementedError(f"unbounded variable {v}")
+        return bounds
+
+    def _bounds(self, expr: tuple[dict, float]) -> tuple[float, float]:
+        coeffs, const = expr
+        lb, ub = const, const
+        for col, coeff in coeffs.items():
+            if coeff >= 0:
+                lb, ub = lb + coeff * self.lb[col], ub + coeff * self.ub[col]
+            else:
+                lb, ub = lb + coeff * self.ub[col], ub + coeff * self.lb[col]
+        return lb, ub
+
+    def _term(self, e: z3.ExprRef) -> tuple[dict, float]:
+        """
+        Returns the linear expression of a term, as (coeffs, const).
+        """
+        if e in self._terms:
+            return self._terms[e]
+
+        if _is_numeral(e):
+            result = ({}, _numeral_value(e))
+        elif _is_variable(e):
+            result = ({self._columns[e.get_id()]: 1.0}, 0.0)
+        elif z3.is_add(e):
+            result = _lin_sum([self._term(arg) for arg in e.children()])
+        elif z3.is_sub(e):
+            args = [self._term(arg) for arg in e.children()]
+            result = _lin_sum([args[0]] + [_lin_scale(arg, -1.0) for arg in args[1:]])
+        elif e.decl().kind() == z3.Z3_OP_UMINUS:
+            result = _lin_scale(self._term(e.arg(0)), -1.0)
+        elif e.decl().kind() == z3.Z3_OP_TO_REAL:
+            result = self._term(e.arg(0))
+        elif z3.is_div(e) and _is_numeral(e.arg(1)):
+            result = _lin_scale(self._term(e.arg(0)), 1.0 / _numeral_value(e.arg(1)))
+        elif z3.is_mul(e):
+            result = self._product(e)
+        elif z3.is_app_of(e, z3.Z3_OP_ITE):
+            result = self._ite(e)
+        else:
+            raise NotImplementedError(f"term {e.decl()}")
+
+        self._terms[e] = result
+        return result
+
+    def _product(self, e: z3.ExprRef) -> tuple[dict, float]:
+        args = _factors(e)
+        constant = [arg for arg in args if _is_numeral(arg)]
+        others = [arg for arg in args if not _is_numeral(arg)]
+        scale = float(np.prod([_numeral_value(arg) for arg in constant]))
+
+        if len(others) <= 1:
+            term = self._term(others[0]) if others else ({}, 1.0)
+            return _lin_scale(term, scale)
+
+        # distribute the product over an if-then-else or a sum factor, eg. step(z) * w * x
+        is_ite = [z3.is_app_of(arg, z3.Z3_OP_ITE) for arg in others]
+        is_sum = [z3.is_add(arg) or z3.is_sub(arg) for arg in others]
+        if not any(is_ite) and not any(is_sum):
+            raise NotImplementedError(f"nonlinear product {e}")
+        idx = is_ite.index(True) if any(is_ite) else is_sum.index(True)
+        factor, rest = others[idx], others[:idx] + others[idx + 1 :]
+        rest_product = rest[0] if len(rest) == 1 else z3.Product(*rest)
+        if z3.is_app_of(factor, z3.Z3_OP_ITE):
+            distributed = z3.If(
+                factor.arg(0),
+                factor.arg(1) * rest_product,
+                factor.arg(2) * rest_product,
+            )
+        else:
+            sign = 1.0 if z3.is_add(factor) else -1.0
+            distributed = z3.Sum(
+                factor.arg(0) * rest_product,
+                *[sign * arg * rest_product for arg in factor.children()[1:]],
+            )
+        return _lin_scale(self._term(distributed), scale)
+
+    def _ite(self, e: z3.ExprRef) -> tuple[dict, float]:
+        """
+        Encodes y = If(c, a, b) with an indicator d of c:
+        |y - a| <= M (1 - d) and |y - b| <= M d
+        """
+        delta = self._indicator(e.arg(0))
+        then_term, else_term = self._term(e.arg(1)), self._term(e.arg(2))
+        then_lb, then_ub = self._bounds(then_term)
+        else_lb, else_ub = self._bounds(else_term)
+
+        y = self._new_var(min(then_lb, else_lb), max(then_ub, else_ub))
+        y_term = ({y: 1.0}, 0.0)
+        for branch, literal in [
+            (then_term, (delta, True)),
+            (else_term, (delta, False)),
+        ]:
+            diff = _lin_sum([y_term, _lin_scale(branch, -1.0)])
+            self._add_leq(diff, 0.0, literal)
+            self._add_leq(_lin_scale(diff, -1.0), 0.0, literal)
+        return y_term
+
+    def _indicator(self, c: z3.BoolRef) -> int:
+        """
+        Returns a binary variable d such that d = 1 implies c, and d = 0 implies not c.
+        """
+        if c not in self._indicators:
+            delta = self._new_var(0.0, 1.0, binary=True)
+            self._assert(c, literal=(delta, True), negate=False)
+            self._assert(c, literal=(delta, False), negate=True)
+            self._indicators[c] = delta
+        return self._indicators[c]
+
+    def _assert(self, fml: z3.BoolRef, literal: tuple | None, negate: bool) -> None:
+        """
+        Adds the constraints for fml (or its negation), enforced only when the literal holds.
+        The literal (column, polarity) refers to a binary variable, None for unconditional constraints.
+        """
+        if z3.is_not(fml):
+            self._assert(fml.arg(0), literal, not negate)
+        elif z3.is_true(fml) or z3.is_false(fml):
+            if z3.is_true(fml) == negate:
+                # false: the literal cannot hold
+                self._add_leq(({}, 1.0), 0.0, literal)
+        elif (z3.is_and(fml) and not negate) or (z3.is_or(fml) and negate):
+            for child in fml.children():
+                self._assert(child, literal, negate)
+        elif (z3.is_or(fml) and not negate) or (z3.is_and(fml) and negate):
+            self._assert_disjunction(fml.children(), literal, negate)
+        elif z3.is_implies(fml):
+            self._assert(z3.Or(z3.Not(fml.arg(0)), fml.arg(1)), literal, negate)
+        elif z3.is_le(fml) or z3.is_lt(fml) or z3.is_ge(fml) or z3.is_gt(fml):
+            self._assert_inequality(fml, literal, negate)
+        elif z3.is_eq(fml) and z3.is_arith(fml.arg(0)):
+            diff = _lin_sum(
+                [self._term(fml.arg(0)), _lin_scale(self._term(fml.arg(1)), -1.0)]
+            )
+            if not negate:
+                self._add_leq(diff, 0.0, literal)
+                self._add_leq(_lin_scale(diff, -1.0), 0.0, literal)
+            else:
+                self._assert_disjunction(
+                    [fml.arg(0) > fml.arg(1), fml.arg(0) < fml.arg(1)], literal, False
+                )
+        else:
+            raise NotImplementedError(f"formula {fml.decl()}")
+
+    def _assert_disjunction(self, children: list, literal: tuple | None, negate: bool):
+        # literal implies at least one of the children, each enforced by its own binary variable
+        selectors = [self._new_var(0.0, 1.0, binary=True) for _ in children]
+        coeffs = {z: 1.0 for z in selectors}
+        lo = 1.0
+        if literal is not None:
+            col, positive = literal
+            coeffs[col] = coeffs.get(col, 0.0) + (-1.0 if positive else 1.0)
+            lo = 0.0 if positive else 1.0
+        self.rows.append((coeffs, lo, np.inf))
+
+        for z, child in zip(selectors, children):
+            self._assert(child, (z, True), negate)
+
+    def _assert_inequality(self, fml: z3.BoolRef, literal: tuple | None, negate: bool):
+        # normalize to lhs - rhs <= -margin or lhs - rhs >= margin
+        is_upper = z3.is_le(fml) or z3.is_lt(fml)
+        is_strict = z3.is_lt(fml) or z3.is_gt(fml)
+        if negate:
+            is_upper, is_strict = not is_upper, not is_strict
+
+        diff = _lin_sum(
+            [self._term(fml.arg(0)), _lin_scale(self._term(fml.arg(1)), -1.0)]
+        )
+        margin = self.epsilon if is_strict else 0.0
+        if is_upper:
+            self._add_leq(diff, -margin, literal)
+        else:
+            self._add_leq(_lin_scale(diff, -1.0), -margin, literal)
+
+    def _add_leq(self, expr: tuple[dict, float], rhs: float, literal: tuple | None):
+        """
+        Adds expr <= rhs, relaxed by big-M when the literal does not hold.
+        """
+        coeffs, const = expr
+        coeffs, rhs = dict(coeffs), rhs - const
+
+        if literal is not None:
+            big_m = max(0.0, self._bounds((coeffs, 0.0))[1] - rhs)
+            col, positive = literal
+            if positive:
+                # expr <= rhs + M (1 - d)
+                coeffs[col] = coeffs.get(col, 0.0) + big_m
+                rhs = rhs + big_m
+            else:
+                # expr <= rhs + M d
+                coeffs[col] = coeffs.get(col, 0.0) - big_m
+
+        self.rows.append((coeffs, -np.inf, rhs))
+
+
+def _is_numeral(e: z3.ExprRef) -> bool:
+    return z3.is_rational_value(e) or z3.is_int_value(e) or z3.is_algebraic_value(e)
+
+
+def _is_variable(e: z3.ExprRef) -> bool:
+    return z3.is_const(e) and e.decl().kind() == z3.Z3_OP_UNINTERPRETED
+
+
+def _factors(e: z3.ExprRef) -> list[z3.ExprRef]:
+    """
+    Returns the factors of a product, flattening nested products, negations and int-to-real coercions
+    (eg., ToReal(If(z > 0, 1, 0)) for int-valued steps).
+    """
+    if z3.is_app_of(e, z3.Z3_OP_TO_REAL):
+        return _factors(e.arg(0))
+    elif z3.is_mul(e):
+        return [factor for arg in e.children() for factor in _factors(arg)]
+    elif z3.is_app_of(e, z3.Z3_OP_UMINUS):
+        return [z3.RealVal(-1)] + _factors(e.arg(0))
+    return [e]
+
+
+def _numeral_value(e: z3.ExprRef) -> float:
+    if z3.is_int_value(e):
+        return float(e.as_long())
+    if z3.is_algebraic_value(e):
+        e = e.approx(20)
+    fraction = e.as_fraction()
+    return float(fraction.numerator / fraction.denominator)
+
+
+def _lin_sum(exprs: list[tuple[dict, float]]) -> tuple[dict, float]:
+    coeffs, const = {}, 0.0
+    for expr_coeffs, expr_const in exprs:
+        for col, coeff in expr_coeffs.items():
+            coeffs[col] = coeffs.get(col, 0.0) + coeff
+        const += expr_const
+    return coeffs, const
+
+
+def _lin_scale(expr: tuple[dict, float], scale: float) -> tuple[dict, float]:
+    coeffs, const = expr
+    return {col: scale * coeff for col, coeff in coeffs.items()}, scale * const
@@ -0,0 +1,188 @@
+import multiprocessing
+from functools import partial, reduce
+
+import z3
+from z3 import z3util
+
+from fosco.common.parallel import run_forked
+from fosco.verifier.types import Z3SYMBOL
+from fosco.verifier.verifier import ConditionResult
+from fosco.verifier.z3_verifier import VerifierZ3
+
+
+class VerifierPortfolio(VerifierZ3):
+    """
+    Races Z3 and dReal on each condition, in two forked processes.
+    The first definitive answer (sat or unsat) is returned and the other solver is killed.
+
+    Conditions are built with z3 variables, as for VerifierZ3, and translated to dReal
+    in the worker process. Note that dReal answers are delta-sat, as when using VerifierDR.
+    """
+
+    BACKENDS: tuple[str, ...] = ("z3", "dreal")
+
+    def _assert_state(self) -> None:
+        super()._assert_state()
+        assert (
+            not self._incremental
+        ), "Portfolio solving does not support incremental solving"
+
+    def _solve_condition(
+        self, label: str, condition: Z3SYMBOL, vars: list, aux_vars: list
+    ) -> ConditionResult:
+        if multiprocessing.current_process().daemon:
+            # already running in a worker process, which cannot fork other workers
+            self._logger.debug(f"{label}: running in a worker process, z3 only")
+            return super()._solve_condition(
+                label=label, condition=condition, vars=vars, aux_vars=aux_vars
+            )
+
+        tasks = {
+            "z3": partial(super()._solve_condition, label, condition, vars, aux_vars),
+            "dreal": partial(
+                self._solve_condition_dreal, label, condition, vars, aux_vars
+            ),
+        }
+        results = run_forked(
+            tasks=tasks,
+            n_workers=len(tasks),
+            timeout=self._solver_timeout + self.WORKER_GRACE_PERIOD,
+            stop_when=lambda res: res.sat or res.unsat,
+        )
+
+        for backend in self.BACKENDS:
+            res = results.get(backend, None)
+            if res is not None and (res.sat or res.unsat):
+                self._logger.info(f"{label}: answered by {backend}")
+                return res
+
+        self._logger.info(f"{label}: no answer from any backend")
+        return ConditionResult(
+            sat=False, unsat=False, timed_out=True, cex=None, aux_cex=None
+        )
+
+    def _solve_condition_dreal(
+        self, label: str, condition: Z3SYMBOL, vars: list, aux_vars: list
+    ) -> ConditionResult:
+        from fosco.verifier.dreal_verifier import VerifierDR
+
+        condition = self._preprocess(condition)
+
+        var_names = [str(v) for v in self.xs + vars + aux_vars]
+        var_names += [str(v) for v in z3util.get_vars(condition)]
+        var_names = list(dict.fromkeys(var_names))
+        dr_vars = dict(zip(var_names, VerifierDR.new_vars(var_names=var_names)))
+
+        verifier = VerifierDR(
+            constraints_method=self.constraints_method,
+            solver_vars=[dr_vars[str(v)] for v in self.xs],
+            solver_timeout=self._solver_timeout,
+            rounding=self._rounding,
+            n_cex=self._n_cex,
+            cex_radius=self._cex_radius,
+        )
+        verifier._logger.setLevel(self._logger.level)
+
+        try:
+            dr_condition = z3_to_dreal(condition, variables=dr_vars)
+        except NotImplementedError as e:
+            # no answer from dreal, the condition is left to z3
+            self._logger.info(f"{label}: cannot convert to dreal ({e})")
+            return ConditionResult(
+                sat=False, unsat=False, timed_out=False, cex=None, aux_cex=None
+            )
+
+        return verifier._solve_condition(
+            label=label,
+            condition=dr_condition,
+            vars=[dr_vars[str(v)] for v in vars],
+            aux_vars=[dr_vars[str(v)] for v in aux_vars],
+        )
+
+
+def z3_to_dreal(e: z3.ExprRef, variables: dict, cache: dict = None):
+    """
+    Recursive conversion of a z3 formula to dReal.
+
+    Args:
+        e: z3 expression or formula, over real variables
+        variables: dictionary of dReal variables, as {name: variable}
+        cache: converted sub-expressions, as {z3 id: dReal expression}
+
+    Returns:
+        dReal expression or formula
+    """
+    import dreal
+
+    cache = {} if cache is None else cache
+    if e.get_id() in cache:
+        return cache[e.get_id()]
+
+    if z3.is_true(e):
+        result = dreal.Formula.TRUE()
+    elif z3.is_false(e):
+        result = dreal.Formula.FALSE()
+    elif z3.is_rational_value(e) or z3.is_int_value(e):
+        fraction = e.as_fraction()
+        result = dreal.Expression(float(fraction.numerator / fraction.denominator))
+    elif z3.is_algebraic_value(e):
+        fraction = e.approx(20).as_fraction()
+        result = dreal.Expression(float(fraction.numerator / fraction.denominator))
+    elif z3.is_const(e):
+        result = variables[str(e)]
+    else:
+        args = [z3_to_dreal(arg, variables, cache) for arg in e.children()]
+        result = _apply_dreal_op(e.decl().kind(), args, e)
+
+    cache[e.get_id()] = result
+    return result
+
+
+def _apply_dreal_op(kind: int, args: list, e: z3.ExprRef):
+    import dreal
+
+    if kind == z3.Z3_OP_ADD:
+        result = args[0]
+        for arg in args[1:]:
+            result = result + arg
+        return result
+    elif kind == z3.Z3_OP_SUB:
+        result = args[0]
+        for arg in args[1:]:
+            result = result - arg
+        return result
+    elif kind == z3.Z3_OP_MUL:
+        result = args[0]
+        for arg in args[1:]:
+            result = result * arg
+        return result
+    elif kind == z3.Z3_OP_DIV:
+        return args[0] / args[1]
+    elif kind == z3.Z3_OP_UMINUS:
+        return -args[0]
+    elif kind == z3.Z3_OP_POWER:
+        return args[0] ** args[1]
+    elif kind in [z3.Z3_OP_TO_REAL, z3.Z3_OP_TO_INT]:
+        return args[0]
+    elif kind == z3.Z3_OP_LE:
+        return args[0] <= args[1]
+    elif kind == z3.Z3_OP_LT:
+        return args[0] < args[1]
+    elif kind == z3.Z3_OP_GE:
+        return args[0] >= args[1]
+    elif kind == z3.Z3_OP_GT:
+        return args[0] > args[1]
+    elif kind == z3.Z3_OP_EQ:
+        return args[0] == args[1]
+    elif kind == z3.Z3_OP_AND:
+        return reduce(dreal.And, args)
+    elif kind == z3.Z3_OP_OR:
+        return reduce(dreal.Or, args)
+    elif kind == z3.Z3_OP_NOT:
+        return dreal.Not(args[0])
+    elif kind == z3.Z3_OP_IMPLIES:
+        return dreal.Or(dreal.Not(args[0]), args[1])
+    elif kind == z3.Z3_OP_ITE:
+        return dreal.if_then_else(args[0], args[1], args[2])
+    else:
+        raise NotImplementedError(f"Conversion to dReal not implemented for {e.decl()}")
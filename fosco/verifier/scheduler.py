@@ -0,0 +1,117 @@
+import math
+from typing import Optional
+
+
+class TimeoutScheduler:
+    """
+    Per-condition solver timeouts, adapted to the solve times observed across cegis iterations.
+
+    Each condition gets a timeout proportional to its recent solve times, so that fast conditions
+    (eg., init, unsafe) do not wait on the timeout needed by slow ones (eg., lie).
+    Conditions which timed out get twice their last timeout at the next iteration.
+    All timeouts are capped by the maximum timeout and by the time left in the iteration budget.
+
+    Args:
+        max_timeout: maximum timeout of a single condition, also used for conditions never solved before
+        total_timeout: time budget of all the conditions in one iteration, None for no budget
+        min_timeout: minimum timeout of a single condition
+        margin: ratio between timeout and the slowest recent solve time
+        window: number of recent solve times considered for each condition
+    """
+
+    def __init__(
+        self,
+        max_timeout: int,
+        total_timeout: Optional[int] = None,
+        min_timeout: int = 1,
+        margin: float = 3.0,
+        window: int = 5,
+    ):
+        self.max_timeout = max_timeout
+        self.total_timeout = total_timeout
+        self.min_timeout = min_timeout
+        self.margin = margin
+        self.window = window
+
+        self._assert_state()
+
+        self._solve_times = {}  # label -> list of recent solve times
+        self._last_timeouts = {}  # label -> timeout of the last solve
+        self._timed_out = {}  # label -> whether the last solve timed out
+        self._used_time = 0.0  # time spent in the current iteration
+
+    def _assert_state(self) -> None:
+        assert (
+            isinstance(self.min_timeout, int) and self.min_timeout > 0
+        ), f"min_timeout must be a positive integer, got {self.min_timeout}"
+        assert (
+            isinstance(self.max_timeout, int) and self.max_timeout >= self.min_timeout
+        ), f"max_timeout must be an integer >= min_timeout, got {self.max_timeout}"
+        assert self.total_timeout is None or (
+            isinstance(self.total_timeout, int) and self.total_timeout > 0
+        ), f"total_timeout must be a positive integer or None, got {self.total_timeout}"
+        assert self.margin >= 1.0, f"margin must be >= 1, got {self.margin}"
+        assert (
+            isinstance(self.window, int) and self.window > 0
+        ), f"window must be a positive integer, got {self.window}"
+
+    @property
+    def timed_out_labels(self) -> list[str]:
+        """
+        Labels of the conditions which timed out in their last solve.
+        """
+        return [label for label, timed_out in self._timed_out.items() if timed_out]
+
+    @property
+    def remaining_time(self) -> Optional[float]:
+        if self.total_timeout is None:
+            return None
+        return max(0.0, self.total_timeout - self._used_time)
+
+    def new_iteration(self) -> None:
+        """
+        Resets the time budget, at the beginning of each verification.
+        """
+        self._used_time = 0.0
+
+    def timeout(self, label: str) -> int:
+        """
+        Returns the timeout in seconds for the next solve of the condition.
+        """
+        if label not in self._solve_times:
+            timeout = self.max_timeout
+        elif self._timed_out[label]:
+            timeout = 2 * self._last_timeouts[label]
+        else:
+            slowest = max(self._solve_times[label][-self.window :])
+            timeout = math.ceil(self.margin * slowest)
+
+        timeout = min(max(timeout, self.min_timeout), self.max_timeout)
+        if self.total_timeout is not None:
+            timeout = min(
+                timeout, max(self.min_timeout, math.ceil(self.remaining_time))
+            )
+        return int(timeout)
+
+    def record(self, label: str, elapsed: float, timeout: int, timed_out: bool) -> None:
+        """
+        Records the solve time of a condition and whether it timed out.
+        """
+        self._solve_times.setdefault(label, []).append(elapsed)
+        self._solve_times[label] = self._solve_times[label][-self.window :]
+        self._last_timeouts[label] = timeout
+        self._timed_out[label] = timed_out
+        self._used_time += elapsed
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """
+        Returns the last timeout and the slowest recent solve time of each condition.
+        """
+        return {
+            label: {
+                "timeout": self._last_timeouts[label],
+                "max_solve_time": max(times),
+                "timed_out": self._timed_out[label],
+            }
+            for label, times in self._solve_times.items()
+        }
@@ -0,0 +1,214 @@
+import os
+import re
+import shlex
+import subprocess
+import tempfile
+import timeit
+from typing import Optional
+
+import z3
+
+from fosco.verifier.types import Z3SYMBOL
+from fosco.verifier.z3_verifier import VerifierZ3, to_smtlib2
+
+
+class VerifierSMTLIB(VerifierZ3):
+    """
+    Solves each condition with an external solver binary (eg., z3, cvc5, yices-smt2),
+    by writing the condition to an smt-lib2 file and running the solver on it in a subprocess.
+
+    Conditions are built with z3 variables, as for VerifierZ3.
+    The solver command is given by the `solver_command` argument, or by the environment variable
+    FOSCO_SMTLIB_COMMAND, and it is called with the path of the smt-lib2 file as last argument.
+    The solver process is killed when the timeout expires.
+
+    Note: the solver must support `(get-model)` and print the model values as rational terms.
+    """
+
+    DEFAULT_COMMAND: str = "z3 -smt2"
+    COMMAND_ENV_VAR: str = "FOSCO_SMTLIB_COMMAND"
+
+    def __init__(
+        self,
+        *args,
+        solver_command: Optional[str | list[str]] = None,
+        logic: Optional[str] = "QF_NRA",
+        **kwargs,
+    ):
+        command = solver_command or os.environ.get(
+            self.COMMAND_ENV_VAR, self.DEFAULT_COMMAND
+        )
+        if isinstance(command, str):
+            command = shlex.split(command)
+        self._solver_command = list(command)
+        self._logic = logic
+
+        super().__init__(*args, **kwargs)
+
+    def _assert_state(self) -> None:
+        super()._assert_state()
+        assert len(self._solver_command) > 0, "Empty solver command"
+        assert (
+            not self._incremental
+        ), "Incremental solving not supported with external solvers"
+
+    def new_solver(self):
+        return SMTLIBSolver(command=self._solver_command, logic=self._logic)
+
+    def is_sat(self, res) -> bool:
+        return res == "sat"
+
+    def is_unsat(self, res) -> bool:
+        return res == "unsat"
+
+    def _solver_solve(self, solver, fml):
+        fml = self._preprocess(fml)
+
+        timer = timeit.default_timer()
+        solver.add(fml)
+        res = solver.check(timeout=self._solver_timeout)
+        timer = timeit.default_timer() - timer
+
+        timedout = res == "timeout" or timer >= self._solver_timeout
+        if timedout:
+            self._logger.info(f"Timed out while solving, kill after {timer:.2f} sec")
+        elif res == "error":
+            self._logger.warning(f"Solver error: {solver.error}")
+
+        return res, timedout
+
+    def _solver_model(self, solver, res):
+        return solver.model
+
+    def _solver_statistics(self, solver) -> dict[str, float]:
+        return {"solver_time": solver.solve_time}
+
+    def _model_result(self, solver, model, x, i):
+        if not z3.is_expr(x):
+            x = x[0, 0]
+        # no variable in model, eg. input in CBF unfeasible condition. return dummy 0.0
+        return model.get(str(x), 0.0)
+
+
+class SMTLIBSolver:
+    """
+    Accumulates assertions and checks them with an external solver on a temporary smt-lib2 file.
+
+    Args:
+        command: solver command, the file path is appended as last argument
+        logic: smt-lib2 logic, None to let the solver choose
+    """
+
+    def __init__(self, command: list[str], logic: Optional[str] = "QF_NRA"):
+        self.command = command
+        self.logic = logic
+
+        self.assertions = []
+        self.model = {}
+        self.error = None
+        self.solve_time = 0.0
+
+    def add(self, fml: Z3SYMBOL) -> None:
+        self.assertions.append(fml)
+
+    def check(self, timeout: float) -> str:
+        """
+        Runs the solver on the current assertions and parses its output.
+
+        Returns:
+            str: one of "sat", "unsat", "unknown", "timeout", "error"
+        """
+        self.model, self.error = {}, None
+        content = to_smtlib2(z3.And(*self.assertions), logic=self.logic)
+
+        fd, path = tempfile.mkstemp(suffix=".smt2")
+        timer = timeit.default_timer()
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+            # on timeout, the solver process is killed by subprocess.run
+            out = subprocess.run(
+                self.command + [path], capture_output=True, text=True, timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            return "timeout"
+        finally:
+            self.solve_time = timeit.default_timer() - timer
+            os.remove(path)
+
+        lines = out.stdout.strip().splitlines()
+        res = lines[0].strip() if lines else ""
+        if res == "sat":
+            self.model = parse_smtlib_model("\n".join(lines[1:]))
+        elif res not in ["unsat", "unknown"]:
+            self.error = out.stderr.strip() or out.stdout.strip()
+            return "error"
+        return res
+
+
+def parse_smtlib_model(text: str) -> dict[str, float]:
+    """
+    Parses the output of `(get-model)` into a dictionary {variable name: value}.
+    Only constants with numeric values are returned, other definitions are ignored.
+    """
+    tokens = re.findall(r"\(|\)|\|[^|]*\||[^\s()]+", text)
+    stack, root = [], []
+    for token in tokens:
+        if token == "(":
+            stack.append([])
+        elif token == ")":
+            term = stack.pop()
+            (stack[-1] if stack else root).append(term)
+        else:
+            (stack[-1] if stack else root).append(token)
+
+    model = {}
+    for term in _define_funs(root):
+        if len(term) != 5 or term[2] != []:
+            continue
+        name, value = term[1].strip("|"), term[4]
+        try:
+            model[name] = _eval_smtlib_term(value)
+        except ValueError:
+            continue
+    return model
+
+
+def _define_funs(terms: list) -> list[list]:
+    found = []
+    for term in terms:
+        if isinstance(term, list):
+            if term and term[0] == "define-fun":
+                found.append(term)
+            else:
+                found.extend(_define_funs(term))
+    return found
+
+
+def _eval_smtlib_term(term) -> float:
+    """
+    Evaluates a numeric smt-lib2 term, eg. `(/ (- 3.0) 4.0)`.
+    """
+    if isinstance(term, str):
+        return float(term)
+
+    if not term or not isinstance(term[0], str):
+        raise ValueError(f"Cannot evaluate term {term}")
+    op, args = term[0], [_eval_smtlib_term(arg) for arg in term[1:]]
+    if op == "-" and len(args) == 1:
+        return -args[0]
+    elif op == "-" and len(args) > 1:
+        return args[0] - sum(args[1:])
+    elif op == "+":
+        return sum(args)
+    elif op == "*":
+        result = 1.0
+        for arg in args:
+            result *= arg
+        return result
+    elif op == "/" and len(args) == 2:
+        return args[0] / args[1]
+    elif op == "to_real" and len(args) == 1:
+        return args[0]
+    else:
+        raise ValueError(f"Cannot evaluate term {term}")
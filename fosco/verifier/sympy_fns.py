@@ -13,4 +13,5 @@ SYMPY_FNS = {
     "Check": None,
     "RealVal": lambda x: float(x),
     "Sqrt": sp.sqrt,
+    "Sum": sp.Add,
 }
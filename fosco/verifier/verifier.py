@@ -1,23 +1,47 @@
 import logging
+import timeit
 from abc import abstractmethod, ABC
-from typing import Callable, Generator, Iterable, Any, Optional
+from collections import namedtuple
+from functools import partial
+from typing import Callable, Generator, Iterable, Any, Optional, Hashable
 
 import torch
 
+from fosco.common.consts import TimeDomain
+from fosco.common.parallel import run_forked
 from fosco.common.timing import timed
 from fosco.logger import LOGGING_LEVELS
+from fosco.verifier.scheduler import TimeoutScheduler
 from fosco.verifier.types import SYMBOL
 
 INF: float = 1e300
 
+ConditionResult = namedtuple(
+    "ConditionResult", ["sat", "unsat", "timed_out", "cex", "aux_cex"]
+)
+
 
 class Verifier(ABC):
+    # extra time given to a worker process before killing it, on top of the solver timeout
+    WORKER_GRACE_PERIOD: float = 5.0
+
     def __init__(
         self,
         constraints_method: Callable[..., Generator],
         solver_vars: list[SYMBOL],
         solver_timeout: int,
         rounding: int = -1,
+        n_workers: int = 1,
+        incremental: bool = False,
+        domain_constraints: Optional[dict[str, SYMBOL]] = None,
+        n_cex: int = 1,
+        cex_radius: float = 0.1,
+        split_domain: Optional[Any] = None,
+        max_split_depth: int = 0,
+        prescreen_method: Optional[Callable[..., dict[str, bool]]] = None,
+        validation_method: Optional[Callable[..., dict[str, torch.Tensor]]] = None,
+        adaptive_timeout: bool = False,
+        total_timeout: Optional[int] = None,
         verbose: int = 0,
     ):
         super().__init__()
@@ -26,10 +50,30 @@ class Verifier(ABC):
         self.constraints_method = constraints_method
         self._solver_timeout = solver_timeout
         self._rounding = rounding
+        self._n_workers = n_workers
+        self._incremental = incremental
+        self._domain_constraints = domain_constraints or {}
+        self._n_cex = n_cex
+        self._cex_radius = cex_radius
+        self._split_domain = split_domain
+        self._max_split_depth = max_split_depth
+        self.prescreen_method = prescreen_method
+        self.validation_method = validation_method
+
+        # per-condition timeouts, adapted across iterations
+        self._scheduler = None
+        if adaptive_timeout:
+            self._scheduler = TimeoutScheduler(
+                max_timeout=solver_timeout, total_timeout=total_timeout
+            )
 
         # internal vars
         self.iter = -1
         self._last_cex = []
+        self._stats = {}  # label -> statistics of the last verification
+        # labels without a definitive result in the last verification
+        self._unresolved = []
+        self._last_solver_stats = {}  # statistics of the last solver call
 
         self._assert_state()
 
@@ -47,6 +91,25 @@ class Verifier(ABC):
         assert (
             isinstance(self._rounding, int) and self._rounding >= -1
         ), "rounding must be an integer >= -1"
+        assert (
+            isinstance(self._n_workers, int) and self._n_workers >= 1
+        ), f"n_workers must be a positive integer, got {self._n_workers}"
+        assert isinstance(
+            self._domain_constraints, dict
+        ), f"domain constraints must be a dict, got {type(self._domain_constraints)}"
+        assert (
+            isinstance(self._n_cex, int) and self._n_cex >= 1
+        ), f"n_cex must be a positive integer, got {self._n_cex}"
+        assert (
+            self._cex_radius > 0
+        ), f"cex_radius must be greater than 0, got {self._cex_radius}"
+        assert (
+            isinstance(self._max_split_depth, int) and self._max_split_depth >= 0
+        ), f"max_split_depth must be a non-negative integer, got {self._max_split_depth}"
+        assert self._split_domain is None or all(
+            hasattr(self._split_domain, attr)
+            for attr in ["vars", "lower_bounds", "upper_bounds"]
+        ), f"split domain must be a rectangle, got {self._split_domain}"
 
     @staticmethod
     @abstractmethod
@@ -110,6 +173,26 @@ class Verifier(ABC):
     def pretty_formula(fml) -> str:
         raise NotImplementedError("")
 
+    def _solver_recheck(self, solver, fml, block) -> tuple[Any, bool]:
+        """
+        Checks the formula again after adding the blocking constraint.
+        By default, the conjunction is solved from scratch. Stateful solvers can override it to reuse the solver.
+
+        Args:
+            solver: solver used to check fml
+            fml: formula previously checked
+            block: blocking constraint to add
+        """
+        _And = self.solver_fncts()["And"]
+        return self._solver_solve(solver=solver, fml=_And(fml, block))
+
+    def _formula_vars(self, fml, vars: list[SYMBOL]) -> list[SYMBOL]:
+        """
+        Returns the variables in `vars` which occur in the formula.
+        By default, it conservatively returns all the variables.
+        """
+        return vars
+
     @timed
     def verify(
         self,
@@ -132,6 +215,7 @@ class Verifier(ABC):
         :param sigma_symbolic: z3 expr of function sigma
         :param Vdot_symbolic: z3 expr of Lie derivative of V under nominal model
         :param Vdotz_symbolic: z3 expr of Lie derivative of V under uncertain model
+        :param kwargs: other inputs, passed to the prescreen method (eg., V_net)
         :return:
                 found_lyap: True if C is valid
                 C: a list of ctx
@@ -154,83 +238,543 @@ class Verifier(ABC):
             Vdot_residual_symbolic_vars,
         )
         results = {}
-        solvers = {}
         solver_vars = {}
         solver_aux_vars = {}
+        self._stats = {}
+        if self._scheduler is not None:
+            self._scheduler.new_iteration()
+
+        # numeric prescreen, conditions proven on the whole domain are not solved
+        screen, discharged = None, []
+        if self.prescreen_method is not None:
+            screen = partial(self.prescreen_method, **kwargs)
+            discharged = [label for label, proven in screen().items() if proven]
 
         for group in fmls:
+            conditions = {}
             for label, condition_vars in group.items():
                 assert (
                     isinstance(condition_vars, tuple) and len(condition_vars) == 3
                 ), f"Expected tuple (condition, dataset-vars, aux-vars), got {condition_vars}"
-                condition, vars, aux_vars = condition_vars
-
-                s = self.new_solver()
-                # self._logger.debug(
-                #    f"Constraint: {label}, Formula: {self.pretty_formula(fml=condition)}"
-                # )
-                res, timedout = self._solver_solve(solver=s, fml=condition)
-                results[label] = res
-                solvers[label] = s
-                solver_vars[label] = vars
-                solver_aux_vars[label] = aux_vars
-                # if sat, found counterexample; if unsat, C is lyap
-                if timedout:
-                    self._logger.info(label + "timed out")
-            if any(self.is_sat(res) for res in results.values()):
+                solver_vars[label] = condition_vars[1]
+                solver_aux_vars[label] = condition_vars[2]
+                if label in discharged:
+                    self._logger.info(f"{label}: discharged before verification")
+                    results[label] = ConditionResult(
+                        sat=False, unsat=True, timed_out=False, cex=None, aux_cex=None
+                    )
+                else:
+                    conditions[label] = condition_vars
+
+            if conditions:
+                results.update(self._solve_group(conditions=conditions, screen=screen))
+            if any(res.sat for res in results.values()):
                 break
 
+        self._unresolved = [label for label, res in results.items() if res.timed_out]
         ces = {label: None for label in results.keys()}
 
-        if all(self.is_unsat(res) for res in results.values()):
+        if all(res.unsat for res in results.values()):
             self._logger.info("No counterexamples found!")
             found = True
         else:
-            for index, o in enumerate(results.items()):
-                label, res = o
-                if self.is_sat(res):
-                    original_point = self.compute_model(
-                        vars=solver_vars[label], solver=solvers[label], res=res
-                    )
-                    aux_point = self.compute_model(
-                        vars=solver_aux_vars[label], solver=solvers[label], res=res
-                    )
+            for label, res in results.items():
+                if res.sat:
+                    original_point = res.cex
+                    aux_point = res.aux_cex
                     self._logger.info(
-                        f"{label}: Counterexample Found: {solver_vars[label]} = {original_point[0]}, "
+                        f"{label}: {len(original_point)} Counterexample(s) Found: {solver_vars[label]} = {original_point[0]}, "
                         f"{solver_aux_vars[label]} = {aux_point[0]}"
                     )
 
-                    # debug
-                    for sym_name, sym in zip(
-                        ["V", "Sigma", "Vdot", "Vdot_residual"],
-                        [
-                            V_symbolic,
-                            sigma_symbolic,
-                            Vdot_symbolic,
-                            Vdot_residual_symbolic,
-                        ],
-                    ):
-                        if sym is None:
-                            continue
-                        replaced = self.replace_point(
-                            sym, solver_vars[label], original_point.numpy().T
-                        )
-                        if hasattr(replaced, "as_fraction"):
-                            fraction = replaced.as_fraction()
-                            value = float(fraction.numerator / fraction.denominator)
+                    if self._logger.isEnabledFor(logging.DEBUG):
+                        if kwargs.get("V_net", None) is not None:
+                            self._log_numeric_values(original_point, **kwargs)
                         else:
-                            self._logger.debug(
-                                f"Cannot extract value from {replaced} of type {type(replaced)}"
+                            self._log_symbolic_values(
+                                original_point,
+                                solver_vars[label],
+                                V_symbolic,
+                                sigma_symbolic,
+                                Vdot_symbolic,
+                                Vdot_residual_symbolic,
                             )
-                            value = str(replaced)
-                        self._logger.debug(f"[cex] {sym_name}: {value}")
 
                     ces[label] = original_point
                 else:
                     self._logger.debug(f"{label}: {res}")
 
+            if self.validation_method is not None:
+                self._validate_counterexamples(
+                    ces, **{k: v for k, v in kwargs.items() if k != "cex"}
+                )
+
         return {"found": found, "cex": ces}
 
+    def _validate_counterexamples(
+        self, cex: dict[str, Optional[torch.Tensor]], **kwargs
+    ) -> dict[str, torch.Tensor]:
+        """
+        Checks numerically which counterexamples violate their condition, with the models in kwargs
+        rather than their symbolic translation. Counterexamples which do not violate the condition
+        numerically are spurious, eg. due to rounding of the coefficients.
+
+        Returns:
+            dict: boolean tensor for each label checked, True for the actual violations
+        """
+        validity = self.validation_method(cex=cex, **kwargs)
+        for label, valid in validity.items():
+            n_spurious = int((~valid).sum())
+            if n_spurious > 0:
+                self._logger.warning(
+                    f"{label}: {n_spurious}/{len(valid)} counterexample(s) do not violate the condition numerically, "
+                    f"possibly spurious (rounding={self._rounding})"
+                )
+        return validity
+
+    def _log_numeric_values(
+        self,
+        points: torch.Tensor,
+        V_net: torch.nn.Module,
+        sigma_net: Optional[torch.nn.Module] = None,
+        xdot_func: Optional[Callable] = None,
+        system: Optional[Any] = None,
+        **kwargs,
+    ) -> None:
+        """
+        Logs the values of V, Sigma and Vdot in a batch of counterexamples, evaluated with the models.
+        Vdot is evaluated for continuous-time systems, when the counterexamples include the inputs.
+        """
+        x = points[:, : self.n].to(torch.get_default_dtype())
+        values = {"V": V_net(x)}
+        if sigma_net is not None:
+            values["Sigma"] = sigma_net(x)
+
+        n_inputs = points.shape[1] - self.n
+        if (
+            xdot_func is not None
+            and system is not None
+            and n_inputs >= system.n_controls
+            and system.time_domain == TimeDomain.CONTINUOUS
+        ):
+            u = points[:, self.n : self.n + system.n_controls].to(x.dtype)
+            values["Vdot"] = torch.sum(V_net.gradient(x) * xdot_func(x, u), dim=1)
+
+        for name, value in values.items():
+            self._logger.debug(f"[cex] {name}: {value.detach().flatten().tolist()}")
+
+    def _log_symbolic_values(
+        self, point: torch.Tensor, vars: list[SYMBOL], *symbolic_fns
+    ) -> None:
+        """
+        Logs the values of the symbolic functions in the first counterexample, by substitution.
+        """
+        for sym_name, sym in zip(["V", "Sigma", "Vdot", "Vdot_residual"], symbolic_fns):
+            if sym is None:
+                continue
+            replaced = self.replace_point(sym, vars, point.numpy().T)
+            if hasattr(replaced, "as_fraction"):
+                fraction = replaced.as_fraction()
+                value = float(fraction.numerator / fraction.denominator)
+            else:
+                self._logger.debug(
+                    f"Cannot extract value from {replaced} of type {type(replaced)}"
+                )
+                value = str(replaced)
+            self._logger.debug(f"[cex] {sym_name}: {value}")
+
+    def _solve_group(
+        self, conditions: dict[str, tuple], screen: Optional[Callable] = None
+    ) -> dict[str, ConditionResult]:
+        """
+        Solves a group of independent conditions, sequentially or in parallel processes.
+        If a split domain is given, the conditions which time out are solved again over sub-boxes of it.
+
+        Args:
+            conditions: dictionary of (label, (condition, dataset-vars, aux-vars))
+            screen: prescreen method, to discharge sub-boxes before solving them
+
+        Returns:
+            dict: results of the conditions as {label: ConditionResult}
+        """
+        queries = {
+            label: (label, *condition_vars)
+            for label, condition_vars in conditions.items()
+        }
+        results = self._solve_queries(queries=queries, stop_when_sat=True)
+
+        # the conditions cancelled after a counterexample are not split, the group is already sat
+        any_sat = any(res.sat for res in results.values())
+        if self._split_domain is not None and self._max_split_depth > 0 and not any_sat:
+            for label, res in results.items():
+                if res.timed_out:
+                    results[label] = self._solve_split(
+                        label, *conditions[label], screen=screen
+                    )
+                    if results[label].sat:
+                        break
+
+        return results
+
+    def _solve_queries(
+        self, queries: dict[Hashable, tuple], stop_when_sat: bool
+    ) -> dict[Hashable, ConditionResult]:
+        """
+        Solves independent queries, sequentially or in parallel processes.
+
+        Args:
+            queries: dictionary of (key, (label, condition, dataset-vars, aux-vars))
+            stop_when_sat: if true, the remaining queries are cancelled after the first sat result
+
+        Returns:
+            dict: results of the queries as {key: ConditionResult}
+        """
+        if not queries:
+            return {}
+
+        timeouts = {
+            key: self._timeout(label=query[0]) for key, query in queries.items()
+        }
+
+        if self._n_workers == 1 or len(queries) == 1:
+            results = {
+                key: self._solve_condition_with_timeout(timeouts[key], *query)
+                for key, query in queries.items()
+            }
+        else:
+            tasks = {
+                key: partial(self._solve_condition_with_timeout, timeouts[key], *query)
+                for key, query in queries.items()
+            }
+            results = run_forked(
+                tasks=tasks,
+                n_workers=self._n_workers,
+                timeout=max(timeouts.values()) + self.WORKER_GRACE_PERIOD,
+                stop_when=(lambda res: res[0].sat) if stop_when_sat else None,
+            )
+
+        # queries without result have been cancelled or killed
+        cancelled = stop_when_sat and any(res.sat for res, _ in results.values())
+        for key in queries:
+            if key not in results:
+                self._logger.info(f"{key}: no result from worker")
+                results[key] = (
+                    ConditionResult(
+                        sat=False, unsat=False, timed_out=True, cex=None, aux_cex=None
+                    ),
+                    None,
+                )
+                # killed after the grace period (eg., solver without internal timeout)
+                if self._scheduler is not None and not cancelled:
+                    self._scheduler.record(
+                        label=queries[key][0],
+                        elapsed=timeouts[key],
+                        timeout=timeouts[key],
+                        timed_out=True,
+                    )
+
+        for key, (res, stats) in results.items():
+            if stats is None:
+                continue
+            label = queries[key][0]
+            self._record_stats(label=label, stats=stats)
+            if self._scheduler is not None:
+                self._scheduler.record(
+                    label=label,
+                    elapsed=stats["time"],
+                    timeout=timeouts[key],
+                    timed_out=res.timed_out,
+                )
+
+        return {key: res for key, (res, _) in results.items()}
+
+    @property
+    def unresolved_labels(self) -> list[str]:
+        """
+        Labels of the conditions without a definitive result in the last verification,
+        because they timed out or were cancelled after a counterexample.
+        """
+        return self._unresolved
+
+    @property
+    def timed_out_labels(self) -> list[str]:
+        """
+        Labels of the conditions which timed out in their last solve, when using adaptive timeouts.
+        """
+        if self._scheduler is None:
+            return []
+        return self._scheduler.timed_out_labels
+
+    def _timeout(self, label: str) -> int:
+        if self._scheduler is None:
+            return self._solver_timeout
+        timeout = self._scheduler.timeout(label=label)
+        self._logger.debug(f"{label}: timeout {timeout} sec")
+        return timeout
+
+    def _solve_condition_with_timeout(
+        self, timeout: int, *query
+    ) -> tuple[ConditionResult, dict[str, float]]:
+        """
+        Solves a condition with the given timeout.
+        Returns the result and its statistics: formula size, solver statistics, time and result.
+        """
+        label, condition, vars, aux_vars = query
+        stats = self._formula_stats(condition)
+        stats["n_aux_vars"] = len(aux_vars)
+
+        default_timeout = self._solver_timeout
+        self._solver_timeout = timeout
+        self._last_solver_stats = {}
+        try:
+            timer = timeit.default_timer()
+            res = self._solve_condition(*query)
+            stats["time"] = timeit.default_timer() - timer
+        finally:
+            self._solver_timeout = default_timeout
+
+        stats.update(self._last_solver_stats)
+        stats.update(
+            {
+                "sat": float(res.sat),
+                "unsat": float(res.unsat),
+                "timed_out": float(res.timed_out),
+            }
+        )
+        return res, stats
+
+    @property
+    def stats(self) -> dict[str, dict[str, float]]:
+        """
+        Statistics of each condition in the last verification, as {label: {name: value}}.
+        Conditions solved over multiple sub-boxes report the sum over the sub-boxes.
+        """
+        return self._stats
+
+    def _record_stats(self, label: str, stats: dict[str, float]) -> None:
+        if label not in self._stats:
+            self._stats[label] = dict(stats, n_queries=1)
+            return
+        # queries on sub-boxes of the same condition
+        merged = self._stats[label]
+        for name, value in stats.items():
+            merged[name] = merged.get(name, 0.0) + value
+        merged["n_queries"] += 1
+
+    def _formula_stats(self, fml) -> dict[str, float]:
+        """
+        Returns statistics on the size of the formula, eg. number of nodes.
+        By default, no statistics are collected.
+        """
+        return {}
+
+    def _solver_statistics(self, solver) -> dict[str, float]:
+        """
+        Returns the statistics of the solver after a check, eg. number of conflicts.
+        By default, no statistics are collected.
+        """
+        return {}
+
+    def _solve_split(
+        self,
+        label: str,
+        condition: SYMBOL,
+        vars: list,
+        aux_vars: list,
+        screen: Optional[Callable] = None,
+    ) -> ConditionResult:
+        """
+        Branch-and-bound over the split domain: the condition is checked on each sub-box,
+        and the sub-boxes which time out are bisected again, up to the maximum split depth.
+        The counterexamples found in all the sub-boxes of the same depth are merged.
+        If a prescreen method is given, the sub-boxes where the condition is proven are not solved.
+
+        Returns:
+            ConditionResult: unsat if all the sub-boxes are unsat,
+                             sat if any sub-box has a counterexample, timed out otherwise
+        """
+        _And = self.solver_fncts()["And"]
+        boxes = self._bisect(self._split_domain)
+
+        for depth in range(1, self._max_split_depth + 1):
+            if screen is not None:
+                boxes = [
+                    box for box in boxes if not self._is_discharged(label, box, screen)
+                ]
+
+            self._logger.info(
+                f"{label}: solving {len(boxes)} sub-boxes at depth {depth}"
+            )
+            queries = {
+                i: (
+                    label,
+                    _And(condition, box.generate_domain(self.xs)),
+                    vars,
+                    aux_vars,
+                )
+                for i, box in enumerate(boxes)
+            }
+            results = self._solve_queries(queries=queries, stop_when_sat=False)
+
+            sat_results = [res for res in results.values() if res.sat]
+            timed_out_boxes = [boxes[i] for i, res in results.items() if res.timed_out]
+
+            if sat_results:
+                return ConditionResult(
+                    sat=True,
+                    unsat=False,
+                    timed_out=len(timed_out_boxes) > 0,
+                    cex=torch.cat([res.cex for res in sat_results], dim=0),
+                    aux_cex=torch.cat([res.aux_cex for res in sat_results], dim=0),
+                )
+            if not timed_out_boxes:
+                self._logger.info(f"{label}: all sub-boxes are unsat at depth {depth}")
+                return ConditionResult(
+                    sat=False, unsat=True, timed_out=False, cex=None, aux_cex=None
+                )
+
+            boxes = [half for box in timed_out_boxes for half in self._bisect(box)]
+
+        self._logger.info(f"{label}: sub-boxes still time out at maximum split depth")
+        return ConditionResult(
+            sat=False, unsat=False, timed_out=True, cex=None, aux_cex=None
+        )
+
+    @staticmethod
+    def _is_discharged(label: str, box, screen: Callable) -> bool:
+        """
+        Returns true if the prescreen proves the condition within the box.
+        """
+        proven = screen(box=(box.lower_bounds, box.upper_bounds))
+        return proven.get(label, False)
+
+    @staticmethod
+    def _bisect(box) -> list:
+        """
+        Splits the rectangle in two halves along its widest dimension.
+        """
+        lb, ub = list(box.lower_bounds), list(box.upper_bounds)
+        dim = max(range(len(lb)), key=lambda i: ub[i] - lb[i])
+        mid = (lb[dim] + ub[dim]) / 2.0
+
+        lower_half_ub = ub[:dim] + [mid] + ub[dim + 1 :]
+        upper_half_lb = lb[:dim] + [mid] + lb[dim + 1 :]
+        return [
+            type(box)(
+                vars=box.vars, lb=lb, ub=lower_half_ub, dim_select=box.dim_select
+            ),
+            type(box)(
+                vars=box.vars, lb=upper_half_lb, ub=ub, dim_select=box.dim_select
+            ),
+        ]
+
+    def _solve_condition(
+        self, label: str, condition: SYMBOL, vars: list, aux_vars: list
+    ) -> ConditionResult:
+        """
+        Solves a single condition and extracts the counterexample if any.
+
+        Args:
+            label: name of the condition
+            condition: formula to check for satisfiability
+            vars: dataset variables, used to extract the counterexample
+            aux_vars: auxiliary variables, used to extract the auxiliary point
+
+        Returns:
+            ConditionResult: sat/unsat status and counterexample
+        """
+        s = self.new_solver()
+        return self._check_condition(
+            label=label, solver=s, condition=condition, vars=vars, aux_vars=aux_vars
+        )
+
+    def _check_condition(
+        self, label: str, solver, condition: SYMBOL, vars: list, aux_vars: list
+    ) -> ConditionResult:
+        """
+        Checks a condition with the given solver and extracts the counterexample if any.
+        """
+        # self._logger.debug(
+        #    f"Constraint: {label}, Formula: {self.pretty_formula(fml=condition)}"
+        # )
+        res, timedout = self._solver_solve(solver=solver, fml=condition)
+        # if sat, found counterexample; if unsat, C is lyap
+        if timedout:
+            self._logger.info(label + "timed out")
+
+        cex, aux_cex = None, None
+        if self.is_sat(res):
+            cex = self.compute_model(vars=vars, solver=solver, res=res)
+            aux_cex = self.compute_model(vars=aux_vars, solver=solver, res=res)
+            if self._n_cex > 1:
+                cex, aux_cex = self._more_counterexamples(
+                    solver=solver,
+                    condition=condition,
+                    vars=vars,
+                    aux_vars=aux_vars,
+                    cex=cex,
+                    aux_cex=aux_cex,
+                )
+
+        self._last_solver_stats = self._solver_statistics(solver)
+        return ConditionResult(
+            sat=self.is_sat(res),
+            unsat=self.is_unsat(res),
+            timed_out=timedout,
+            cex=cex,
+            aux_cex=aux_cex,
+        )
+
+    def _more_counterexamples(
+        self,
+        solver,
+        condition: SYMBOL,
+        vars: list,
+        aux_vars: list,
+        cex: torch.Tensor,
+        aux_cex: torch.Tensor,
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        """
+        Collects up to n_cex counterexamples for a satisfiable condition.
+        After each counterexample, it excludes a box of radius cex_radius around it and checks the condition again.
+
+        Returns:
+            tuple: counterexamples and auxiliary points, stacked along the first dimension
+        """
+        _Or = self.solver_fncts()["Or"]
+        block_vars = self._formula_vars(fml=condition, vars=vars)
+        block_ids = [i for i, v in enumerate(vars) if any(v is bv for bv in block_vars)]
+        if not block_ids:
+            return cex, aux_cex
+
+        cexs, aux_cexs = [cex], [aux_cex]
+        for _ in range(self._n_cex - 1):
+            # exclude the infinity-norm ball around the last counterexample
+            point = cexs[-1][0]
+            block = _Or(
+                *[
+                    _Or(
+                        vars[i] > float(point[i]) + self._cex_radius,
+                        vars[i] < float(point[i]) - self._cex_radius,
+                    )
+                    for i in block_ids
+                ]
+            )
+
+            res, timedout = self._solver_recheck(
+                solver=solver, fml=condition, block=block
+            )
+            _And = self.solver_fncts()["And"]
+            condition = _And(condition, block)
+            if timedout or not self.is_sat(res) or self.is_unsat(res):
+                break
+
+            cexs.append(self.compute_model(vars=vars, solver=solver, res=res))
+            aux_cexs.append(self.compute_model(vars=aux_vars, solver=solver, res=res))
+
+        self._logger.info(f"Collected {len(cexs)} counterexamples")
+        return torch.cat(cexs, dim=0), torch.cat(aux_cexs, dim=0)
+
     def compute_model(self, vars, solver, res):
         """
         :param vars: list of solver vars appearing in res
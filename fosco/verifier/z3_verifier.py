@@ -1,15 +1,43 @@
+import hashlib
+import logging
+import pathlib
 import time
 import timeit
 from typing import Callable, Optional
 
 import z3
+from z3 import z3util
 
 from fosco.common.utils import contains_object
 from fosco.verifier.types import Z3SYMBOL
-from fosco.verifier.verifier import Verifier
+from fosco.verifier.verifier import Verifier, ConditionResult
 
 
 class VerifierZ3(Verifier):
+    # solver statistics reported for each condition
+    SOLVER_STATISTICS: tuple[str, ...] = (
+        "conflicts",
+        "decisions",
+        "propagations",
+        "memory",
+        "max memory",
+        "rlimit count",
+    )
+
+    def __init__(
+        self, *args, smtlib_dir: Optional[str | pathlib.Path] = None, **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+
+        # persistent solvers for incremental solving, as {label: solver}
+        self._solvers = {}
+
+        # directory where each condition is exported in smt-lib2 format, if any
+        self._smtlib_dir = None
+        if smtlib_dir is not None:
+            self._smtlib_dir = pathlib.Path(smtlib_dir)
+            self._smtlib_dir.mkdir(parents=True, exist_ok=True)
+
     def _assert_state(self) -> None:
         super()._assert_state()
         assert all(
@@ -85,9 +113,7 @@ class VerifierZ3(Verifier):
         except:
             pass
 
-        fml = z3.simplify(fml)
-        if self._rounding > 0:
-            fml = round_expr(fml, rounding=self._rounding)
+        fml = self._preprocess(fml)
 
         self._logger.debug(fml.sexpr())
 
@@ -106,6 +132,111 @@ class VerifierZ3(Verifier):
     def _solver_model(self, solver, res):
         return solver.model()
 
+    def _solver_recheck(self, solver, fml, block):
+        # the solver already contains fml, only the blocking constraint is added
+        return self._solver_solve(solver=solver, fml=block)
+
+    def _formula_stats(self, fml: Z3SYMBOL) -> dict[str, float]:
+        stats = expr_stats(fml)
+        return {
+            "n_nodes": stats["dag_size"],
+            "n_arith_ops": stats["n_arith_ops"],
+            "depth": stats["depth"],
+        }
+
+    def _solver_statistics(self, solver) -> dict[str, float]:
+        stats = solver.statistics()
+        return {
+            f"solver_{key.replace(' ', '_')}": float(stats.get_key_value(key))
+            for key in stats.keys()
+            if key in self.SOLVER_STATISTICS
+        }
+
+    def _formula_vars(self, fml, vars: list[Z3SYMBOL]) -> list[Z3SYMBOL]:
+        fml_var_ids = {v.get_id() for v in z3util.get_vars(fml)}
+        return [v for v in vars if v.get_id() in fml_var_ids]
+
+    def _solve_condition(
+        self, label: str, condition: Z3SYMBOL, vars: list, aux_vars: list
+    ) -> ConditionResult:
+        """
+        In incremental mode, each condition has a persistent solver where the domain constraints are asserted once.
+        The network-dependent part of the condition is checked in a new scope (push/pop), so that
+        the lemmas learned on the domain are reused across cegis iterations.
+
+        Note: when conditions are solved in worker processes, the persistent solvers are not updated
+        in the parent process and the reuse is limited to the domain constraints.
+        """
+        if self._smtlib_dir is not None:
+            self.export_smtlib(label=label, condition=condition)
+
+        if not self._incremental:
+            return super()._solve_condition(
+                label=label, condition=condition, vars=vars, aux_vars=aux_vars
+            )
+
+        if label not in self._solvers:
+            solver = self.new_solver()
+            if label in self._domain_constraints:
+                solver.add(self._preprocess(self._domain_constraints[label]))
+            self._solvers[label] = solver
+
+        solver = self._solvers[label]
+        condition = self._remove_domain_constraints(label=label, fml=condition)
+
+        solver.push()
+        try:
+            return self._check_condition(
+                label=label,
+                solver=solver,
+                condition=condition,
+                vars=vars,
+                aux_vars=aux_vars,
+            )
+        finally:
+            solver.pop()
+
+    def export_smtlib(self, label: str, condition: Z3SYMBOL) -> pathlib.Path:
+        """
+        Writes the preprocessed condition to a standalone smt-lib2 file in the export directory.
+        Files are named by label and content hash, so identical queries are written once.
+        """
+        assert self._smtlib_dir is not None, "No smt-lib2 export directory"
+        content = to_smtlib2(self._preprocess(condition))
+        digest = hashlib.sha1(content.encode()).hexdigest()[:12]
+        path = self._smtlib_dir / f"{label}_{digest}.smt2"
+        if not path.exists():
+            path.write_text(content)
+            self._logger.debug(f"{label}: exported to {path}")
+        return path
+
+    def _remove_domain_constraints(self, label: str, fml: Z3SYMBOL) -> Z3SYMBOL:
+        """
+        Removes from the top-level conjunction of the formula the constraints of the domain,
+        which are already asserted in the persistent solver.
+        """
+        if label not in self._domain_constraints:
+            return fml
+
+        domain_ids = {c.get_id() for c in _flatten_and(self._domain_constraints[label])}
+        conjuncts = [c for c in _flatten_and(fml) if c.get_id() not in domain_ids]
+        return z3.And(*conjuncts)
+
+    def _preprocess(self, fml: Z3SYMBOL) -> Z3SYMBOL:
+        """
+        Simplifies the formula and rounds its coefficients, if rounding is enabled.
+        """
+        fml = z3.simplify(fml)
+        if self._rounding >= 0:
+            fml = round_expr(fml, rounding=self._rounding)
+        if self._logger.isEnabledFor(logging.DEBUG):
+            stats = expr_stats(fml)
+            self._logger.debug(
+                f"Formula with {stats['dag_size']} nodes "
+                f"({stats['tree_size']} as tree), depth {stats['depth']}"
+            )
+        return fml
+
     def _model_result(self, solver, model, x, i):
         try:
             return float(model[x].as_fraction())
@@ -143,30 +274,183 @@ class VerifierZ3(Verifier):
             "Check": lambda x: contains_object(x, z3.ArithRef),
             "RealVal": z3.RealVal,
             "Sqrt": z3.Sqrt,
+            "Sum": lambda *args: z3.Sum(*args) if args else z3.RealVal(0),
         }
 
     def pretty_formula(fml) -> str:
         return str(z3.simplify(fml))
 
 
-def round_expr(e: Z3SYMBOL, rounding: int) -> Z3SYMBOL:
+def to_smtlib2(fml: z3.BoolRef, logic: Optional[str] = "QF_NRA") -> str:
     """
-    Recursive conversion of coefficients to rounded values.
+    Returns a standalone smt-lib2 script which checks the satisfiability of the formula
+    and prints the model.
+
+    Args:
+        fml: z3 formula
+        logic: smt-lib2 logic, None to let the solver choose
+    """
+    solver = z3.Solver()
+    solver.add(expand_powers(fml))
+    header = "(set-option :produce-models true)\n"
+    if logic is not None:
+        header += f"(set-logic {logic})\n"
+    return header + solver.to_smt2() + "(get-model)\n"
+
+
+def _flatten_and(fml: z3.BoolRef) -> list[z3.BoolRef]:
+    """
+    Returns the list of conjuncts of nested conjunctions.
+    """
+    if z3.is_and(fml):
+        return [c for child in fml.children() for c in _flatten_and(child)]
+    return [fml]
+
+
+def round_expr(e: Z3SYMBOL, rounding: int, cache: dict = None) -> Z3SYMBOL:
+    """
+    Conversion of coefficients to rounded values.
+
+    The expression is traversed as a DAG, so sub-terms shared by multiple parents
+    (eg., hidden neurons of a network) are rounded only once.
 
     Args:
         e:  z3 expression
         rounding: number of decimals to round to
+        cache: rounded sub-expressions, as {z3 id: z3 expression}
 
     Returns:
         e: z3 expression with rounded coefficients
     """
-    assert rounding > 0, "rounding must be > 0"
+    assert rounding >= 0, "rounding must be >= 0"
+    cache = {} if cache is None else cache
+
+    # iterative post-order traversal, to avoid recursion limits on deep formulas
+    stack = [e]
+    while stack:
+        node = stack[-1]
+        if node.get_id() in cache:
+            stack.pop()
+            continue
+
+        # base case: rational coeff
+        if z3.is_const(node) and hasattr(node, "as_fraction"):
+            num, den = node.as_fraction().numerator, node.as_fraction().denominator
+            cache[node.get_id()] = z3.RealVal(round(float(num) / float(den), rounding))
+            stack.pop()
+            continue
+
+        children = node.children()
+        pending = [arg for arg in children if arg.get_id() not in cache]
+        if pending:
+            stack.extend(pending)
+            continue
+
+        stack.pop()
+        if children:
+            args = [cache[arg.get_id()] for arg in children]
+            cache[node.get_id()] = node.decl()(*args)
+        else:
+            cache[node.get_id()] = node
+
+    return cache[e.get_id()]
+
+
+def expand_powers(e: Z3SYMBOL) -> Z3SYMBOL:
+    """
+    Rewrites the powers with non-negative integer exponent as products, eg. (^ t 2) as (* t t).
+    The power operator is not part of the smt-lib2 standard, and other solvers reject it.
+
+    Args:
+        e: z3 expression
+
+    Returns:
+        e: z3 expression without integer powers
+    """
+    cache = {}
+
+    # iterative post-order traversal, as in round_expr
+    stack = [e]
+    while stack:
+        node = stack[-1]
+        if node.get_id() in cache:
+            stack.pop()
+            continue
+
+        children = node.children()
+        pending = [arg for arg in children if arg.get_id() not in cache]
+        if pending:
+            stack.extend(pending)
+            continue
+
+        stack.pop()
+        if not children:
+            cache[node.get_id()] = node
+            continue
+
+        args = [cache[arg.get_id()] for arg in children]
+        is_pow = z3.is_app_of(node, z3.Z3_OP_POWER)
+        if (
+            is_pow
+            and z3.is_rational_value(args[1])
+            and args[1].as_fraction().denominator == 1
+            and args[1].as_fraction().numerator >= 0
+        ):
+            k = args[1].as_fraction().numerator
+            if k == 0:
+                cache[node.get_id()] = z3.RealVal(1)
+            elif k == 1:
+                cache[node.get_id()] = args[0]
+            else:
+                cache[node.get_id()] = z3.Product(*[args[0]] * k)
+        else:
+            cache[node.get_id()] = node.decl()(*args)
+
+    return cache[e.get_id()]
+
+
+def expr_stats(e: Z3SYMBOL) -> dict[str, int]:
+    """
+    Returns the size of the expression, as number of unique nodes (dag_size),
+    number of nodes if expanded to a tree (tree_size), depth and number of
+    unique arithmetic operations (n_arith_ops).
+    """
+    tree_size, depth = {}, {}
+    n_arith_ops = 0
+    stack = [e]
+    while stack:
+        node = stack[-1]
+        if node.get_id() in tree_size:
+            stack.pop()
+            continue
+
+        children = node.children()
+        pending = [arg for arg in children if arg.get_id() not in tree_size]
+        if pending:
+            stack.extend(pending)
+            continue
+
+        stack.pop()
+        tree_size[node.get_id()] = 1 + sum(tree_size[arg.get_id()] for arg in children)
+        depth[node.get_id()] = 1 + max(
+            [depth[arg.get_id()] for arg in children], default=0
+        )
+        if z3.is_app(node) and node.decl().kind() in _ARITH_OPS:
+            n_arith_ops += 1
+
+    return {
+        "dag_size": len(tree_size),
+        "tree_size": tree_size[e.get_id()],
+        "depth": depth[e.get_id()],
+        "n_arith_ops": n_arith_ops,
+    }
 
-    # base case: rational coeff
-    if z3.is_const(e) and hasattr(e, "as_fraction"):
-        num, den = e.as_fraction().numerator, e.as_fraction().denominator
-        return z3.RealVal(round(float(num) / float(den), rounding))
 
-    # recursive case: non-const expr
-    args = [round_expr(arg, rounding) for arg in e.children()]
-    return e.decl()(*args)
+_ARITH_OPS = {
+    z3.Z3_OP_ADD,
+    z3.Z3_OP_SUB,
+    z3.Z3_OP_MUL,
+    z3.Z3_OP_DIV,
+    z3.Z3_OP_UMINUS,
+    z3.Z3_OP_POWER,
+}
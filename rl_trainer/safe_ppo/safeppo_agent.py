@@ -9,6 +9,7 @@ from torch.distributions import Normal
 
 from rl_trainer.ppo.ppo_agent import ActorCriticAgent
 from fosco.models import TorchSymDiffModel
+from fosco.models.compiled import compile_model
 from fosco.models.utils import layer_init
 from fosco.systems import ControlAffineDynamics, EulerDTSystem
 from fosco.systems.gym_env.system_env import SystemEnv
@@ -21,6 +22,7 @@ class SafeActorCriticAgent(ActorCriticAgent):
         barrier: TorchSymDiffModel | Callable,
         compensator: TorchSymDiffModel | Callable = None,
         device: Optional[torch.device | str] = None,
+        compile_models: bool = False,
     ):
         super().__init__(envs=envs)
         self.classk_size = 1
@@ -50,6 +52,12 @@ class SafeActorCriticAgent(ActorCriticAgent):
             )
         self.umin = envs.action_space.low
         self.umax = envs.action_space.high
+        if compile_models:
+            # activations fixed in the module graph, barrier and gradient in a single call
+            barrier = compile_model(barrier)
+            if compensator is not None:
+                compensator = compile_model(compensator)
+        self.compile_models = compile_models
         self.barrier = barrier
         self.xsigma = compensator
         self.safety_layer = self._make_barrier_layer()
@@ -134,8 +142,12 @@ class SafeActorCriticAgent(ActorCriticAgent):
         safe_action = action
         if use_safety_layer:
             n_batch = x.size(0)
-            hx = self.barrier(x0).view(n_batch, 1)
-            dhdx = self.barrier.gradient(x0).view(n_batch, 1, self.input_size)
+            if self.compile_models:
+                hx, dhdx = self.barrier.value_and_gradient(x0)
+            else:
+                hx, dhdx = self.barrier(x0), self.barrier.gradient(x0)
+            hx = hx.view(n_batch, 1)
+            dhdx = dhdx.view(n_batch, 1, self.input_size)
 
             fx = self.fx(x0.view(-1, self.input_size, 1))
             gx = self.gx(x0.view(-1, self.input_size, 1))
@@ -1,3 +1,5 @@
+import pathlib
+import tempfile
 import unittest
 from typing import Callable
 
@@ -215,3 +217,84 @@ class TestCEGIS(unittest.TestCase):
                     all(torch.allclose(a, b) for a, b in zip(params, new_params)),
                     f"Parameters are not the same in run {run_id}",
                 )
+
+    def test_verification_cache(self):
+        """
+        Test that verifying the same network twice loads the result from the cache.
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            results = []
+            for run_id in range(2):
+                system, domains, data_gen, config = self._get_single_integrator_config()
+                config.CEGIS_MAX_ITERS = 1
+                config.N_EPOCHS = 0
+                config.VERIFIER_CACHE_DIR = cache_dir
+
+                cegis = fosco.cegis.Cegis(
+                    system=system,
+                    domains=domains,
+                    config=config,
+                    data_gen=data_gen,
+                    verbose=0,
+                )
+                if run_id > 0:
+                    # on a cache hit, translator and verifier are not used
+                    cegis.translator = None
+                    cegis.verifier = None
+                results.append(cegis.solve())
+
+            self.assertEqual(len(list(pathlib.Path(cache_dir).glob("*.pt"))), 1)
+            self.assertEqual(results[0].found, results[1].found)
+
+    def test_translator_rounding(self):
+        """
+        Test that the weights are rounded only for verifiers which round the coefficients (z3-based),
+        so that dReal certifies the trained weights.
+        """
+        for verifier_type, rounding in [("z3", 3), ("milp", 3), ("dreal", -1)]:
+            system, domains, data_gen, config = self._get_single_integrator_config()
+            config.VERIFIER = verifier_type
+
+            cegis = fosco.cegis.Cegis(
+                system=system,
+                domains=domains,
+                config=config,
+                data_gen=data_gen,
+                verbose=0,
+            )
+            self.assertEqual(cegis.translator.rounding, rounding)
+
+    def test_verification_cache_settings(self):
+        """
+        Test that settings changing the verification outcome are part of the cache key,
+        and that results with timed out conditions are not cached.
+        """
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for prescreen, timed_out in [(False, False), (True, False), (True, True)]:
+                system, domains, data_gen, config = self._get_single_integrator_config()
+                config.CEGIS_MAX_ITERS = 1
+                config.N_EPOCHS = 0
+                config.VERIFIER_CACHE_DIR = cache_dir
+                config.VERIFIER_PRESCREEN = prescreen
+                config.VERIFIER_SPLIT_DEPTH = int(timed_out)
+
+                cegis = fosco.cegis.Cegis(
+                    system=system,
+                    domains=domains,
+                    config=config,
+                    data_gen=data_gen,
+                    verbose=0,
+                )
+                if timed_out:
+                    verify = cegis.verifier.verify
+
+                    def verify_with_timeout(**kwargs):
+                        outputs = verify(**kwargs)
+                        cegis.verifier._unresolved = ["lie"]
+                        return outputs
+
+                    cegis.verifier.verify = verify_with_timeout
+                cegis.solve()
+
+            # one entry per prescreen setting, none for the timed out verification
+            self.assertEqual(len(list(pathlib.Path(cache_dir).glob("*.pt"))), 2)
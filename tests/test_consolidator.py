@@ -0,0 +1,175 @@
+import unittest
+
+import torch
+
+from fosco.common import domains
+from fosco.common.consts import ResamplingDistribution
+from fosco.consolidator import make_consolidator
+from fosco.consolidator.dataset_store import DatasetStore, SampleBuffer
+from fosco.consolidator.resampling import sample_perturbations
+
+
+class TestConsolidator(unittest.TestCase):
+    def test_buffer_growth(self):
+        original = torch.randn(10, 2)
+        buffer = SampleBuffer(samples=original)
+        self.assertEqual(len(buffer), 10)
+
+        for i in range(5):
+            buffer.add(samples=torch.full((3, 2), float(i)))
+            # geometric growth: the storage is reallocated only when full
+            self.assertGreaterEqual(buffer._storage.shape[0], len(buffer))
+            self.assertLessEqual(buffer._storage.shape[0], 2 * len(buffer))
+
+        self.assertEqual(len(buffer), 25)
+        self.assertTrue(torch.allclose(buffer.original, original))
+        self.assertEqual(buffer.counterexamples.shape, (15, 2))
+        self.assertTrue(torch.allclose(buffer.counterexamples[-3:], torch.tensor(4.0)))
+        self.assertEqual(buffer.n_evicted, 0)
+
+    def test_buffer_age_eviction(self):
+        original = torch.randn(10, 2)
+        buffer = SampleBuffer(samples=original, capacity=4, eviction="age")
+
+        for i in range(5):
+            buffer.add(samples=torch.full((2, 2), float(i)))
+
+        # the newest counterexamples are kept, the originals are never evicted
+        self.assertEqual(len(buffer), 14)
+        self.assertEqual(buffer.n_evicted, 6)
+        self.assertTrue(torch.allclose(buffer.original, original))
+        expected = torch.tensor([3.0, 3.0, 4.0, 4.0])
+        self.assertTrue(torch.allclose(buffer.counterexamples[:, 0], expected))
+
+    def test_buffer_priority_eviction(self):
+        original = torch.randn(10, 2)
+        buffer = SampleBuffer(samples=original, capacity=3, eviction="priority")
+
+        buffer.add(samples=torch.full((2, 2), 0.0), priorities=torch.tensor([1.0, 0.0]))
+        buffer.add(samples=torch.full((2, 2), 1.0), priorities=torch.tensor([0.0, 1.0]))
+        buffer.add(samples=torch.full((1, 2), 2.0))
+
+        # the lowest priority are evicted, the oldest among equals
+        self.assertEqual(buffer.n_evicted, 2)
+        expected = torch.tensor([0.0, 1.0, 2.0])
+        self.assertTrue(torch.allclose(buffer.counterexamples[:, 0], expected))
+        self.assertTrue(
+            torch.allclose(buffer._priorities, torch.tensor([1.0, 1.0, 0.0]))
+        )
+
+        # priorities updated, eg. with the current loss
+        buffer.set_priorities(torch.tensor([0.0, 2.0, 1.0]))
+        buffer.add(samples=torch.full((1, 2), 3.0), priorities=torch.tensor([0.5]))
+        expected = torch.tensor([1.0, 2.0, 3.0])
+        self.assertTrue(torch.allclose(buffer.counterexamples[:, 0], expected))
+        self.assertTrue(torch.allclose(buffer.original, original))
+
+    def test_consolidator_dataset_store(self):
+        datasets = {"init": torch.randn(20, 2), "unsafe": torch.randn(30, 2)}
+        store = DatasetStore(datasets=datasets, capacity=8, eviction="priority")
+        consolidator = make_consolidator(resampling_n=3, resampling_stddev=0.1)
+
+        cex = {"init": torch.ones(3, 2), "unsafe": None}
+        results, _ = consolidator.get(cex=cex, datasets=store)
+        datasets_out = results["datasets"]
+
+        # reads as the datasets dictionary
+        self.assertEqual(set(datasets_out.keys()), {"init", "unsafe"})
+        self.assertEqual(datasets_out["init"].shape, (28, 2))
+        self.assertEqual(datasets_out["unsafe"].shape, (30, 2))
+
+        # the counterexamples are kept over their random neighbours
+        cexs = datasets_out["init"][20:]
+        self.assertEqual((cexs == 1.0).all(dim=1).sum(), 3)
+
+    def test_consolidator_dict_datasets(self):
+        datasets = {"init": torch.randn(20, 2)}
+        consolidator = make_consolidator(resampling_n=5, resampling_stddev=0.1)
+
+        results, _ = consolidator.get(cex={"init": torch.ones(2, 2)}, datasets=datasets)
+        self.assertIsInstance(results["datasets"], DatasetStore)
+        self.assertEqual(results["datasets"]["init"].shape, (32, 2))
+        self.assertTrue(
+            torch.allclose(results["datasets"]["init"][:20], datasets["init"])
+        )
+
+    def test_sample_perturbations(self):
+        for distribution in ResamplingDistribution:
+            noise = sample_perturbations(
+                distribution=distribution, n_samples=1000, n_dims=3, scale=0.1
+            )
+            self.assertEqual(noise.shape, (1000, 3))
+
+        noise = sample_perturbations(
+            distribution=ResamplingDistribution.UNIFORM,
+            n_samples=1000,
+            n_dims=3,
+            scale=0.1,
+        )
+        self.assertTrue((noise.abs() <= 0.1).all())
+
+        noise = sample_perturbations(
+            distribution=ResamplingDistribution.SOBOL,
+            n_samples=1000,
+            n_dims=3,
+            scale=0.1,
+        )
+        self.assertTrue((noise.norm(dim=1) <= 0.1 + 1e-6).all())
+
+        extent = torch.tensor([1.0, 100.0])
+        noise = sample_perturbations(
+            distribution=ResamplingDistribution.ANISOTROPIC,
+            n_samples=1000,
+            n_dims=2,
+            scale=0.1,
+            extent=extent,
+        )
+        std = noise.std(dim=0)
+        self.assertTrue(torch.allclose(std / extent, torch.tensor(0.1), rtol=0.2))
+
+    def test_consolidator_containment(self):
+        state_domain = domains.Rectangle(
+            vars=["x0", "x1"], lb=(0.0, 0.0), ub=(1.0, 1.0)
+        )
+        input_domain = domains.Rectangle(vars=["u0"], lb=(-1.0,), ub=(1.0,))
+        init_domain = domains.Sphere(vars=["x0", "x1"], center=(0.0, 0.0), radius=0.5)
+        sample_domains = {
+            "lie": [state_domain, input_domain],
+            "init": [init_domain],
+        }
+        # counterexamples on the boundary, half of the random samples fall outside
+        cex = {
+            "lie": torch.tensor([[0.0, 0.5, 1.0], [1.0, 1.0, 0.0]]),
+            "init": torch.tensor([[0.5, 0.0]]),
+        }
+
+        for containment in ["none", "project", "reject"]:
+            consolidator = make_consolidator(
+                resampling_n=100,
+                resampling_stddev=0.1,
+                resampling_containment=containment,
+                domains=sample_domains,
+            )
+            datasets = {"lie": torch.zeros(0, 3), "init": torch.zeros(0, 2)}
+            results, _ = consolidator.get(cex=cex, datasets=datasets)
+            lie, init = results["datasets"]["lie"], results["datasets"]["init"]
+
+            # the counterexamples are always added, at the end
+            self.assertTrue(torch.allclose(lie[-2:], cex["lie"]))
+            self.assertTrue(torch.allclose(init[-1:], cex["init"]))
+
+            is_contained = state_domain.check_containment(lie[:, :2])
+            is_contained &= input_domain.check_containment(lie[:, 2:])
+            if containment == "none":
+                self.assertEqual(len(lie), 202)
+                self.assertFalse(is_contained.all())
+            else:
+                self.assertTrue(is_contained.all())
+                self.assertTrue(init_domain.check_containment(init).all())
+
+            if containment == "project":
+                # samples clipped to the box are kept, those outside the sphere are rejected
+                self.assertEqual(len(lie), 202)
+                self.assertLess(len(init), 101)
+            elif containment == "reject":
+                self.assertLess(len(lie), 202)
@@ -1,4 +1,5 @@
 import unittest
+from functools import partial
 
 import torch
 from fosco.learner import make_learner
@@ -94,3 +95,129 @@ class TestLearner(unittest.TestCase):
         import shutil
 
         shutil.rmtree("tmp")
+
+    def test_stratified_batch_indices(self):
+        from fosco.common.utils import stratified_batch_indices
+
+        sizes = {"lie": 100, "init": 30, "unsafe": 2}
+
+        # full batch by default
+        batches = stratified_batch_indices(sizes=sizes)
+        self.assertEqual(len(batches), 1)
+        self.assertTrue(all(idx == slice(None) for idx in batches[0].values()))
+
+        # the number of batches is bounded by the smallest dataset
+        batches = stratified_batch_indices(sizes=sizes, batch_size=16)
+        self.assertEqual(len(batches), 2)
+
+        sizes["unsafe"] = 20
+        batches = stratified_batch_indices(sizes=sizes, batch_size=16)
+        self.assertEqual(len(batches), 10)
+        for label, n in sizes.items():
+            # every batch has samples of each dataset, in proportion to its size
+            self.assertTrue(all(len(batch[label]) > 0 for batch in batches))
+            self.assertEqual(len(batches[0][label]), -(-n // 10))
+            # every sample is seen exactly once in an epoch
+            seen = torch.cat([batch[label] for batch in batches])
+            self.assertEqual(sorted(seen.tolist()), list(range(n)))
+
+    def test_learner_cbf_minibatch(self):
+        from fosco.common.consts import DomainName
+
+        f = make_system("SingleIntegrator")()
+        learner_type = make_learner(system=f)
+        learner = learner_type(
+            state_size=f.n_vars,
+            hidden_sizes=(5,),
+            activation=("relu",),
+            epochs=3,
+            optimizer="adam",
+            lr=3e-4,
+            weight_decay=1e-5,
+            loss_margins=0.0,
+            loss_weights=1.0,
+            loss_relu="relu",
+            batch_size=32,
+        )
+        learner.learn_method = partial(
+            learner.learn_method,
+            n_vars=f.n_vars,
+            n_controls=f.n_controls,
+            f_torch=f._f_torch,
+        )
+
+        n_cols = f.n_vars + f.n_controls
+        datasets = {
+            DomainName.XD.value: torch.randn(100, n_cols),
+            DomainName.XI.value: torch.randn(20, f.n_vars),
+            DomainName.XU.value: torch.randn(20, f.n_vars),
+        }
+        params = [p.clone() for p in learner.parameters()]
+        output, _ = learner.update(datasets=datasets, xdot_func=None)
+
+        self.assertIn("tot_loss", output["loss"])
+        self.assertTrue(all(0.0 <= acc <= 100.0 for acc in output["accuracy"].values()))
+        self.assertFalse(
+            all(torch.allclose(p1, p2) for p1, p2 in zip(params, learner.parameters()))
+        )
+
+    def test_learner_cbf_priorities(self):
+        from fosco.common.consts import DomainName
+        from fosco.consolidator.dataset_store import DatasetStore
+
+        f = make_system("SingleIntegrator")()
+        learner_type = make_learner(system=f)
+        learner = learner_type(
+            state_size=f.n_vars,
+            hidden_sizes=(5,),
+            activation=("relu",),
+            epochs=1,
+            optimizer="adam",
+            lr=3e-4,
+            weight_decay=1e-5,
+            loss_margins=0.0,
+            loss_weights=1.0,
+            loss_relu="relu",
+        )
+        learner.learn_method = partial(
+            learner.learn_method,
+            n_vars=f.n_vars,
+            n_controls=f.n_controls,
+            f_torch=f._f_torch,
+        )
+
+        # B(x) = relu(x0 + 10), so the unsafe loss relu(B) increases with x0
+        with torch.no_grad():
+            for layer in learner.net.layers:
+                layer.weight.zero_()
+                layer.bias.zero_()
+            learner.net.layers[0].weight[0, 0] = 1.0
+            learner.net.layers[0].bias[0] = 10.0
+            learner.net.layers[-1].weight[0, 0] = 1.0
+
+        XU = DomainName.XU.value
+        n_cols = f.n_vars + f.n_controls
+        datasets = DatasetStore(
+            datasets={
+                DomainName.XD.value: torch.randn(100, n_cols),
+                DomainName.XI.value: torch.randn(20, f.n_vars),
+                XU: torch.randn(20, f.n_vars),
+            },
+            capacity=4,
+            eviction="priority",
+        )
+        cex = torch.tensor([[5.0, 0.0], [-20.0, 0.0], [0.0, 0.0], [-5.0, 0.0]])
+        datasets.add(label=XU, samples=cex)
+
+        # the losses of the counterexamples are their priorities after learning
+        learner.update(datasets=datasets, xdot_func=None)
+        expected = torch.relu(cex[:, 0] + 10.0)
+        self.assertTrue(
+            torch.allclose(datasets.buffers[XU]._priorities, expected, atol=1e-2)
+        )
+
+        # the counterexamples with the highest loss survive the eviction
+        new_cex = torch.ones(2, f.n_vars)
+        datasets.add(label=XU, samples=new_cex, priorities=torch.full((2,), 7.0))
+        kept = datasets.buffers[XU].counterexamples
+        self.assertTrue(torch.allclose(kept, torch.cat([cex[[0, 2]], new_cex])))
@@ -392,3 +392,108 @@ class TestModel(unittest.TestCase):
 
         # remove tmp_dir
         shutil.rmtree(tmp_dir)
+
+    def test_interval_bounds_mlp(self):
+        from fosco.common.bounds import network_bounds, network_gradient_bounds
+
+        torch.manual_seed(0)
+        lb, ub = torch.tensor([-1.0, 0.0, 0.5]), torch.tensor([-0.5, 0.3, 1.0])
+        x = lb + (ub - lb) * torch.rand(1000, 3)
+
+        for acts in [("relu", "square"), ("tanh", "sigmoid"), ("htanh", "softplus")]:
+            net = TorchMLP(input_size=3, hidden_sizes=(8, 6), activation=acts)
+
+            # sampled outputs and gradients must lie within the bounds
+            y_lb, y_ub = network_bounds(net, lb, ub)
+            y = net(x).detach().double()
+            self.assertTrue(torch.all(y >= y_lb - 1e-6), f"unsound lower bound {acts}")
+            self.assertTrue(torch.all(y <= y_ub + 1e-6), f"unsound upper bound {acts}")
+
+            dy_lb, dy_ub = network_gradient_bounds(net, lb, ub)
+            dy = net.gradient(x).detach().double()
+            self.assertEqual(dy_lb.shape, (1, 3))
+            self.assertTrue(
+                torch.all(dy >= dy_lb - 1e-6), f"unsound lower bound {acts}"
+            )
+            self.assertTrue(
+                torch.all(dy <= dy_ub + 1e-6), f"unsound upper bound {acts}"
+            )
+
+    def test_forward_with_jacobian(self):
+        activations = [
+            ("relu", "relu"),
+            ("tanh", "htanh"),
+            ("square", "sigmoid"),
+            ("rational", "linear"),
+        ]
+        for acts, dtype in [(acts, torch.float32) for acts in activations] + [
+            (("rational", "tanh"), torch.float64)
+        ]:
+            x_batch = torch.randn(50, 3, dtype=dtype)
+            model = TorchMLP(
+                input_size=3, hidden_sizes=(8, 6), activation=acts, output_size=2
+            ).to(dtype)
+
+            y, jacobian = model.forward_with_jacobian(x_batch)
+            self.assertEqual(jacobian.dtype, dtype)
+
+            self.assertEqual(jacobian.shape, (50, 2, 3))
+            self.assertTrue(torch.allclose(y, model(x_batch)))
+            # gradient sums the jacobian rows of the outputs
+            self.assertTrue(
+                torch.allclose(jacobian.sum(dim=1), model.gradient(x_batch), atol=1e-6),
+                f"jacobian differs from gradient for activations {acts}",
+            )
+
+            # differentiable w.r.t. the parameters, as the gradient
+            loss = jacobian.square().sum()
+            grads = torch.autograd.grad(
+                loss, list(model.parameters()), allow_unused=True
+            )
+            self.assertTrue(any(g is not None and g.abs().sum() > 0 for g in grads))
+
+    def test_compiled_models(self):
+        from fosco.models import RobustGate
+        from fosco.models.compiled import compile_model
+
+        x_batch = torch.randn(50, 3)
+
+        mlp = TorchMLP(
+            input_size=3,
+            hidden_sizes=(8, 6),
+            activation=("tanh", "relu"),
+            output_size=1,
+        )
+        rational_mlp = TorchMLP(
+            input_size=3,
+            hidden_sizes=(8,),
+            activation=("rational",),
+            output_size=1,
+        )
+        gate = RobustGate(activation_type="hsigmoid")
+        sequential = SequentialTorchMLP(mlps=[mlp, gate], register_module=[False, True])
+
+        for model in [mlp, rational_mlp, sequential]:
+            compiled = compile_model(model)
+
+            y, dydx = compiled.value_and_gradient(x_batch)
+            self.assertTrue(torch.allclose(compiled(x_batch), model(x_batch)))
+            self.assertTrue(torch.allclose(y, model(x_batch)))
+            self.assertTrue(torch.allclose(dydx, model.gradient(x_batch), atol=1e-6))
+            self.assertTrue(torch.allclose(compiled.gradient(x_batch), dydx, atol=1e-6))
+
+        # parameters are shared with the original model
+        compiled = compile_model(mlp)
+        with torch.no_grad():
+            mlp.layers[0].bias.add_(1.0)
+        self.assertTrue(torch.allclose(compiled(x_batch), mlp(x_batch)))
+
+        # scripted models can be saved and loaded without the model classes
+        tmp_dir = "tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        torch.jit.save(compiled, f"{tmp_dir}/compiled.pt")
+        loaded = torch.jit.load(f"{tmp_dir}/compiled.pt")
+        self.assertTrue(
+            torch.allclose(loaded.gradient(x_batch), mlp.gradient(x_batch), atol=1e-6)
+        )
+        shutil.rmtree(tmp_dir)
@@ -501,3 +501,278 @@ class TestTranslator(unittest.TestCase):
             ok_grad,
             f"Wrong symbolic formula for Vdot. Got: \n{expr_nndot}, expected: \n{expected_expr_nndot}",
         )
+
+    def test_shared_symbolic_cache(self):
+        from fosco.models.network import SymbolicCache
+        from fosco.verifier.z3_verifier import VerifierZ3
+
+        n_vars = 2
+
+        x = VerifierZ3.new_vars(n_vars, base="x")
+        x = np.array(x).reshape(-1, 1)
+        xdot = np.array(x).reshape(-1, 1)  # dummy xdot = x
+
+        nn = TorchMLP(
+            input_size=n_vars,
+            hidden_sizes=(5, 5),
+            activation=("square", "relu"),
+            output_size=1,
+        )
+        sigma = TorchMLP(
+            input_size=n_vars, hidden_sizes=(3,), activation=("relu",), output_size=1
+        )
+
+        # the hidden layers of V are translated once for V, grad V and the residual
+        cache = SymbolicCache()
+        V_symbolic, _, _ = cache.forward_smt(net=nn, x=x)
+        Vgrad_symbolic, _, _ = cache.gradient_smt(net=nn, x=x)
+        Vgrad_symbolic2, _, _ = cache.gradient_smt(net=nn, x=x)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hits, 2)
+        self.assertIs(Vgrad_symbolic, Vgrad_symbolic2)
+
+        # same formulas as the uncached passes
+        expected_V, _, _ = nn.forward_smt(x=x)
+        expected_Vgrad, _, _ = nn.gradient_smt(x=x)
+        self.assertTrue(check_smt_equivalence(V_symbolic, expected_V))
+        for i in range(n_vars):
+            self.assertTrue(
+                check_smt_equivalence(Vgrad_symbolic[0, i], expected_Vgrad[0, i])
+            )
+
+        translator = RobustMLPTranslator()
+        result_dict, elapsed_time = translator.translate(
+            x_v_map={"v": x},
+            V_net=nn,
+            sigma_net=sigma,
+            xdot=xdot,
+            xdot_residual=xdot,
+        )
+        self.assertTrue(
+            check_smt_equivalence(
+                result_dict["Vdot_symbolic"], result_dict["Vdot_residual_symbolic"]
+            )
+        )
+        self.assertTrue(check_smt_equivalence(result_dict["V_symbolic"], expected_V))
+
+    def test_aux_network_encoding(self):
+        import z3
+
+        from fosco.verifier.z3_verifier import VerifierZ3, expr_stats
+
+        n_vars = 2
+
+        x = VerifierZ3.new_vars(n_vars, base="x")
+        x = np.array(x).reshape(-1, 1)
+        xdot = np.array(x).reshape(-1, 1)  # dummy xdot = x
+
+        nn = TorchMLP(
+            input_size=n_vars,
+            hidden_sizes=(4, 4, 4),
+            activation=("relu", "relu", "relu"),
+            output_size=1,
+        )
+
+        inline_dict, _ = MLPTranslator(network_encoding="inline").translate(
+            x_v_map={"v": x}, V_net=nn, xdot=xdot
+        )
+        aux_dict, _ = MLPTranslator(network_encoding="aux").translate(
+            x_v_map={"v": x}, V_net=nn, xdot=xdot
+        )
+
+        self.assertEqual(inline_dict["V_symbolic_constr"], [])
+        self.assertGreater(len(aux_dict["V_symbolic_constr"]), 0)
+        self.assertEqual(aux_dict["V_symbolic_vars"], inline_dict["V_symbolic_vars"])
+
+        # formula size does not compound over layers
+        self.assertLess(
+            expr_stats(aux_dict["V_symbolic"])["tree_size"],
+            expr_stats(inline_dict["V_symbolic"])["tree_size"],
+        )
+
+        # same functions, once the auxiliary variables are defined
+        for key in ["V_symbolic", "Vdot_symbolic"]:
+            s = z3.Solver()
+            s.add(*aux_dict[key + "_constr"])
+            s.add(aux_dict[key] != inline_dict[key])
+            self.assertEqual(s.check(), z3.unsat, f"{key} differs in aux encoding")
+
+    def test_sparse_symbolic_matmul(self):
+        import z3
+
+        from fosco.common.linalg_symbolic import (
+            round_weights,
+            symbolic_matmul,
+            symbolic_row_scale,
+        )
+        from fosco.verifier.z3_verifier import VerifierZ3
+
+        x = np.array(VerifierZ3.new_vars(3, base="x")).reshape(-1, 1)
+        w = np.array([[0.5, 0.0, -1.25], [0.0, 0.0, 0.0], [1e-5, 2.0, 0.0]])
+
+        z = symbolic_matmul(w, x)
+        self.assertEqual(z.shape, (3, 1))
+        for i in range(3):
+            self.assertTrue(check_smt_equivalence(z[i, 0], (w @ x)[i, 0]))
+        # only the non-zero weights build terms, and rows of zeros are symbolic zeros
+        self.assertEqual(z[0, 0].num_args(), 2)
+        self.assertIsInstance(z[1, 0], z3.ArithRef)
+
+        # weights rounded to zero are skipped
+        z = symbolic_matmul(round_weights(w, rounding=3), x)
+        self.assertTrue(check_smt_equivalence(z[2, 0], 2.0 * x[1, 0]))
+
+        # numerical inputs give numerical products
+        jac = symbolic_matmul(w, np.eye(3))
+        self.assertTrue(np.allclose(jac.astype(float), w))
+
+        d = np.array([x[0, 0], 0.0, 2.0])
+        scaled = symbolic_row_scale(d, jac)
+        expected = np.diagflat(d) @ jac
+        self.assertEqual(scaled[1, 2], 0.0)
+        for index in np.ndindex(scaled.shape):
+            zero = z3.RealVal(0)
+            self.assertTrue(
+                check_smt_equivalence(zero + scaled[index], zero + expected[index])
+            )
+
+    def test_network_pruning(self):
+        import torch
+        import z3
+
+        from fosco.models.pruning import prune_network
+        from fosco.verifier.z3_verifier import VerifierZ3
+
+        n_vars = 2
+        lb, ub = (-1.0, -1.0), (1.0, 1.0)
+
+        x = VerifierZ3.new_vars(n_vars, base="x")
+        x = np.array(x).reshape(-1, 1)
+        xdot = np.array(x).reshape(-1, 1)  # dummy xdot = x
+
+        nn = TorchMLP(
+            input_size=n_vars,
+            hidden_sizes=(4, 3),
+            activation=("relu", "htanh"),
+            output_size=1,
+        )
+        with torch.no_grad():
+            # active, inactive and unstable relu
+            nn.layers[0].weight.data = torch.tensor(
+                [[1.0, 0.5], [0.5, -1.0], [2.0, 1.0], [-1.0, 1.0]]
+            )
+            nn.layers[0].bias.data = torch.tensor([5.0, -5.0, 0.0, 0.0])
+            # saturated, linear and unstable htanh
+            nn.layers[1].weight.data = torch.tensor(
+                [[0.1, 0.3, 0.0, 0.1], [0.1, 0.0, 0.1, 0.1], [0.5, 0.5, 1.0, 1.0]]
+            )
+            nn.layers[1].bias.data = torch.tensor([2.0, -0.5, -3.0])
+
+        pruned, stats = prune_network(nn, lb=torch.tensor(lb), ub=torch.tensor(ub))
+        self.assertEqual(stats["n_neurons"], 7)
+        self.assertEqual(stats["n_removed"], 2)
+        self.assertEqual(stats["n_linear"], 2)
+        self.assertEqual([layer.out_features for layer in pruned.layers], [3, 2, 1])
+
+        # same network within the box
+        samples = 2.0 * torch.rand(1000, n_vars) - 1.0
+        self.assertTrue(torch.allclose(nn(samples), pruned(samples), atol=1e-5))
+        self.assertTrue(
+            torch.allclose(nn.gradient(samples), pruned.gradient(samples), atol=1e-5)
+        )
+        _, jacobian = pruned.forward_with_jacobian(samples)
+        self.assertTrue(
+            torch.allclose(nn.gradient(samples), jacobian.sum(dim=1), atol=1e-5)
+        )
+
+        full_dict, _ = MLPTranslator().translate(x_v_map={"v": x}, V_net=nn, xdot=xdot)
+        pruned_dict, _ = MLPTranslator(pruning_box=(lb, ub)).translate(
+            x_v_map={"v": x}, V_net=nn, xdot=xdot
+        )
+
+        # stable neurons are translated without if-then-else terms
+        self.assertLess(
+            str(pruned_dict["V_symbolic"]).count("If"),
+            str(full_dict["V_symbolic"]).count("If"),
+        )
+
+        # same functions within the box
+        in_box = [z3.And(xi >= l, xi <= u) for xi, l, u in zip(x.flatten(), lb, ub)]
+        for key in ["V_symbolic", "Vdot_symbolic"]:
+            s = z3.Solver()
+            s.add(*in_box)
+            s.add(z3.Abs(pruned_dict[key] - full_dict[key]) > 1e-3)
+            self.assertEqual(s.check(), z3.unsat, f"{key} differs after pruning")
+
+        with self.assertRaises(AssertionError):
+            MLPTranslatorDT(pruning_box=(lb, ub))
+
+    def test_sequential_network_pruning(self):
+        import torch
+        import z3
+
+        from fosco.models.network import SequentialTorchMLP
+        from fosco.verifier.z3_verifier import VerifierZ3
+
+        n_vars = 2
+        lb, ub = (-1.0, -1.0), (1.0, 1.0)
+
+        x = VerifierZ3.new_vars(n_vars, base="x")
+        x = np.array(x).reshape(-1, 1)
+        xdot = np.array(x).reshape(-1, 1)  # dummy xdot = x
+
+        # the first mlp scales the state out of the box, where the relus are unstable
+        scale = TorchMLP(
+            input_size=n_vars, hidden_sizes=(), activation=(), output_size=n_vars
+        )
+        head = TorchMLP(
+            input_size=n_vars, hidden_sizes=(2,), activation=("relu",), output_size=1
+        )
+        with torch.no_grad():
+            scale.layers[0].weight.data = 10.0 * torch.eye(n_vars)
+            scale.layers[0].bias.data = torch.zeros(n_vars)
+            head.layers[0].weight.data = torch.tensor([[1.0, 0.0], [0.0, -1.0]])
+            head.layers[0].bias.data = torch.tensor([2.0, 2.0])
+        nn = SequentialTorchMLP(mlps=[scale, head])
+
+        full_dict, _ = MLPTranslator().translate(x_v_map={"v": x}, V_net=nn, xdot=xdot)
+        pruned_dict, _ = MLPTranslator(pruning_box=(lb, ub)).translate(
+            x_v_map={"v": x}, V_net=nn, xdot=xdot
+        )
+
+        # same functions within the box
+        in_box = [z3.And(xi >= l, xi <= u) for xi, l, u in zip(x.flatten(), lb, ub)]
+        for key in ["V_symbolic", "Vdot_symbolic"]:
+            s = z3.Solver()
+            s.add(*in_box)
+            s.add(z3.Abs(pruned_dict[key] - full_dict[key]) > 1e-3)
+            self.assertEqual(s.check(), z3.unsat, f"{key} differs after pruning")
+
+        # and equal to the network on samples in the box
+        samples = 2.0 * torch.rand(100, n_vars) - 1.0
+        for sample, value in zip(samples, nn(samples)):
+            subs = [(xi, z3.RealVal(float(si))) for xi, si in zip(x.flatten(), sample)]
+            fml = z3.simplify(z3.substitute(pruned_dict["V_symbolic"], *subs))
+            self.assertAlmostEqual(float(fml.as_fraction()), value.item(), places=4)
+
+    def test_dt_aux_network_encoding(self):
+        from fosco.verifier.z3_verifier import VerifierZ3
+
+        # the neurons of V(x_next) depend on the input u, which is substituted with each
+        # input vertex in the feasibility condition: the network is translated inline
+        x = np.array(VerifierZ3.new_vars(1, base="x")).reshape(-1, 1)
+        u = VerifierZ3.new_vars(1, base="u")[0]
+        xnext = x + 0.5 * u
+
+        nn = TorchMLP(
+            input_size=1, hidden_sizes=(4,), activation=("relu",), output_size=1
+        )
+        inline_dict, _ = MLPTranslatorDT(network_encoding="inline").translate(
+            x_v_map={"v": x.flatten()}, V_net=nn, xdot=xnext
+        )
+        self.assertEqual(inline_dict["V_symbolic_constr"], [])
+        self.assertEqual(inline_dict["Vdot_symbolic_constr"], [])
+
+        for translator_cls in [MLPTranslatorDT, RobustMLPTranslatorDT]:
+            with self.assertRaises(AssertionError):
+                translator_cls(network_encoding="aux")
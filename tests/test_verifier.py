@@ -1,7 +1,16 @@
+import multiprocessing
+import shutil
+import tempfile
 import time
 import unittest
+from functools import partial
+from pathlib import Path
+
+import torch
 
 from fosco.common.consts import VerifierType
+from fosco.common.domains import Rectangle
+from fosco.common.parallel import run_forked
 from fosco.verifier import make_verifier, Verifier
 from fosco.verifier.verifier import SYMBOL
 
@@ -245,3 +254,868 @@ class TestVerifier(unittest.TestCase):
             elapsed_time <= timeout_s,
             f"expected verifier to finish within the time limit, got elapsed time {elapsed_time} > {timeout_s}",
         )
+
+    def test_parallel_conditions_z3(self):
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        vars = verifier_fn.new_vars(n=1)
+
+        def constraint_gen(
+            verif: Verifier,
+            C: SYMBOL,
+            C_constr: list[SYMBOL],
+            C_vars: list[SYMBOL],
+            *args,
+        ):
+            And_ = verif.solver_fncts()["And"]
+            yield {
+                "sat": (C >= 0.0, C_vars, []),
+                "unsat": (And_(C >= 0.0, C < 0), C_vars, []),
+            }
+
+        verifier = verifier_fn(
+            solver_vars=vars,
+            constraints_method=constraint_gen,
+            solver_timeout=10,
+            n_workers=2,
+        )
+
+        C = vars[0] + 1.0
+        results, elapsed_time = verifier.verify(
+            V_symbolic=C,
+            V_symbolic_constr=[],
+            V_symbolic_vars=vars,
+            Vdot_symbolic=C,
+            Vdot_symbolic_constr=[],
+            Vdot_symbolic_vars=vars,
+            sigma_symbolic=None,
+            sigma_symbolic_constr=[],
+            sigma_symbolic_vars=[],
+            Vdot_residual_symbolic=None,
+            Vdot_residual_symbolic_constr=[],
+            Vdot_residual_symbolic_vars=[],
+        )
+
+        self.assertFalse(results["found"])
+        self.assertTrue(
+            results["cex"]["sat"] is not None and results["cex"]["sat"][0, 0] >= -1.0,
+            f"expected counterexample x >= -1, got {results['cex']['sat']}",
+        )
+        self.assertTrue(results["cex"]["unsat"] is None)
+
+    def test_incremental_z3(self):
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        vars = verifier_fn.new_vars(n=1)
+        And_ = verifier_fn.solver_fncts()["And"]
+        domain = And_(vars[0] >= -5.0, vars[0] <= 5.0)
+
+        def constraint_gen(
+            verif: Verifier,
+            C: SYMBOL,
+            C_constr: list[SYMBOL],
+            C_vars: list[SYMBOL],
+            *args,
+        ):
+            yield {"lie": (And_(C >= 0.0, domain), C_vars, [])}
+
+        verifier = verifier_fn(
+            solver_vars=vars,
+            constraints_method=constraint_gen,
+            solver_timeout=10,
+            incremental=True,
+            domain_constraints={"lie": domain},
+        )
+
+        # the second function has no counterexample in the domain
+        for C, expected_found in [(vars[0] + 1.0, False), (vars[0] - 10.0, True)]:
+            results, elapsed_time = verifier.verify(
+                V_symbolic=C,
+                V_symbolic_constr=[],
+                V_symbolic_vars=vars,
+                Vdot_symbolic=C,
+                Vdot_symbolic_constr=[],
+                Vdot_symbolic_vars=vars,
+                sigma_symbolic=None,
+                sigma_symbolic_constr=[],
+                sigma_symbolic_vars=[],
+                Vdot_residual_symbolic=None,
+                Vdot_residual_symbolic_constr=[],
+                Vdot_residual_symbolic_vars=[],
+            )
+            self.assertEqual(results["found"], expected_found)
+
+            # only the domain constraints remain asserted in the persistent solver
+            solver = verifier._solvers["lie"]
+            self.assertEqual(solver.num_scopes(), 0)
+            self.assertEqual(len(solver.assertions()), 1)
+
+    def test_multiple_counterexamples_z3(self):
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        vars = verifier_fn.new_vars(n=2)
+        And_ = verifier_fn.solver_fncts()["And"]
+
+        def constraint_gen(
+            verif: Verifier,
+            C: SYMBOL,
+            C_constr: list[SYMBOL],
+            C_vars: list[SYMBOL],
+            *args,
+        ):
+            # the second variable does not occur in the condition
+            yield {"lie": (And_(C >= 0.0, vars[0] >= 0.0, vars[0] <= 1.0), C_vars, [])}
+
+        n_cex, radius = 3, 0.1
+        verifier = verifier_fn(
+            solver_vars=vars,
+            constraints_method=constraint_gen,
+            solver_timeout=10,
+            n_cex=n_cex,
+            cex_radius=radius,
+        )
+
+        C = vars[0]
+        results, elapsed_time = verifier.verify(
+            V_symbolic=C,
+            V_symbolic_constr=[],
+            V_symbolic_vars=vars,
+            Vdot_symbolic=C,
+            Vdot_symbolic_constr=[],
+            Vdot_symbolic_vars=vars,
+            sigma_symbolic=None,
+            sigma_symbolic_constr=[],
+            sigma_symbolic_vars=[],
+            Vdot_residual_symbolic=None,
+            Vdot_residual_symbolic_constr=[],
+            Vdot_residual_symbolic_vars=[],
+        )
+
+        cex = results["cex"]["lie"]
+        self.assertFalse(results["found"])
+        self.assertEqual(cex.shape, (n_cex, 2))
+
+        # counterexamples are pairwise separated along the occurring variable
+        for i in range(n_cex):
+            for j in range(i + 1, n_cex):
+                self.assertGreater(abs(cex[i, 0] - cex[j, 0]), radius)
+
+    def test_forked_worker_killed_on_timeout(self):
+        timeout_s = 0.5
+
+        t0 = time.time()
+        results = run_forked(
+            tasks={"slow": partial(time.sleep, 60), "fast": partial(abs, -1)},
+            n_workers=2,
+            timeout=timeout_s,
+        )
+        elapsed_time = time.time() - t0
+
+        # the slow task is dropped and its process does not outlive the call
+        self.assertEqual(results, {"fast": 1})
+        self.assertLess(elapsed_time, timeout_s + 2.0)
+        self.assertEqual(len(multiprocessing.active_children()), 0)
+
+    def test_forked_worker_exception(self):
+        # the exception of the failed task is raised, the other tasks are terminated
+        with self.assertRaises(ValueError):
+            run_forked(
+                tasks={"slow": partial(time.sleep, 60), "fail": partial(int, "x")},
+                n_workers=2,
+                timeout=10.0,
+            )
+        self.assertEqual(len(multiprocessing.active_children()), 0)
+
+        # as when the conditions are solved in the current process
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        vars = verifier_fn.new_vars(n=1)
+
+        def constraint_gen(verif: Verifier, C: SYMBOL, *args):
+            yield {"sat": (C >= 0.0, vars, []), "unsat": (C <= -1.0, vars, [])}
+
+        for n_workers in [1, 2]:
+            verifier = verifier_fn(
+                solver_vars=vars,
+                constraints_method=constraint_gen,
+                solver_timeout=10,
+                n_workers=n_workers,
+            )
+
+            def solve_condition(label, condition, vars, aux_vars):
+                raise ValueError(f"{label}: bug in the solver")
+
+            verifier._solve_condition = solve_condition
+            with self.assertRaises(ValueError):
+                verifier.verify(
+                    V_symbolic=vars[0] * vars[0],
+                    V_symbolic_constr=[],
+                    V_symbolic_vars=vars,
+                    Vdot_symbolic=None,
+                    Vdot_symbolic_constr=[],
+                    Vdot_symbolic_vars=[],
+                    sigma_symbolic=None,
+                    sigma_symbolic_constr=[],
+                    sigma_symbolic_vars=[],
+                    Vdot_residual_symbolic=None,
+                    Vdot_residual_symbolic_constr=[],
+                    Vdot_residual_symbolic_vars=[],
+                )
+
+    def test_domain_splitting_z3(self):
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        vars = verifier_fn.new_vars(var_names=["x0", "x1"])
+        fns = verifier_fn.solver_fncts()
+        domain = Rectangle(vars=["x0", "x1"], lb=(-2.0, -1.0), ub=(2.0, 1.0))
+
+        verifier = verifier_fn(
+            solver_vars=vars,
+            constraints_method=lambda *args: iter([]),
+            solver_timeout=10,
+            split_domain=domain,
+            max_split_depth=2,
+        )
+
+        # bisection along the widest dimension
+        lower_half, upper_half = verifier._bisect(domain)
+        self.assertEqual(lower_half.upper_bounds, (0.0, 1.0))
+        self.assertEqual(upper_half.lower_bounds, (0.0, -1.0))
+
+        # counterexamples from the two halves are merged
+        condition = fns["Or"](vars[0] >= 1.5, vars[0] <= -1.5)
+        res = verifier._solve_split("lie", condition, vars, [])
+        self.assertTrue(res.sat)
+        self.assertEqual(res.cex.shape, (2, 2))
+        self.assertEqual(sorted(torch.sign(res.cex[:, 0]).tolist()), [-1.0, 1.0])
+
+        # no counterexample in any sub-box
+        res = verifier._solve_split("lie", vars[0] >= 3.0, vars, [])
+        self.assertTrue(res.unsat)
+        self.assertIsNone(res.cex)
+
+    def test_domain_splitting_prescreen_parallel_z3(self):
+        from fosco.verifier.verifier import ConditionResult
+
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        vars = verifier_fn.new_vars(var_names=["x0", "x1"])
+        domain = Rectangle(vars=["x0", "x1"], lb=(-2.0, -1.0), ub=(2.0, 1.0))
+
+        verifier = verifier_fn(
+            solver_vars=vars,
+            constraints_method=lambda *args: iter([]),
+            solver_timeout=10,
+            split_domain=domain,
+            max_split_depth=2,
+            n_workers=2,
+        )
+
+        # all the sub-boxes discharged by the prescreen, nothing left to solve
+        res = verifier._solve_split(
+            "lie", vars[0] >= 0.0, vars, [], screen=lambda box: {"lie": True}
+        )
+        self.assertTrue(res.unsat)
+        self.assertIsNone(res.cex)
+
+        # conditions cancelled after a counterexample in the group are not split
+        sat = ConditionResult(
+            sat=True, unsat=False, timed_out=False, cex=torch.zeros(1, 2), aux_cex=None
+        )
+        cancelled = ConditionResult(
+            sat=False, unsat=False, timed_out=True, cex=None, aux_cex=None
+        )
+        verifier._solve_queries = lambda queries, stop_when_sat: {
+            "init": sat,
+            "lie": cancelled,
+        }
+        verifier._solve_split = None  # fails if called
+        conditions = {
+            "init": (vars[0] >= 0.0, vars, []),
+            "lie": (vars[0] >= 0.0, vars, []),
+        }
+        results = verifier._solve_group(conditions=conditions)
+        self.assertTrue(results["init"].sat)
+        self.assertTrue(results["lie"].timed_out)
+
+    def test_prescreen_cbf(self):
+        from fosco.certificates import make_certificate
+        from fosco.models import TorchMLP
+        from fosco.systems import make_system
+
+        system = make_system("SingleIntegrator")()
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        variables = {
+            "v": verifier_fn.new_vars(var_names=system.vars),
+            "u": verifier_fn.new_vars(var_names=system.controls),
+        }
+        certificate = make_certificate(certificate_type="cbf")(
+            system=system, variables=variables, domains=system.domains
+        )
+
+        # linear barrier B(x) = x0 - 2
+        net = TorchMLP(input_size=2, hidden_sizes=(), activation=())
+        with torch.no_grad():
+            net.layers[0].weight.copy_(torch.tensor([[1.0, 0.0]]))
+            net.layers[0].bias.copy_(torch.tensor([-2.0]))
+
+        # over the whole domain, only the unsafe condition is proven
+        results = certificate.prescreen(V_net=net)
+        self.assertEqual(results, {"lie": False, "init": False, "unsafe": True})
+
+        # B > 0 and dB/dt = u0 can be positive everywhere in the sub-box
+        results = certificate.prescreen(V_net=net, box=((3.0, -5.0), (5.0, 5.0)))
+        self.assertEqual(results, {"lie": True, "init": True, "unsafe": True})
+
+        # B < 0 in the sub-box: feasibility holds, the initial condition does not
+        results = certificate.prescreen(V_net=net, box=((-5.0, -5.0), (-4.0, 5.0)))
+        self.assertEqual(results, {"lie": True, "init": False, "unsafe": True})
+
+    def test_portfolio(self):
+        verifier_fn = make_verifier(type=VerifierType.PORTFOLIO)
+        vars = verifier_fn.new_vars(n=1)
+
+        def constraint_gen(
+            verif: Verifier,
+            C: SYMBOL,
+            C_constr: list[SYMBOL],
+            C_vars: list[SYMBOL],
+            *args,
+        ):
+            And_ = verif.solver_fncts()["And"]
+            yield {
+                "sat": (And_(C >= 0.0, vars[0] <= 10.0), C_vars, []),
+                "unsat": (And_(C >= 0.0, C < 0), C_vars, []),
+            }
+
+        verifier = verifier_fn(
+            solver_vars=vars, constraints_method=constraint_gen, solver_timeout=10
+        )
+
+        C = vars[0] + 1.0
+        results, elapsed_time = verifier.verify(
+            V_symbolic=C,
+            V_symbolic_constr=[],
+            V_symbolic_vars=vars,
+            Vdot_symbolic=C,
+            Vdot_symbolic_constr=[],
+            Vdot_symbolic_vars=vars,
+            sigma_symbolic=None,
+            sigma_symbolic_constr=[],
+            sigma_symbolic_vars=[],
+            Vdot_residual_symbolic=None,
+            Vdot_residual_symbolic_constr=[],
+            Vdot_residual_symbolic_vars=[],
+        )
+
+        self.assertFalse(results["found"])
+        self.assertIsNone(results["cex"]["unsat"])
+        self.assertTrue(-1.0 <= results["cex"]["sat"][0, 0] <= 10.0)
+
+    def test_z3_to_dreal_conversion(self):
+        import dreal
+        from fosco.verifier.portfolio_verifier import z3_to_dreal
+
+        z3_fn = make_verifier(type=VerifierType.Z3)
+        x = z3_fn.new_vars(n=2)
+        fns = z3_fn.solver_fncts()
+        fml = fns["And"](
+            fns["If"](x[0] > 0, x[0], 0) * x[1] - x[1] / 2 >= 1,
+            fns["Or"](x[0] <= 3, x[1] < -1),
+            x[1] <= 10.0,
+        )
+
+        dr_vars = {str(v): dreal.Variable(str(v)) for v in x}
+        dr_fml = z3_to_dreal(fml, variables=dr_vars)
+
+        res = dreal.CheckSatisfiability(dr_fml, 0.0001)
+        self.assertIsInstance(res, dreal.Box)
+        unsat_fml = dreal.And(
+            dr_fml, dreal.And(dr_vars["x1"] >= 0.0, dr_vars["x0"] <= 0.0)
+        )
+        self.assertIsNone(dreal.CheckSatisfiability(unsat_fml, 0.0001))
+
+    def test_milp(self):
+        from fosco.verifier.milp_verifier import MILPEncoder
+
+        verifier_fn = make_verifier(type=VerifierType.MILP)
+        vars = verifier_fn.new_vars(n=2)
+        fns = verifier_fn.solver_fncts()
+        domain = fns["And"](*[fns["And"](v >= -1.0, v <= 1.0) for v in vars])
+
+        # relu network B(x) = relu(x0 - x1) + 2 relu(x0 + x1) - 1, with maximum 3 in the domain
+        h1 = fns["If"](vars[0] - vars[1] > 0, vars[0] - vars[1], 0)
+        h2 = fns["If"](vars[0] + vars[1] > 0, vars[0] + vars[1], 0)
+        B = h1 + 2 * h2 - 1
+
+        def constraint_gen(verif: Verifier, C: SYMBOL, *args):
+            yield {
+                "sat": (fns["And"](domain, C >= 2.5), vars, []),
+                "unsat": (fns["And"](domain, C > 3.5), vars, []),
+                "nonlinear": (fns["And"](domain, vars[0] * vars[1] > 0.5), vars, []),
+            }
+
+        verifier = verifier_fn(
+            solver_vars=vars, constraints_method=constraint_gen, solver_timeout=10
+        )
+
+        MILPEncoder().encode(fns["And"](domain, B >= 2.5))
+        with self.assertRaises(NotImplementedError):
+            MILPEncoder().encode(fns["And"](domain, vars[0] * vars[1] > 0.5))
+        with self.assertRaises(NotImplementedError):
+            MILPEncoder().encode(B >= 2.5)
+
+        results, elapsed_time = verifier.verify(
+            V_symbolic=B,
+            V_symbolic_constr=[],
+            V_symbolic_vars=vars,
+            Vdot_symbolic=None,
+            Vdot_symbolic_constr=[],
+            Vdot_symbolic_vars=[],
+            sigma_symbolic=None,
+            sigma_symbolic_constr=[],
+            sigma_symbolic_vars=[],
+            Vdot_residual_symbolic=None,
+            Vdot_residual_symbolic_constr=[],
+            Vdot_residual_symbolic_vars=[],
+        )
+
+        self.assertFalse(results["found"])
+        self.assertIsNone(results["cex"]["unsat"])
+
+        x = results["cex"]["sat"][0]
+        value = torch.relu(x[0] - x[1]) + 2 * torch.relu(x[0] + x[1]) - 1
+        self.assertTrue(torch.all(x.abs() <= 1.0 + 1e-6))
+        self.assertGreaterEqual(value.item(), 2.5 - 1e-6)
+
+        x = results["cex"]["nonlinear"][0]
+        self.assertGreater(x[0].item() * x[1].item(), 0.5)
+
+    def test_milp_encoder_shared_terms(self):
+        import z3
+        from fosco.verifier.milp_verifier import MILPEncoder
+
+        # the products are distributed over the same step, into temporary terms
+        x, y, u = z3.Reals("x y u")
+        step = z3.If(x >= 0, 1.0, 0.0)
+        domain = z3.And(*[z3.And(v >= -2.0, v <= 2.0) for v in [x, y, u]])
+        fml = z3.And(domain, x >= 0, y == 1, u == -1, step * y + step * u > 0.5)
+
+        solver = z3.Solver()
+        solver.add(fml)
+        self.assertEqual(solver.check(), z3.unsat)
+
+        encoder = MILPEncoder()
+        encoder.encode(fml)
+        status, _ = encoder.solve(time_limit=10)
+        self.assertEqual(status, "unsat")
+
+    def test_milp_encoder_translated_network(self):
+        import numpy as np
+        import z3
+        from fosco.models import TorchMLP
+        from fosco.translator import MLPTranslator
+        from fosco.verifier.milp_verifier import MILPEncoder
+
+        torch.manual_seed(0)
+        x = z3.Reals("x0 x1")
+        domain = z3.And(*[z3.And(v >= -1.0, v <= 1.0) for v in x])
+        net = TorchMLP(
+            input_size=2, hidden_sizes=(5,), activation=("relu",), output_size=1
+        )
+
+        # the lie derivative multiplies the sum of relu steps by the dynamics xdot = -x
+        x_v = np.array(x).reshape(-1, 1)
+        results, _ = MLPTranslator().translate(x_v_map={"v": x_v}, V_net=net, xdot=-x_v)
+        V, Vdot = results["V_symbolic"], results["Vdot_symbolic"]
+
+        # int-valued steps are coerced to reals
+        step = z3.If(x[0] - x[1] > 0, 1, 0)
+
+        for fml in [
+            z3.And(domain, Vdot > 0.0),
+            z3.And(domain, V > 0.0, Vdot <= 0.0),
+            z3.And(domain, Vdot > 10.0),
+            z3.And(domain, step * x[0] + step * x[1] > 1.5),
+            z3.And(domain, step * x[0] + step * x[1] > 2.5),
+        ]:
+            solver = z3.Solver()
+            solver.add(fml)
+            encoder = MILPEncoder()
+            encoder.encode(fml)
+            status, _ = encoder.solve(time_limit=10)
+            self.assertEqual(status, str(solver.check()))
+
+    def test_milp_epsilon(self):
+        from fosco.verifier.milp_verifier import MILPEncoder
+
+        verifier_fn = make_verifier(type=VerifierType.MILP)
+        vars = verifier_fn.new_vars(n=1)
+        fns = verifier_fn.solver_fncts()
+        x = vars[0]
+
+        # violation within the margin of strict inequalities, eg. x = 5e-8
+        eps = verifier_fn.MILP_EPSILON
+        fml = fns["And"](x >= -1.0, x <= 1.0, x > 0.0, x < eps / 10)
+
+        encoder = MILPEncoder(epsilon=eps)
+        encoder.encode(fml)
+        status, _ = encoder.solve(time_limit=10)
+        self.assertEqual(status, "unsat")
+
+        # milp unsat is not conclusive, the condition is confirmed with z3
+        def constraint_gen(verif: Verifier, C: SYMBOL, *args):
+            yield {"sat": (fml, vars, [])}
+
+        verifier = verifier_fn(
+            solver_vars=vars, constraints_method=constraint_gen, solver_timeout=10
+        )
+        results, elapsed_time = verifier.verify(
+            V_symbolic=x,
+            V_symbolic_constr=[],
+            V_symbolic_vars=vars,
+            Vdot_symbolic=None,
+            Vdot_symbolic_constr=[],
+            Vdot_symbolic_vars=[],
+            sigma_symbolic=None,
+            sigma_symbolic_constr=[],
+            sigma_symbolic_vars=[],
+            Vdot_residual_symbolic=None,
+            Vdot_residual_symbolic_constr=[],
+            Vdot_residual_symbolic_vars=[],
+        )
+
+        self.assertFalse(results["found"])
+        self.assertTrue(0.0 < results["cex"]["sat"][0, 0].item() < eps / 10)
+
+    @unittest.skipIf(shutil.which("z3") is None, "z3 binary not installed")
+    def test_smtlib(self):
+        from fosco.verifier.smtlib_verifier import parse_smtlib_model
+        from fosco.verifier.z3_verifier import to_smtlib2
+
+        model = parse_smtlib_model(
+            "(\n  (define-fun x0 () Real (/ (- 3.0) 4.0))\n"
+            "  (define-fun |x 1| () Real 2.0)\n"
+            "  (define-fun f ((a Real)) Real a)\n)"
+        )
+        self.assertEqual(model, {"x0": -0.75, "x 1": 2.0})
+
+        verifier_fn = make_verifier(type=VerifierType.SMTLIB)
+        vars = verifier_fn.new_vars(n=2)
+        fns = verifier_fn.solver_fncts()
+
+        # powers are not standard smt-lib2, they are expanded to products
+        self.assertNotIn("^", to_smtlib2((vars[0] + vars[1]) ** 2 > 1.0))
+
+        def constraint_gen(verif: Verifier, C: SYMBOL, *args):
+            yield {
+                "sat": (fns["And"](C > 1.0, vars[0] >= 0.0), vars, []),
+                "unsat": (fns["And"](C < 0.0, vars[0] >= 0.0), vars, []),
+            }
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            verifier = verifier_fn(
+                solver_vars=vars,
+                constraints_method=constraint_gen,
+                solver_timeout=10,
+                solver_command="z3 -smt2",
+                smtlib_dir=tmpdir,
+            )
+            results, elapsed_time = verifier.verify(
+                V_symbolic=vars[0] * vars[0] + vars[1] * vars[1],
+                V_symbolic_constr=[],
+                V_symbolic_vars=vars,
+                Vdot_symbolic=None,
+                Vdot_symbolic_constr=[],
+                Vdot_symbolic_vars=[],
+                sigma_symbolic=None,
+                sigma_symbolic_constr=[],
+                sigma_symbolic_vars=[],
+                Vdot_residual_symbolic=None,
+                Vdot_residual_symbolic_constr=[],
+                Vdot_residual_symbolic_vars=[],
+            )
+            exported = sorted(p.name.split("_")[0] for p in Path(tmpdir).iterdir())
+
+        self.assertFalse(results["found"])
+        self.assertIsNone(results["cex"]["unsat"])
+        x = results["cex"]["sat"][0]
+        self.assertGreaterEqual(x[0].item(), 0.0)
+        self.assertGreater(x[0].item() ** 2 + x[1].item() ** 2, 1.0)
+        self.assertEqual(exported, ["sat", "unsat"])
+
+    def test_round_expr_shared_subterms(self):
+        from fosco.verifier.z3_verifier import round_expr, expr_stats
+
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        fns = verifier_fn.solver_fncts()
+        x = verifier_fn.new_vars(n=1)[0]
+
+        # each layer refers twice to the previous one: the tree size grows exponentially
+        e = x
+        for _ in range(40):
+            e = fns["If"](e > 0, 1.234567 * e, 0.5 * e)
+
+        stats = expr_stats(e)
+        self.assertEqual(stats["depth"], 2 * 40 + 1)
+        self.assertLess(stats["dag_size"], 10 * 40)
+        self.assertGreater(stats["tree_size"], 2**40)
+
+        rounded = round_expr(e, rounding=2)
+        self.assertEqual(expr_stats(rounded)["dag_size"], stats["dag_size"])
+        coeff = rounded.arg(1).arg(0).as_fraction()
+        self.assertAlmostEqual(float(coeff), 1.23)
+
+    def test_rounding_sentinel(self):
+        import numpy as np
+        import z3
+        from fosco.common.linalg_symbolic import round_weights
+
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        x = verifier_fn.new_vars(n=1)[0]
+
+        # -1 is no rounding, 0 rounds to integers, as for the network weights
+        for rounding in [-1, 0, 1]:
+            verifier = verifier_fn(
+                solver_vars=[x],
+                constraints_method=lambda *args: iter([]),
+                solver_timeout=10,
+                rounding=rounding,
+            )
+            fml = verifier._preprocess(1.65 * x)
+            expected = round_weights(np.array([1.65]), rounding=rounding)[0]
+            self.assertTrue(z3.is_mul(fml))
+            self.assertAlmostEqual(float(fml.arg(0).as_fraction()), expected)
+
+    def test_feasibility_box_encoding(self):
+        import z3
+        from fosco.certificates import make_certificate
+        from fosco.systems import make_system
+
+        system = make_system("SingleIntegrator")()
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        variables = {
+            "v": verifier_fn.new_vars(var_names=system.vars),
+            "u": verifier_fn.new_vars(var_names=system.controls),
+        }
+        x, u = variables["v"], variables["u"]
+
+        # Bdot affine in the inputs, with state-dependent coefficients
+        B = x[0] - 2.0
+        Bdot = x[0] * x[1] * u[0] - x[1] * u[1] + x[0] ** 2
+
+        constraints = {}
+        for encoding in ["vertices", "box"]:
+            certificate = make_certificate(certificate_type="cbf")(
+                system=system,
+                variables=variables,
+                domains=system.domains,
+                feasibility_encoding=encoding,
+            )
+            constraints[encoding] = certificate._feasibility_constraint_smt(
+                verifier=verifier_fn,
+                B=B,
+                B_constr=[],
+                Bdot=Bdot,
+                Bdot_constr=[],
+                alpha=lambda b: b,
+            )
+
+        self.assertNotIn("u0", str(constraints["box"]))
+        solver = z3.Solver()
+        solver.add(z3.Not(constraints["vertices"] == constraints["box"]))
+        self.assertEqual(solver.check(), z3.unsat)
+
+    def test_refine_counterexamples_cbf(self):
+        from fosco.certificates import make_certificate
+        from fosco.models import TorchMLP
+        from fosco.systems import make_system
+
+        system = make_system("SingleIntegrator")()
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        variables = {
+            "v": verifier_fn.new_vars(var_names=system.vars),
+            "u": verifier_fn.new_vars(var_names=system.controls),
+        }
+        certificate = make_certificate(certificate_type="cbf")(
+            system=system, variables=variables, domains=system.domains
+        )
+
+        # linear barrier B(x) = x0 - 0.5, positive in part of the unsafe unit sphere
+        net = TorchMLP(input_size=2, hidden_sizes=(), activation=())
+        with torch.no_grad():
+            net.layers[0].weight.copy_(torch.tensor([[1.0, 0.0]]))
+            net.layers[0].bias.copy_(torch.tensor([-0.5]))
+
+        cex = {
+            "unsafe": torch.tensor([[0.6, 0.0]]),
+            "lie": torch.tensor([[1.0, 1.0, 0.0, 0.0]]),
+            "init": None,
+        }
+        refined = certificate.refine_counterexamples(
+            cex=cex, V_net=net, f_torch=system._f_torch, n_steps=20, n_samples=5
+        )
+
+        self.assertIsNone(refined["init"])
+        self.assertTrue(torch.equal(refined["unsafe"][:1], cex["unsafe"]))
+        self.assertGreater(len(refined["unsafe"]), 1)
+        new_points = refined["unsafe"][1:]
+        self.assertTrue(torch.all(system.domains["unsafe"].check_containment(new_points)))
+        self.assertTrue(torch.all(net(new_points) >= 0.0))
+        self.assertGreater(net(new_points).max().item(), 0.45)
+
+        # the feasibility condition holds everywhere for the single integrator: no points are added
+        self.assertTrue(torch.equal(refined["lie"], cex["lie"]))
+
+    def test_validate_counterexamples_cbf(self):
+        from fosco.certificates import make_certificate
+        from fosco.models import TorchMLP
+        from fosco.systems import make_system
+
+        system = make_system("SingleIntegrator")()
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        variables = {
+            "v": verifier_fn.new_vars(var_names=system.vars),
+            "u": verifier_fn.new_vars(var_names=system.controls),
+        }
+        certificate = make_certificate(certificate_type="cbf")(
+            system=system, variables=variables, domains=system.domains
+        )
+
+        # linear barrier B(x) = x0 - 0.5
+        net = TorchMLP(input_size=2, hidden_sizes=(), activation=())
+        with torch.no_grad():
+            net.layers[0].weight.copy_(torch.tensor([[1.0, 0.0]]))
+            net.layers[0].bias.copy_(torch.tensor([-0.5]))
+
+        cex = {
+            "unsafe": torch.tensor([[0.6, 0.0], [0.2, 0.0]]),
+            "init": torch.tensor([[-4.5, 0.0]]),
+            "lie": None,
+        }
+        validity = certificate.validate_counterexamples(
+            cex=cex, V_net=net, xdot_func=system._f_torch
+        )
+
+        self.assertEqual(set(validity.keys()), {"unsafe", "init"})
+        self.assertEqual(validity["unsafe"].tolist(), [True, False])
+        self.assertEqual(validity["init"].tolist(), [True])
+
+    def test_timeout_scheduler(self):
+        from fosco.verifier.scheduler import TimeoutScheduler
+
+        scheduler = TimeoutScheduler(max_timeout=30, total_timeout=40, margin=3.0)
+
+        # unseen conditions get the maximum timeout
+        self.assertEqual(scheduler.timeout("init"), 30)
+
+        scheduler.new_iteration()
+        scheduler.record(label="init", elapsed=0.1, timeout=30, timed_out=False)
+        scheduler.record(label="lie", elapsed=5.0, timeout=30, timed_out=False)
+        scheduler.record(label="unsafe", elapsed=2.0, timeout=2, timed_out=True)
+        self.assertEqual(scheduler.timed_out_labels, ["unsafe"])
+
+        # timeouts proportional to the recent solve times, doubled after a timeout
+        scheduler.new_iteration()
+        self.assertEqual(scheduler.timeout("init"), 1)
+        self.assertEqual(scheduler.timeout("lie"), 15)
+        self.assertEqual(scheduler.timeout("unsafe"), 4)
+
+        # capped by the time left in the iteration budget
+        scheduler.record(label="lie", elapsed=35.0, timeout=30, timed_out=True)
+        self.assertEqual(scheduler.timeout("lie"), 5)
+        self.assertEqual(set(scheduler.timed_out_labels), {"unsafe", "lie"})
+
+    def test_adaptive_timeout(self):
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        vars = verifier_fn.new_vars(n=1)
+
+        def constraint_gen(verif: Verifier, C: SYMBOL, *args):
+            yield {"sat": (C >= 0.0, vars, []), "unsat": (C < C, vars, [])}
+
+        verifier = verifier_fn(
+            solver_vars=vars,
+            constraints_method=constraint_gen,
+            solver_timeout=10,
+            adaptive_timeout=True,
+        )
+
+        for _ in range(2):
+            results, elapsed_time = verifier.verify(
+                V_symbolic=vars[0],
+                V_symbolic_constr=[],
+                V_symbolic_vars=vars,
+                Vdot_symbolic=None,
+                Vdot_symbolic_constr=[],
+                Vdot_symbolic_vars=[],
+                sigma_symbolic=None,
+                sigma_symbolic_constr=[],
+                sigma_symbolic_vars=[],
+                Vdot_residual_symbolic=None,
+                Vdot_residual_symbolic_constr=[],
+                Vdot_residual_symbolic_vars=[],
+            )
+            self.assertIsNotNone(results["cex"]["sat"])
+            self.assertIsNone(results["cex"]["unsat"])
+
+        # simple conditions are solved well below the maximum timeout
+        self.assertEqual(verifier._timeout("sat"), 1)
+        self.assertEqual(verifier.timed_out_labels, [])
+        self.assertEqual(verifier._solver_timeout, 10)
+
+    def test_adaptive_timeout_killed_worker(self):
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        vars = verifier_fn.new_vars(n=1)
+
+        verifier = verifier_fn(
+            solver_vars=vars,
+            constraints_method=lambda *args: iter([]),
+            solver_timeout=1,
+            adaptive_timeout=True,
+            n_workers=2,
+        )
+        # solvers without internal timeout, killed after the grace period
+        verifier.WORKER_GRACE_PERIOD = 0.5
+        verifier._solve_condition_with_timeout = lambda timeout, *query: time.sleep(60)
+
+        queries = {
+            "lie": ("lie", vars[0] >= 0.0, vars, []),
+            "init": ("init", vars[0] >= 0.0, vars, []),
+        }
+        results = verifier._solve_queries(queries=queries, stop_when_sat=False)
+        self.assertTrue(all(res.timed_out for res in results.values()))
+        self.assertEqual(set(verifier.timed_out_labels), {"lie", "init"})
+
+    def test_verifier_stats(self):
+        verifier_fn = make_verifier(type=VerifierType.Z3)
+        vars = verifier_fn.new_vars(n=2)
+
+        def constraint_gen(verif: Verifier, C: SYMBOL, *args):
+            yield {"unsat": (C * C < -1.0, vars, vars[1:])}
+            yield {"sat": (C >= 0.0, vars, [])}
+
+        for n_workers in [1, 2]:
+            verifier = verifier_fn(
+                solver_vars=vars,
+                constraints_method=constraint_gen,
+                solver_timeout=10,
+                n_workers=n_workers,
+            )
+            verifier.verify(
+                V_symbolic=vars[0] + 2 * vars[1],
+                V_symbolic_constr=[],
+                V_symbolic_vars=vars,
+                Vdot_symbolic=None,
+                Vdot_symbolic_constr=[],
+                Vdot_symbolic_vars=[],
+                sigma_symbolic=None,
+                sigma_symbolic_constr=[],
+                sigma_symbolic_vars=[],
+                Vdot_residual_symbolic=None,
+                Vdot_residual_symbolic_constr=[],
+                Vdot_residual_symbolic_vars=[],
+            )
+
+            stats = verifier.stats
+            self.assertEqual(set(stats.keys()), {"sat", "unsat"})
+            self.assertEqual(stats["sat"]["sat"], 1.0)
+            self.assertEqual(stats["unsat"]["unsat"], 1.0)
+            self.assertEqual(stats["unsat"]["n_aux_vars"], 1)
+            self.assertGreater(stats["unsat"]["n_nodes"], stats["sat"]["n_nodes"])
+            self.assertGreater(stats["unsat"]["n_arith_ops"], stats["sat"]["n_arith_ops"])
+            self.assertGreaterEqual(stats["sat"]["time"], 0.0)
+            self.assertTrue(any(k.startswith("solver_") for k in stats["sat"]))